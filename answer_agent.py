@@ -1,45 +1,29 @@
 from langchain_core.messages import HumanMessage
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_core.runnables import RunnableSequence
-from langchain_openai import ChatOpenAI
+from langchain_core.runnables import RunnableLambda, RunnableSequence
 
-from config import DEEPSEEK_CONFIG
-from tools import search_tool,load_prompt, update_graph_tool
-from cost_tracker import get_tracker
+from llm_client import (
+    create_chat_llm, lookup_cached_response, store_cached_response,
+    with_rate_limit, LLM_RATE_LIMITER, estimate_prompt_tokens, record_llm_output
+)
+from tools import search_tool, asearch_tool, load_prompt, update_graph_tool, summarize_execution, IncrementalCypherExecutor
+from cost_tracker import get_tracker, extract_llm_usage
+import asyncio
 import re
 
 # 加载提示词
 answer_agent_prompt_text = load_prompt("answer_agent_prompt.txt")
 
-# 初始化 LLM
-llm = ChatOpenAI(
-    model=DEEPSEEK_CONFIG["model_name"],
-    api_key=DEEPSEEK_CONFIG["api_key"],
-    base_url=DEEPSEEK_CONFIG["url"],
-    temperature=DEEPSEEK_CONFIG["temperature"],
-    max_tokens=DEEPSEEK_CONFIG["max-tokens"],
-)
+# 初始化 LLM（共享长连接HTTP客户端）
+llm = create_chat_llm()
 
 
-# process_question函数（传递核心实体给LLM）
-def process_question(inputs: dict) -> dict:
+def _format_question_content(inputs: dict, search_result: str) -> str:
+    """单个问题的可变内容（核心实体、问题、搜索结果）"""
     question = inputs.get("question", "")
     entity_label = inputs.get("entity_label", "")
     entity_name = inputs.get("entity_name", "")
     
-    if not question:
-        error_msg = "[答智能体-无输入问题]"
-        print(error_msg)
-        msg = HumanMessage(content=error_msg)
-        return {"question": question, "agent_scratchpad": [msg]}
-    
-    # 记录搜索工具调用
-    tracker = get_tracker()
-    tracker.record_answer_search_call()
-    
-    search_result = search_tool(question)
-    
-    # 构建传递给LLM的消息（包含核心实体的完整信息）
     if entity_label and entity_name:
         msg_content = f"""核心实体Label：{entity_label}
 核心实体名称：{entity_name}
@@ -52,10 +36,48 @@ def process_question(inputs: dict) -> dict:
         print(f"📤 传递给LLM - Label: {entity_label}, 实体名: {entity_name}")
     else:
         msg_content = f"问题：{question}\n{search_result}"
-    
-    msg = HumanMessage(content=msg_content)
+    return msg_content
+
+
+def _build_llm_input(inputs: dict, search_result: str) -> dict:
+    """构建传递给LLM的消息（包含核心实体的完整信息）"""
+    msg = HumanMessage(content=_format_question_content(inputs, search_result))
+    return {"question": inputs.get("question", ""), "agent_scratchpad": [msg]}
+
+
+def _missing_question_input(question: str) -> dict:
+    error_msg = "[答智能体-无输入问题]"
+    print(error_msg)
+    msg = HumanMessage(content=error_msg)
     return {"question": question, "agent_scratchpad": [msg]}
 
+
+# process_question函数（传递核心实体给LLM）
+def process_question(inputs: dict) -> dict:
+    question = inputs.get("question", "")
+    if not question:
+        return _missing_question_input(question)
+    
+    # 记录搜索工具调用
+    tracker = get_tracker()
+    tracker.record_answer_search_call()
+    
+    search_result = search_tool(question)
+    return _build_llm_input(inputs, search_result)
+
+
+async def aprocess_question(inputs: dict) -> dict:
+    """process_question 的异步版本：搜索走异步连接池（ainvoke/astream时使用）"""
+    question = inputs.get("question", "")
+    if not question:
+        return _missing_question_input(question)
+
+    tracker = get_tracker()
+    tracker.record_answer_search_call()
+
+    search_result = await asearch_tool(question)
+    return _build_llm_input(inputs, search_result)
+
 mua = "{{name: '实体名称'}}"
 mub = "{{name: '实体A'}}"
 muc = "{{name: '实体B'}}"
@@ -170,25 +192,46 @@ prompt = ChatPromptTemplate.from_messages([
     MATCH (w:冬季两项 {mui})  ← 找不到节点！应该用 :运动项目
     ```
     """),
-    ("user", "{question}"),
+    # 可变内容（核心实体、问题、搜索结果）全部放在系统提示词之后的单条消息中：
+    # 系统提示词每次调用逐字节相同，可命中Deepseek服务端前缀缓存
     MessagesPlaceholder(variable_name="agent_scratchpad")
 ])
-prompt.input_variables = ["question", "agent_scratchpad"]
+prompt.input_variables = ["agent_scratchpad"]
 
-llm_chain = prompt | llm
+llm_chain = prompt | with_rate_limit(llm)  # 每次LLM调用先经过全局限流
 
 # 步骤3：串联流程链
 answer_agent_chain = RunnableSequence(
-    process_question,
+    # invoke时执行process_question；ainvoke时执行aprocess_question（异步搜索）
+    RunnableLambda(process_question, afunc=aprocess_question),
     llm_chain,
     lambda x: {
         "llm_output": x.content.strip() if hasattr(x, "content") else str(x),
-        "llm_response": x,  # 保存原始响应对象，用于提取Token信息
-        "graph_update_result": update_graph_tool(extract_cypher(x.content.strip() if hasattr(x, "content") else str(x)))
+        "llm_response": x  # 保存原始响应对象，用于提取Token信息
+        # Cypher只在 _apply_answer_output 中执行一次（链内再执行会重复写入、重复计数度数与版本号）
     }
 )
 
 
+# ```cypher 开头，``` 结尾的代码块（支持换行）
+CYPHER_BLOCK_PATTERN = r"```cypher\s*\n*(.*?)\n*```"
+# 批量模式下每个问题输出段的起始标记，如「### 问题2」
+ANSWER_SECTION_PATTERN = re.compile(r"^\s*#{2,}\s*问题\s*(\d+)\s*$", re.MULTILINE)
+
+
+def _clean_cypher_block(cypher_content: str) -> str:
+    # 保留所有内容（包括注释），只过滤空行
+    valid_lines = []
+    for line in cypher_content.strip().split("\n"):
+        stripped_line = line.strip()
+        # 跳过纯空行
+        if not stripped_line:
+            continue
+        # 保留注释和所有Cypher语句
+        valid_lines.append(stripped_line)
+    return "\n".join(valid_lines)
+
+
 def extract_cypher(llm_output: str) -> str:
     """
     从LLM输出中提取Cypher代码块，保留注释和语句
@@ -197,34 +240,170 @@ def extract_cypher(llm_output: str) -> str:
     if not llm_output:
         return ""
     
-    # 正则表达式：匹配 ```cypher 开头，``` 结尾的内容（支持换行）
-    cypher_block_pattern = r"```cypher\s*\n*(.*?)\n*```"
-    match = re.search(cypher_block_pattern, llm_output, re.DOTALL)
-    
+    match = re.search(CYPHER_BLOCK_PATTERN, llm_output, re.DOTALL)
     if match:
-        cypher_content = match.group(1).strip()
-        if cypher_content:
-            # 保留所有内容（包括注释），只过滤空行
-            valid_lines = []
-            for line in cypher_content.split("\n"):
-                stripped_line = line.strip()
-                # 跳过纯空行
-                if not stripped_line:
-                    continue
-                # 保留注释和所有Cypher语句
-                valid_lines.append(stripped_line)
-            return "\n".join(valid_lines)
-    
+        return _clean_cypher_block(match.group(1))
     return ""
 
 
+def split_answer_sections(llm_output: str, count: int) -> list:
+    """
+    把批量模式的LLM输出拆分为 count 段，第i段对应第i个问题（缺失的段为空字符串）
+    优先按「### 问题N」标记拆分；模型未输出标记时，按Cypher代码块的顺序切分
+    """
+    if count <= 1:
+        return [llm_output or ""]
+    sections = [""] * count
+    markers = list(ANSWER_SECTION_PATTERN.finditer(llm_output or ""))
+    if markers:
+        for marker, next_marker in zip(markers, markers[1:] + [None]):
+            index = int(marker.group(1)) - 1
+            if 0 <= index < count and not sections[index]:
+                end = next_marker.start() if next_marker else len(llm_output)
+                sections[index] = llm_output[marker.end():end].strip()
+        return sections
+
+    start = 0
+    for index, match in enumerate(re.finditer(CYPHER_BLOCK_PATTERN, llm_output or "", re.DOTALL)):
+        if index >= count:
+            break
+        sections[index] = llm_output[start:match.end()].strip()
+        start = match.end()
+    return sections
+
 
-def generate_answer(ask_agent_output: dict) -> dict:
+class AnswerStreamSplitter:
     """
-    答智能体主函数：生成答案和Cypher语句，并分步执行
-    返回结构化结果，供前端循环展示每一步的执行情况
+    流式输出拆分器：把LLM逐块输出拆分为「答案文本」与「Cypher代码块」两类增量
+    代码块围栏（```cypher / ```）可能被拆在两个chunk之间，因此保留疑似围栏前缀的尾部等待下一块
+    """
+    OPEN_FENCE = "```cypher"
+    CLOSE_FENCE = "```"
+
+    def __init__(self):
+        self.buffer = ""
+        self.in_cypher = False
+
+    def feed(self, text: str) -> list:
+        """输入一个chunk，返回 [(kind, delta), ...]，kind 为 "answer" 或 "cypher" """
+        self.buffer += text
+        deltas = []
+        while True:
+            fence = self.CLOSE_FENCE if self.in_cypher else self.OPEN_FENCE
+            kind = "cypher" if self.in_cypher else "answer"
+            idx = self.buffer.find(fence)
+            if idx >= 0:
+                if idx > 0:
+                    deltas.append((kind, self.buffer[:idx]))
+                self.buffer = self.buffer[idx + len(fence):]
+                self.in_cypher = not self.in_cypher
+                continue
+            # 未找到完整围栏：保留可能是围栏开头的尾部字符
+            keep = len(fence) - 1
+            if len(self.buffer) > keep:
+                deltas.append((kind, self.buffer[:-keep]))
+                self.buffer = self.buffer[-keep:]
+            return deltas
+
+    def flush(self) -> list:
+        """流结束时输出剩余内容"""
+        deltas = []
+        if self.buffer:
+            deltas.append(("cypher" if self.in_cypher else "answer", self.buffer))
+            self.buffer = ""
+        return deltas
+
+
+# Cypher增量队列的中断标记：流式输出出错/被取消，截断的语句不执行
+CYPHER_ABORT = object()
+
+
+async def _run_incremental_executor(executor: IncrementalCypherExecutor, queue: asyncio.Queue) -> dict:
+    """
+    后台消费Cypher增量并交给执行器（Neo4j写入放入线程池，不阻塞流式推送）
+    队列中收到None表示代码块结束，收到CYPHER_ABORT表示流式输出中断；积压的多个增量合并后一次送入，减少线程切换
+    """
+    while True:
+        deltas = [await queue.get()]
+        while not queue.empty():
+            deltas.append(queue.get_nowait())
+        text = "".join(d for d in deltas if isinstance(d, str))
+        if text:
+            await asyncio.to_thread(executor.feed, text)
+        if CYPHER_ABORT in deltas:
+            return await asyncio.to_thread(executor.close, True)
+        if None in deltas:
+            return await asyncio.to_thread(executor.close)
+
+
+async def _astream_answer_chain(chain_input: dict, on_delta, executor: IncrementalCypherExecutor = None) -> dict:
+    """
+    以astream方式执行答智能体链：搜索 → 流式生成，每收到一个chunk即通过on_delta(kind, delta)推送
+    executor：可选的增量执行器；传入时第一个Cypher代码块边生成边执行
+    返回与answer_agent_chain相同结构的 {"llm_output", "llm_response"}，
+    使用执行器时额外返回 "execution_result"（与 execute_neo4j_query 同结构）
     """
-    result = {
+    llm_input = await aprocess_question(chain_input)
+    splitter = AnswerStreamSplitter()
+    full_response = None
+
+    cypher_queue = asyncio.Queue()
+    executor_task = asyncio.create_task(_run_incremental_executor(executor, cypher_queue)) if executor else None
+    state = {"cypher_seen": False, "cypher_closed": False}
+
+    async def dispatch(kind: str, delta: str):
+        if executor_task and not state["cypher_closed"]:
+            if kind == "cypher":
+                state["cypher_seen"] = True
+                cypher_queue.put_nowait(delta)
+            elif state["cypher_seen"]:
+                # 第一个代码块已结束（与extract_cypher一致，只执行第一个代码块）
+                state["cypher_closed"] = True
+                cypher_queue.put_nowait(None)
+        await on_delta(kind, delta)
+
+    messages = (await prompt.ainvoke(llm_input)).to_messages()
+    cached = await asyncio.to_thread(lookup_cached_response, llm, messages)
+    aborted = True
+    try:
+        if cached is not None:
+            # 命中LLM响应缓存：整段输出作为一个chunk推送
+            full_response = cached
+            for kind, delta in splitter.feed(cached.content or ""):
+                await dispatch(kind, delta)
+        else:
+            await LLM_RATE_LIMITER.aacquire(estimate_prompt_tokens(messages))
+            async for chunk in llm.astream(messages):
+                # 累加chunk得到完整响应（含流式usage信息）
+                full_response = chunk if full_response is None else full_response + chunk
+                for kind, delta in splitter.feed(chunk.content or ""):
+                    await dispatch(kind, delta)
+        for kind, delta in splitter.flush():
+            await dispatch(kind, delta)
+        aborted = False
+    finally:
+        if executor_task and aborted:
+            # 流式输出出错/被取消：代码块未结束时通知执行器丢弃截断的语句；
+            # 并等待其处理完已完整的语句，不留下无人等待的后台任务
+            if not state["cypher_closed"]:
+                cypher_queue.put_nowait(CYPHER_ABORT)
+            await asyncio.gather(executor_task, return_exceptions=True)
+        elif executor_task and not state["cypher_closed"]:
+            cypher_queue.put_nowait(None)
+
+    if cached is None:
+        record_llm_output(full_response)
+        await asyncio.to_thread(store_cached_response, llm, messages, full_response)
+
+    llm_output = full_response.content.strip() if full_response is not None else ""
+    chain_result = {"llm_output": llm_output, "llm_response": full_response}
+    if executor_task:
+        chain_result["execution_result"] = await executor_task
+    return chain_result
+
+
+def _new_answer_result(ask_agent_output: dict) -> dict:
+    return {
         "status": "success",
         "data": {
             "question": ask_agent_output.get("question", ""),
@@ -235,94 +414,252 @@ def generate_answer(ask_agent_output: dict) -> dict:
         },
         "error": ""
     }
-    try:
-        question = result["data"]["question"]
-        entity_label = ask_agent_output.get("entity_label", "")
-        entity_name = ask_agent_output.get("entity_name", "")
-
-        # 向LLM传递指令
-        chain_input = {
-            "question": question,
-            "entity_label": entity_label,
-            "entity_name": entity_name
-        }
-        # invoke阻塞式调用大模型
-        chain_result = answer_agent_chain.invoke(chain_input)
-        llm_output = chain_result["llm_output"]
-        print(f"📌 LLM原始输出：\n{llm_output}")
-        
-        # 记录LLM token消耗
-        tracker = get_tracker()
-        llm_response = chain_result.get("llm_response")
-        if llm_response and hasattr(llm_response, "usage_metadata") and llm_response.usage_metadata:
-            input_tokens = llm_response.usage_metadata.get("input_tokens", 0)
-            output_tokens = llm_response.usage_metadata.get("output_tokens", 0)
-            tracker.record_answer_llm_call(input_tokens, output_tokens)
-            print(f"[统计] 答智能体LLM调用 - 输入:{input_tokens} token, 输出:{output_tokens} token")
-        elif llm_response and hasattr(llm_response, "response_metadata") and "token_usage" in llm_response.response_metadata:
-            # 兼容旧版本Langchain
-            token_usage = llm_response.response_metadata["token_usage"]
-            input_tokens = token_usage.get("prompt_tokens", 0)
-            output_tokens = token_usage.get("completion_tokens", 0)
-            tracker.record_answer_llm_call(input_tokens, output_tokens)
-            print(f"[统计] 答智能体LLM调用 - 输入:{input_tokens} token, 输出:{output_tokens} token")
-        else:
-            # 无法获取token信息，仅计数
-            tracker.record_answer_llm_call(0, 0)
-            print(f"[统计] 答智能体LLM调用 - 无法获取token信息")
 
-        # 提取答案
-        answer_lines = [line.strip() for line in llm_output.split("\n") if line.strip().startswith("回复结果：")]
-        answer = answer_lines[0].replace("回复结果：", "").strip() if answer_lines else "暂无相关信息"
 
-        # 提取Cypher
-        cypher = extract_cypher(llm_output)
-        print(f"📌 提取后的Cypher：\n{cypher if cypher else '无'}")
+def _build_chain_input(ask_agent_output: dict) -> dict:
+    # 向LLM传递指令
+    return {
+        "question": ask_agent_output.get("question", ""),
+        "entity_label": ask_agent_output.get("entity_label", ""),
+        "entity_name": ask_agent_output.get("entity_name", "")
+    }
 
-        if cypher:
-            result["data"]["cypher"] = cypher
 
-            # 核心实体校验（如果有核心实体，检查Label是否在Cypher中）
-            has_core_entity = (not entity_label) or (entity_label in cypher)
-            
-            if has_core_entity:
-                # 执行Cypher并获取详细结果
-                execution_result = update_graph_tool(cypher)
-                
-                result["data"]["graph_update_summary"] = execution_result.get("summary", "执行完成")
-                result["data"]["cypher_steps"] = execution_result.get("details", [])
-                
-                # 记录Cypher执行次数（统计成功+跳过的语句数）
-                statement_count = len([step for step in execution_result.get("details", []) 
-                                      if step.get("status") in ["success", "skipped"]])
-                if statement_count > 0:
-                    tracker.record_cypher_execution(statement_count)
-                    print(f"[统计] Cypher执行 - 成功执行{statement_count}条语句")
-                
-                # 根据执行结果调整状态
-                if execution_result["status"] == "error":
-                    result["status"] = "error"
-                    result["error"] = execution_result.get("summary", "执行失败")
-                elif execution_result["status"] == "partial":
-                    result["status"] = "warning"
-                    result["error"] = "部分语句执行失败，详见步骤详情"
-                    
+def _finish_answer(result: dict, chain_result: dict, entity_label: str) -> dict:
+    """
+    处理答智能体链的输出：记录token、提取答案与Cypher、分步执行并填充结果
+    （包含Neo4j写入，属于阻塞调用；chain_result中已有增量执行结果时不再重复执行）
+    """
+    llm_output = chain_result["llm_output"]
+    print(f"📌 LLM原始输出：\n{llm_output}")
+    
+    # 记录LLM token消耗
+    _record_answer_usage(chain_result.get("llm_response"))
+    return _apply_answer_output(result, llm_output, entity_label, chain_result.get("execution_result"))
+
+
+def _record_answer_usage(llm_response):
+    """记录答智能体LLM token消耗（含服务端前缀缓存命中情况）"""
+    tracker = get_tracker()
+    usage = extract_llm_usage(llm_response)
+    if usage:
+        input_tokens, output_tokens, cache_hit_tokens, cache_miss_tokens = usage
+        tracker.record_answer_llm_call(input_tokens, output_tokens, cache_hit_tokens, cache_miss_tokens)
+        print(f"[统计] 答智能体LLM调用 - 输入:{input_tokens} token（缓存命中:{cache_hit_tokens}）, 输出:{output_tokens} token")
+    else:
+        # 无法获取token信息，仅计数
+        tracker.record_answer_llm_call(0, 0)
+        print(f"[统计] 答智能体LLM调用 - 无法获取token信息")
+
+
+def _apply_answer_output(result: dict, llm_output: str, entity_label: str, streamed_execution: dict = None) -> dict:
+    """
+    从（单个问题的）LLM输出中提取答案与Cypher，执行并填充结果
+    streamed_execution：流式增量模式下已执行的结果（与 execute_neo4j_query 同结构），传入时不再重复执行
+    """
+    tracker = get_tracker()
+
+    # 提取答案
+    answer_lines = [line.strip() for line in llm_output.split("\n") if line.strip().startswith("回复结果：")]
+    answer = answer_lines[0].replace("回复结果：", "").strip() if answer_lines else "暂无相关信息"
+
+    # 提取Cypher
+    cypher = extract_cypher(llm_output)
+    print(f"📌 提取后的Cypher：\n{cypher if cypher else '无'}")
+
+    if cypher:
+        result["data"]["cypher"] = cypher
+
+        # 核心实体校验（如果有核心实体，检查Label是否在Cypher中）
+        has_core_entity = (not entity_label) or (entity_label in cypher)
+        
+        if has_core_entity:
+            # 执行Cypher并获取详细结果（流式增量模式下语句已在生成过程中执行）
+            if streamed_execution is not None:
+                execution_result = summarize_execution(streamed_execution)
             else:
+                execution_result = update_graph_tool(cypher)
+            
+            result["data"]["graph_update_summary"] = execution_result.get("summary", "执行完成")
+            result["data"]["cypher_steps"] = execution_result.get("details", [])
+            
+            # 记录Cypher执行次数（统计成功+跳过的语句数）
+            statement_count = len([step for step in execution_result.get("details", []) 
+                                  if step.get("status") in ["success", "skipped"]])
+            if statement_count > 0:
+                tracker.record_cypher_execution(statement_count)
+                print(f"[统计] Cypher执行 - 成功执行{statement_count}条语句")
+            
+            # 根据执行结果调整状态
+            if execution_result["status"] == "error":
+                result["status"] = "error"
+                result["error"] = execution_result.get("summary", "执行失败")
+            elif execution_result["status"] == "partial":
                 result["status"] = "warning"
-                result["error"] = f"核心实体Label「{entity_label}」未在Cypher中找到"
-                result["data"]["graph_update_summary"] = "图谱更新失败：核心实体Label缺失"
-                result["data"]["cypher_steps"] = []
+                result["error"] = "部分语句执行失败，详见步骤详情"
+                
         else:
-            result["data"]["cypher"] = ""
-            result["data"]["graph_update_summary"] = "无需要执行的Cypher语句"
+            result["status"] = "warning"
+            result["error"] = f"核心实体Label「{entity_label}」未在Cypher中找到"
+            result["data"]["graph_update_summary"] = "图谱更新失败：核心实体Label缺失"
             result["data"]["cypher_steps"] = []
-            result["warning"] = "未从LLM输出中提取到有效Cypher"
+    else:
+        result["data"]["cypher"] = ""
+        result["data"]["graph_update_summary"] = "无需要执行的Cypher语句"
+        result["data"]["cypher_steps"] = []
+        result["warning"] = "未从LLM输出中提取到有效Cypher"
+
+    result["data"]["answer"] = answer
+    return result
+
 
-        result["data"]["answer"] = answer
+def generate_answer(ask_agent_output: dict) -> dict:
+    """
+    答智能体主函数：生成答案和Cypher语句，并分步执行
+    返回结构化结果，供前端循环展示每一步的执行情况
+    """
+    result = _new_answer_result(ask_agent_output)
+    try:
+        chain_input = _build_chain_input(ask_agent_output)
+        # invoke阻塞式调用大模型
+        chain_result = answer_agent_chain.invoke(chain_input)
+        _finish_answer(result, chain_result, chain_input["entity_label"])
         
     except Exception as e:
         result["status"] = "error"
         result["error"] = f"[答智能体执行失败] 原因：{str(e)}"
         print(result["error"])
         
-    return result
\ No newline at end of file
+    return result
+
+
+async def _ignore_delta(kind: str, delta: str):
+    pass
+
+
+async def agenerate_answer(ask_agent_output: dict, on_delta=None, incremental_cypher: bool = False) -> dict:
+    """
+    答智能体异步入口：LLM调用使用ainvoke（仅占用协程），Neo4j写入放入线程池
+    on_delta：可选的异步回调 on_delta(kind, delta)，传入时改用astream流式生成并逐块推送
+              kind 为 "answer"（答案文本）或 "cypher"（Cypher代码块内容）
+    incremental_cypher：为True时流式生成，每条Cypher语句的分号到达即执行，与生成过程重叠
+    参数与返回结构同 generate_answer
+    """
+    result = _new_answer_result(ask_agent_output)
+    try:
+        chain_input = _build_chain_input(ask_agent_output)
+        if incremental_cypher:
+            executor = IncrementalCypherExecutor(core_label=chain_input["entity_label"])
+            chain_result = await _astream_answer_chain(chain_input, on_delta or _ignore_delta, executor)
+        elif on_delta is not None:
+            chain_result = await _astream_answer_chain(chain_input, on_delta)
+        else:
+            chain_result = await answer_agent_chain.ainvoke(chain_input)
+        await asyncio.to_thread(_finish_answer, result, chain_result, chain_input["entity_label"])
+
+    except Exception as e:
+        result["status"] = "error"
+        result["error"] = f"[答智能体执行失败] 原因：{str(e)}"
+        print(result["error"])
+
+    return result
+
+
+# ===================== 批量生成答案 =====================
+def _build_batch_llm_input(items: list, search_results: list) -> dict:
+    """
+    批量模式的消息：多个问题合并为一条消息，仍位于静态系统提示词之后（可命中前缀缓存），
+    要求模型按「### 问题N」分段输出各自的回复结果与Cypher代码块
+    """
+    parts = [
+        f"本次共{len(items)}个问题，请逐个作答。每个问题的输出以单独一行「### 问题N」开头（N为问题编号），"
+        f"其后依次输出该问题的「回复结果：...」和```cypher代码块；每个代码块只包含该问题的语句，遵循上述全部规范。"
+    ]
+    for i, (item, search_result) in enumerate(zip(items, search_results), 1):
+        parts.append(f"### 问题{i}\n{_format_question_content(item, search_result)}")
+    return {"agent_scratchpad": [HumanMessage(content="\n\n".join(parts))]}
+
+
+def _new_batch_results(ask_agent_outputs: list):
+    """返回 (与输入一一对应的结果列表, 有问题的输入, 其对应的结果)；无问题的输入直接标记为error"""
+    results = [_new_answer_result(item) for item in ask_agent_outputs]
+    for result, item in zip(results, ask_agent_outputs):
+        if not item.get("question"):
+            result["status"] = "error"
+            result["error"] = "[答智能体-无输入问题]"
+    pairs = [(item, result) for item, result in zip(ask_agent_outputs, results) if item.get("question")]
+    return results, [item for item, _ in pairs], [result for _, result in pairs]
+
+
+def _finish_batch_answers(results: list, items: list, llm_response) -> list:
+    """拆分批量输出并逐个问题提取、执行Cypher（阻塞调用）"""
+    llm_output = llm_response.content.strip() if hasattr(llm_response, "content") else str(llm_response)
+    print(f"📌 LLM原始输出（批量{len(items)}个问题）：\n{llm_output}")
+    _record_answer_usage(llm_response)
+
+    for result, item, section in zip(results, items, split_answer_sections(llm_output, len(items))):
+        if not section:
+            result["status"] = "warning"
+            result["error"] = "批量输出中缺少该问题的回复"
+            result["data"]["graph_update_summary"] = "无需要执行的Cypher语句"
+            print(f"⚠️ 批量输出中缺少问题「{item.get('question', '')}」的回复")
+            continue
+        _apply_answer_output(result, section, item.get("entity_label", ""))
+    return results
+
+
+def _batch_error(results: list, e: Exception) -> list:
+    for result in results:
+        result["status"] = "error"
+        result["error"] = f"[答智能体批量执行失败] 原因：{str(e)}"
+    print(f"[答智能体批量执行失败] 原因：{str(e)}")
+    return results
+
+
+def generate_answers(ask_agent_outputs: list) -> list:
+    """
+    批量答智能体：一次LLM调用回答多个问题，Cypher规范只发送一次，分摊输入token
+    ask_agent_outputs：[{"question", "entity_label", "entity_name", 可选 "search_result"}]，
+                       未提供 search_result 时先调用搜索工具
+    返回：与输入一一对应的结果列表（结构同 generate_answer），执行结果按问题分别记录
+    """
+    results, items, item_results = _new_batch_results(ask_agent_outputs)
+    if not items:
+        return results
+    try:
+        tracker = get_tracker()
+        search_results = []
+        for item in items:
+            if item.get("search_result") is None:
+                tracker.record_answer_search_call()
+                search_results.append(search_tool(item["question"]))
+            else:
+                search_results.append(item["search_result"])
+
+        llm_response = llm_chain.invoke(_build_batch_llm_input(items, search_results))
+        _finish_batch_answers(item_results, items, llm_response)
+    except Exception as e:
+        _batch_error(item_results, e)
+    return results
+
+
+async def agenerate_answers(ask_agent_outputs: list) -> list:
+    """generate_answers 的异步版本：各问题的搜索并发执行，LLM调用使用ainvoke，Neo4j写入放入线程池"""
+    results, items, item_results = _new_batch_results(ask_agent_outputs)
+    if not items:
+        return results
+    try:
+        tracker = get_tracker()
+        missing = [i for i, item in enumerate(items) if item.get("search_result") is None]
+        for _ in missing:
+            tracker.record_answer_search_call()
+        searched = await asyncio.gather(*(asearch_tool(items[i]["question"]) for i in missing))
+        search_results = [item.get("search_result") for item in items]
+        for i, search_result in zip(missing, searched):
+            search_results[i] = search_result
+
+        llm_response = await llm_chain.ainvoke(_build_batch_llm_input(items, search_results))
+        await asyncio.to_thread(_finish_batch_answers, item_results, items, llm_response)
+    except Exception as e:
+        _batch_error(item_results, e)
+    return results
@@ -1,43 +1,41 @@
+import asyncio
 import os
+import re
 
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.runnables import RunnableSequence
 from langchain_core.messages import HumanMessage
-from langchain_openai import ChatOpenAI
 
-from config import DEEPSEEK_CONFIG
-from tools import get_least_relationship_entity,load_prompt
-from cost_tracker import get_tracker
+from llm_client import create_chat_llm, with_rate_limit
+from tools import get_least_relationship_entity, get_least_relationship_entities, load_prompt
+from cost_tracker import get_tracker, extract_llm_usage
 
 # 2. 直接加载整合后的提示词（无需再拼接enhanced_prompt_text）
 ask_agent_prompt_text = load_prompt("ask_agent_prompt.txt")
 
 # 3. 构建提示词模板：直接使用加载的文本，无需额外添加内容
+# 消息顺序固定为「静态系统提示词 → 本轮可变内容」：系统提示词每次调用逐字节相同，
+# 可命中Deepseek服务端前缀缓存；工具返回的实体等可变内容只出现在末尾的消息中
 prompt = ChatPromptTemplate.from_messages([
     ("system", ask_agent_prompt_text),  # 直接用文件中的完整指令
-    ("user", "{input}"),
     MessagesPlaceholder(variable_name="agent_scratchpad")
 ])
 
 
-# 初始化 LLM（不变）
-llm = ChatOpenAI(
-    model=DEEPSEEK_CONFIG["model_name"],
-    api_key=DEEPSEEK_CONFIG["api_key"],
-    base_url=DEEPSEEK_CONFIG["url"],
-    temperature=DEEPSEEK_CONFIG["temperature"],
-    max_tokens=DEEPSEEK_CONFIG["max-tokens"],
-)
+# 初始化 LLM（共享长连接HTTP客户端）
+llm = create_chat_llm()
 
 
 # 步骤1：修改工具调用函数（用 HumanMessage 包装结果，无需 tool_call_id）
 def call_least_entity_tool(inputs: dict) -> dict:
     try:
-        # 记录数据库查询
-        tracker = get_tracker()
-        tracker.record_ask_cypher_query()
-        
-        entity_info = get_least_relationship_entity()
+        # 调用方已指定实体（如并发工作者租用的实体、或链中上一步已查询的实体）时直接使用，不再查询
+        entity_info = inputs.get("entity")
+        if not entity_info:
+            # 记录数据库查询
+            tracker = get_tracker()
+            tracker.record_ask_cypher_query()
+            entity_info = get_least_relationship_entity()
         entity_name = entity_info.get("name", "") if isinstance(entity_info, dict) else ""
         entity_label = entity_info.get("label", "") if isinstance(entity_info, dict) else ""
         
@@ -57,7 +55,9 @@ def call_least_entity_tool(inputs: dict) -> dict:
             "input": inputs["input"],
             "agent_scratchpad": [tool_result_msg],
             "raw_entity": f"{entity_label}:{entity_name}" if entity_label and entity_name else entity_name,
-            "has_valid_entity": has_valid_entity
+            "has_valid_entity": has_valid_entity,
+            # 回传已解析的实体：ask_agent_chain 再次经过本函数时复用，不再重复查询
+            "entity": entity_info if has_valid_entity else None
         }
     except Exception as e:
         error_msg = f"[工具调用失败] 原因：{str(e)}"
@@ -67,10 +67,11 @@ def call_least_entity_tool(inputs: dict) -> dict:
             "input": inputs["input"],
             "agent_scratchpad": [tool_result_msg],
             "raw_entity": "",
-            "has_valid_entity": False  # 异常时同样标记为"无有效实体"
+            "has_valid_entity": False,  # 异常时同样标记为"无有效实体"
+            "entity": None
         }
 
-llm_chain = prompt | llm
+llm_chain = prompt | with_rate_limit(llm)  # 每次LLM调用先经过全局限流
 
 # 完整流程链（不变）
 ask_agent_chain = RunnableSequence(
@@ -79,8 +80,8 @@ ask_agent_chain = RunnableSequence(
 )
 
 
-def generate_question() -> dict:
-    result = {
+def _new_question_result() -> dict:
+    return {
         "status": "success",
         "data": {
             "question": "",
@@ -89,72 +90,225 @@ def generate_question() -> dict:
         },
         "error": ""
     }
+
+
+def _no_entity_result(result: dict) -> dict:
+    # 无有效实体 → 直接返回error状态，中断后续流程
+    result["status"] = "error"
+    result["error"] = "问智能体执行失败：未从Neo4j数据库中查询到有效实体，无法生成问题"
+    result["data"] = {}  # 无有效数据，清空data
+    print(result["error"])
+    return result
+
+
+def _record_ask_usage(chain_result):
+    """记录问智能体LLM token消耗（含服务端前缀缓存命中情况）"""
+    tracker = get_tracker()
+    usage = extract_llm_usage(chain_result)
+    if usage:
+        input_tokens, output_tokens, cache_hit_tokens, cache_miss_tokens = usage
+        tracker.record_ask_llm_call(input_tokens, output_tokens, cache_hit_tokens, cache_miss_tokens)
+        print(f"[统计] 问智能体LLM调用 - 输入:{input_tokens} token（缓存命中:{cache_hit_tokens}）, 输出:{output_tokens} token")
+    else:
+        # 无法获取token信息，仅计数
+        tracker.record_ask_llm_call(0, 0)
+        print(f"[统计] 问智能体LLM调用 - 无法获取token信息")
+
+
+def _parse_question_output(result: dict, raw_output: str, entity_info: dict) -> dict:
+    """校验LLM输出的「问题@@@核心实体」格式并填充结果"""
+    entity_label = entity_info.get("label", "") if isinstance(entity_info, dict) else ""
+    entity_name = entity_info.get("name", "") if isinstance(entity_info, dict) else ""
+
+    if "@@@" in raw_output:
+        question, _ = raw_output.split("@@@", 1)
+        question = question.strip()
+
+        if question and len(question) <= 50 and question.endswith("？"):
+            result["data"]["question"] = question
+            result["data"]["entity_label"] = entity_label
+            result["data"]["entity_name"] = entity_name
+            print(f"✅ 问题：{question}")
+            print(f"✅ 实体Label：{entity_label}")
+            print(f"✅ 实体名称：{entity_name}")
+        else:
+            result["status"] = "warning"
+            result["error"] = "生成的问题长度超标/非疑问句/格式错误"
+            result["data"]["question"] = raw_output
+            result["data"]["entity_label"] = entity_label
+            result["data"]["entity_name"] = entity_name
+    else:
+        result["status"] = "warning"
+        result["error"] = "输出格式不符合「问题@@@核心实体」要求，已用工具原始结果兜底"
+        result["data"]["question"] = raw_output
+        result["data"]["entity_label"] = entity_label
+        result["data"]["entity_name"] = entity_name
+    return result
+
+
+def generate_question(entity: dict = None) -> dict:
+    """
+    问智能体主函数：基于关系最少的实体生成问题
+    entity：可选，指定核心实体 {"name", "label"}（并发模式下由租约表分配）；为空时查询Neo4j
+    """
+    result = _new_question_result()
     try:
-        chain_input = {"input": ""}
+        chain_input = {"input": "", "entity": entity}
         # 1. 先调用工具，判断是否有有效实体
         tool_result = call_least_entity_tool(chain_input)
         if not tool_result["has_valid_entity"]:
-            # 无有效实体 → 直接返回error状态，中断后续流程
-            result["status"] = "error"
-            result["error"] = "问智能体执行失败：未从Neo4j数据库中查询到有效实体，无法生成问题"
-            result["data"] = {}  # 无有效数据，清空data
-            print(result["error"])
-            return result
+            return _no_entity_result(result)
 
         # 2. 有有效实体 → 继续生成问题
         chain_result = ask_agent_chain.invoke(tool_result)
         raw_output = chain_result.content.strip() if hasattr(chain_result, "content") else str(chain_result)
         
         # 记录LLM token消耗
-        tracker = get_tracker()
-        if hasattr(chain_result, "usage_metadata") and chain_result.usage_metadata:
-            input_tokens = chain_result.usage_metadata.get("input_tokens", 0)
-            output_tokens = chain_result.usage_metadata.get("output_tokens", 0)
-            tracker.record_ask_llm_call(input_tokens, output_tokens)
-            print(f"[统计] 问智能体LLM调用 - 输入:{input_tokens} token, 输出:{output_tokens} token")
-        elif hasattr(chain_result, "response_metadata") and "token_usage" in chain_result.response_metadata:
-            # 兼容旧版本Langchain
-            token_usage = chain_result.response_metadata["token_usage"]
-            input_tokens = token_usage.get("prompt_tokens", 0)
-            output_tokens = token_usage.get("completion_tokens", 0)
-            tracker.record_ask_llm_call(input_tokens, output_tokens)
-            print(f"[统计] 问智能体LLM调用 - 输入:{input_tokens} token, 输出:{output_tokens} token")
+        _record_ask_usage(chain_result)
+
+        # 从工具结果中提取Label和实体名（与传给LLM的实体保持一致）
+        entity_info = tool_result["entity"]
+        _parse_question_output(result, raw_output, entity_info)
+
+    except Exception as e:
+        result["status"] = "error"
+        result["error"] = f"[问智能体执行失败] 原因：{str(e)}"
+        print(result["error"])
+    return result
+
+
+async def agenerate_question(entity: dict = None) -> dict:
+    """
+    问智能体异步入口：LLM调用使用ainvoke，仅Neo4j查询放入线程池
+    参数与返回结构同 generate_question
+    """
+    result = _new_question_result()
+    try:
+        chain_input = {"input": "", "entity": entity}
+        tool_result = await asyncio.to_thread(call_least_entity_tool, chain_input)
+        if not tool_result["has_valid_entity"]:
+            return _no_entity_result(result)
+
+        chain_result = await ask_agent_chain.ainvoke(tool_result)
+        raw_output = chain_result.content.strip() if hasattr(chain_result, "content") else str(chain_result)
+
+        _record_ask_usage(chain_result)
+
+        entity_info = tool_result["entity"]
+        _parse_question_output(result, raw_output, entity_info)
+
+    except Exception as e:
+        result["status"] = "error"
+        result["error"] = f"[问智能体执行失败] 原因：{str(e)}"
+        print(result["error"])
+    return result
+
+
+# ===================== 批量生成问题 =====================
+# 行首编号（如「1.」「2、」「3)」「- 」），批量输出时模型可能自带
+LINE_NUMBER_PATTERN = re.compile(r"^\s*(?:\d+\s*[.、．)）:：]|[-*•])\s*")
+
+
+def _build_batch_message(entities: list) -> HumanMessage:
+    """批量模式的工具结果消息：列出全部实体，要求按编号逐行输出「问题@@@核心实体」"""
+    lines = [
+        f"工具 GetLeastRelationshipEntity 返回了{len(entities)}个实体。",
+        f"请为每个实体各生成1个问题，共输出{len(entities)}行，按编号顺序每行一个「问题@@@核心实体」，不输出其他内容：",
+    ]
+    for i, entity in enumerate(entities, 1):
+        lines.append(f"{i}. {entity.get('name', '')}（Label：{entity.get('label', '')}）")
+    return HumanMessage(content="\n".join(lines))
+
+
+def _split_batch_output(raw_output: str, entities: list) -> list:
+    """
+    把批量输出拆分为与 entities 一一对应的行（缺失的为空字符串）
+    优先按「@@@」后的核心实体名匹配，未匹配的行按行序依次补到仍空缺的实体
+    """
+    output_lines = [LINE_NUMBER_PATTERN.sub("", line).strip() for line in raw_output.splitlines()]
+    output_lines = [line for line in output_lines if line]
+    assigned = [""] * len(entities)
+    unmatched_lines = []
+    for line in output_lines:
+        core_entity = line.split("@@@", 1)[1].strip() if "@@@" in line else None
+        for i, entity in enumerate(entities):
+            name = entity.get("name", "")
+            label = entity.get("label", "")
+            if not assigned[i] and core_entity in (name, f"{label}:{name}", f"{label}：{name}"):
+                assigned[i] = line
+                break
         else:
-            # 无法获取token信息，仅计数
-            tracker.record_ask_llm_call(0, 0)
-            print(f"[统计] 问智能体LLM调用 - 无法获取token信息")
+            unmatched_lines.append(line)
+    # 补位按空缺的实体计，而不是按行号：已按名称匹配的行不会挡住其他实体的补位
+    for i in range(len(entities)):
+        if not assigned[i] and unmatched_lines:
+            assigned[i] = unmatched_lines.pop(0)
+    return assigned
 
-        # 从工具结果中提取Label和实体名
-        entity_info = get_least_relationship_entity()
-        entity_label = entity_info.get("label", "") if isinstance(entity_info, dict) else ""
-        entity_name = entity_info.get("name", "") if isinstance(entity_info, dict) else ""
 
-        if "@@@" in raw_output:
-            question, _ = raw_output.split("@@@", 1)
-            question = question.strip()
-
-            if question and len(question) <= 50 and question.endswith("？"):
-                result["data"]["question"] = question
-                result["data"]["entity_label"] = entity_label
-                result["data"]["entity_name"] = entity_name
-                print(f"✅ 问题：{question}")
-                print(f"✅ 实体Label：{entity_label}")
-                print(f"✅ 实体名称：{entity_name}")
-            else:
-                result["status"] = "warning"
-                result["error"] = "生成的问题长度超标/非疑问句/格式错误"
-                result["data"]["question"] = raw_output
-                result["data"]["entity_label"] = entity_label
-                result["data"]["entity_name"] = entity_name
+def _parse_batch_output(raw_output: str, entities: list) -> list:
+    """逐行按 generate_question 的规则校验，返回与 entities 一一对应的结果列表"""
+    results = []
+    for entity, line in zip(entities, _split_batch_output(raw_output, entities)):
+        result = _new_question_result()
+        if line:
+            _parse_question_output(result, line, entity)
         else:
+            # 缺少该实体的问题：标记为warning且问题为空，调用方跳过本轮（不终止工作流）
             result["status"] = "warning"
-            result["error"] = "输出格式不符合「问题@@@核心实体」要求，已用工具原始结果兜底"
-            result["data"]["question"] = raw_output
-            result["data"]["entity_label"] = entity_label
-            result["data"]["entity_name"] = entity_name
+            result["error"] = "批量输出中缺少该实体的问题"
+            result["data"]["entity_label"] = entity.get("label", "")
+            result["data"]["entity_name"] = entity.get("name", "")
+            print(f"⚠️ 批量输出中缺少实体「{entity.get('name', '')}」的问题")
+        results.append(result)
+    return results
+
+
+def _select_batch_entities(entities: list, batch_size: int) -> list:
+    """调用方未指定实体时，查询关系最少的 batch_size 个实体"""
+    if entities is None:
+        get_tracker().record_ask_cypher_query()
+        entities = get_least_relationship_entities(batch_size)
+    return [entity for entity in entities if isinstance(entity, dict) and entity.get("name")]
+
 
+def generate_questions(entities: list = None, batch_size: int = 5) -> list:
+    """
+    批量问智能体：一次LLM调用为多个实体各生成一个问题，分摊系统提示词token与调用延迟
+    entities：可选，指定核心实体列表 [{"name", "label"}]；为空时查询关系最少的 batch_size 个实体
+    返回：与实体一一对应的结果列表（结构同 generate_question）；无有效实体时返回仅含一个error结果的列表
+    """
+    try:
+        entities = _select_batch_entities(entities, batch_size)
+        if not entities:
+            return [_no_entity_result(_new_question_result())]
+
+        chain_result = llm_chain.invoke({"agent_scratchpad": [_build_batch_message(entities)]})
+        raw_output = chain_result.content.strip() if hasattr(chain_result, "content") else str(chain_result)
+        _record_ask_usage(chain_result)
+        return _parse_batch_output(raw_output, entities)
     except Exception as e:
+        result = _new_question_result()
         result["status"] = "error"
-        result["error"] = f"[问智能体执行失败] 原因：{str(e)}"
+        result["error"] = f"[问智能体批量执行失败] 原因：{str(e)}"
+        print(result["error"])
+        return [result]
+
+
+async def agenerate_questions(entities: list = None, batch_size: int = 5) -> list:
+    """generate_questions 的异步版本：LLM调用使用ainvoke，仅Neo4j查询放入线程池"""
+    try:
+        entities = await asyncio.to_thread(_select_batch_entities, entities, batch_size)
+        if not entities:
+            return [_no_entity_result(_new_question_result())]
+
+        chain_result = await llm_chain.ainvoke({"agent_scratchpad": [_build_batch_message(entities)]})
+        raw_output = chain_result.content.strip() if hasattr(chain_result, "content") else str(chain_result)
+        _record_ask_usage(chain_result)
+        return _parse_batch_output(raw_output, entities)
+    except Exception as e:
+        result = _new_question_result()
+        result["status"] = "error"
+        result["error"] = f"[问智能体批量执行失败] 原因：{str(e)}"
         print(result["error"])
-    return result
\ No newline at end of file
+        return [result]
@@ -3,7 +3,13 @@ NEO4J_CONFIG = {
     "url": "bolt://172.18.57.69:7687",
     "username": "neo4j",
     "password": "learning123",
-    "database": "aip-graph"
+    "database": "aip-graph",
+    "transactional_batches": False,  # 是否按阶段（约束/节点/关系）在单个事务中批量执行Cypher
+    "compile_unwind_batches": False,  # 是否将节点/关系MERGE编译为参数化UNWIND批量语句执行
+    "degree_index": False,  # 是否用进程内度数索引选取关系最少的实体（仅首次全图扫描）
+    "graph_versioning": False,  # 写入成功后给涉及的节点/新建关系打版本号（_version）并按Label/关系类型建索引，供 /api/graph-data?since= 增量查询（每次写入多一次打标查询）
+    "stream_fetch_size": 1000,  # /api/graph-data/stream 流式导出时驱动每批拉取的记录数
+    "graph_snapshot_cache_size": 32  # /api/graph-data 按写入版本缓存的响应快照数（不同参数各占一项，0为不缓存，ETag/304仍生效）
 }
 
 # LLM配置（Deepseek）
@@ -12,22 +18,52 @@ DEEPSEEK_CONFIG = {
     "api_key": "xx",  # 替换为你的Deepseek API密钥
     "temperature": 0.1,
     "url": "https://api.deepseek.com",
-    "max-tokens": 8192
+    "max-tokens": 8192,
+    "timeout": 120,          # 单次LLM请求超时（秒）
+    "max_connections": 100,  # 问/答智能体共享HTTP连接池上限（长连接复用）
+    "response_cache": False,          # 是否缓存LLM响应（键：模型参数+渲染后消息的哈希），重跑/回放时不消耗token
+    "response_cache_path": "",        # 缓存SQLite文件路径（为空则使用 项目根目录/cache/llm_response_cache.sqlite3）
+    "response_cache_max_entries": 5000,  # 最多缓存的响应数（超出按最近访问时间淘汰）
+    "response_cache_bypass": False,   # 为True时不读缓存、总是调用LLM（仍写入最新响应），用于强制刷新
+    "requests_per_minute": 0,  # 全局限流：每分钟最多LLM请求数（0为不限），问/答智能体共享
+    "tokens_per_minute": 0     # 全局限流：每分钟最多token数（0为不限；调用前按提示词估算预扣，响应后补扣输出token）
 }
 
 # 工作流配置
 WORKFLOW_CONFIG = {
     "max_ask_count": 1,  # 答智能体最多触发2次ask
-    "loop_delay": 15      # 智能体循环延迟（秒）
+    "loop_delay": 15,     # 智能体循环延迟（秒）；配置了Deepseek/SerpAPI限流后可设为0，由限流器按额度控制速度
+    "pipeline_depth": 0,  # 流水线队列深度：0为串行模式，>0时问智能体最多提前生成N轮问题
+    "worker_concurrency": 1,  # 并发工作者数：>1时同时补全多个关系最少的实体（优先于流水线模式）
+    "entity_batch_size": 10,  # 并发模式下每次查询的候选实体数（应不小于并发数）
+    "ask_batch_size": 1,      # 串行/流水线模式下一次LLM调用生成的问题数（>1时为关系最少的多个实体批量出题）
+    "answer_batch_size": 1,   # 串行/流水线模式下一次LLM调用回答的问题数（>1时多个问题共用一次Cypher规范提示词，不支持流式推送）
+    "stream_answer": False,   # 是否流式推送答智能体输出（WebSocket消息 status="delta"）
+    "incremental_cypher": False  # 是否边生成边执行Cypher（每条语句分号到达即在事务中执行，代码块结束时提交；不使用transactional/compile_unwind_batches模式）
 }
 
-# 搜索工具配置（SerpAPI）
+# 搜索工具配置（SerpAPI / 本地离线搜索）
 SERPAPI_CONFIG = {
+    "backend": "serpapi",        # 搜索后端：serpapi 在线搜索；local 本地语料BM25离线搜索（无外网环境）
+    "local_corpus_dir": "",      # local后端语料目录（.txt按空行分段，.jsonl每行含text/content及可选title）
+    "local_index_path": "",      # local后端索引文件（为空则使用 项目根目录/cache/local_search_index.sqlite3，语料变化时自动重建）
+    "local_snippet_chars": 300,  # local后端每条结果的摘要长度
     # "url": "https://google.serper.dev/search",  # SerpAPI请求URL（核心新增）
     "api_key": "xxx",
     "engine": "google",
-    "timeout": 10,
-    "max_result_length": 500,
+    "timeout": 10,               # 读取超时（秒）
+    "connect_timeout": 5,        # 连接超时（秒）
+    "max_retries": 3,            # 超时/连接失败/429/5xx时的最大重试次数（指数退避+随机抖动）
+    "breaker_failure_threshold": 5,  # 连续失败多少次后熔断
+    "breaker_reset_timeout": 30,     # 熔断持续时间（秒），之后放行一次试探请求
+    "requests_per_minute": 0,    # 全局限流：每分钟最多搜索请求数（0为不限）
+    "max_result_length": 500,    # 传给答智能体的搜索摘要总字符上限
+    "top_n": 5,                  # 取前N条自然搜索结果的摘要
+    "token_budget": 600,         # 搜索摘要总token预算（按相关度排序后贪心装入）
     "hl": "zh-CN",
-    "gl": "cn"
+    "gl": "cn",
+    "cache_path": "",            # 搜索缓存SQLite文件路径（为空则使用 项目根目录/cache/search_cache.sqlite3）
+    "cache_max_entries": 10000,  # 搜索缓存最大条目数（超出按最近访问时间淘汰）
+    "cache_ttl": 604800,         # 搜索缓存有效期（秒），<=0为永不过期
+    "fuzzy_cache_threshold": 0.7  # 相似问题复用缓存的相似度阈值（设为1.0则仅复用归一化后完全相同的问题）
 }
\ No newline at end of file
@@ -3,6 +3,7 @@
 用于记录问答智能体各项活动的token消耗、API调用次数等
 """
 
+from contextvars import ContextVar
 from dataclasses import dataclass, field
 from typing import Dict, List
 import time
@@ -18,13 +19,20 @@ class ActivityStats:
     input_tokens: int = 0
     output_tokens: int = 0
     api_calls: int = 0
+    cache_hits: int = 0
+    cache_misses: int = 0
+    prompt_cache_hit_tokens: int = 0
+    prompt_cache_miss_tokens: int = 0
     
-    def add_llm_call(self, input_tokens: int = 0, output_tokens: int = 0):
-        """记录一次LLM调用"""
+    def add_llm_call(self, input_tokens: int = 0, output_tokens: int = 0,
+                     cache_hit_tokens: int = 0, cache_miss_tokens: int = 0):
+        """记录一次LLM调用（cache_hit/miss_tokens：输入中命中/未命中服务端前缀缓存的token数）"""
         self.count += 1
         self.input_tokens += input_tokens
         self.output_tokens += output_tokens
         self.total_tokens += (input_tokens + output_tokens)
+        self.prompt_cache_hit_tokens += cache_hit_tokens
+        self.prompt_cache_miss_tokens += cache_miss_tokens
     
     def add_api_call(self):
         """记录一次API调用（如搜索）"""
@@ -38,6 +46,59 @@ class ActivityStats:
     def increment(self):
         """简单计数加1"""
         self.count += 1
+    
+    def add_cache_lookup(self, hit: bool):
+        """记录一次缓存查询（命中/未命中）"""
+        self.count += 1
+        if hit:
+            self.cache_hits += 1
+        else:
+            self.cache_misses += 1
+    
+    @property
+    def cache_hit_ratio(self) -> float:
+        """缓存命中率"""
+        lookups = self.cache_hits + self.cache_misses
+        return self.cache_hits / lookups if lookups else 0.0
+    
+    @property
+    def prompt_cache_hit_ratio(self) -> float:
+        """输入token的前缀缓存命中率"""
+        prompt_tokens = self.prompt_cache_hit_tokens + self.prompt_cache_miss_tokens
+        return self.prompt_cache_hit_tokens / prompt_tokens if prompt_tokens else 0.0
+
+
+def extract_llm_usage(response):
+    """
+    从LLM响应中提取token用量，无法获取时返回None
+    返回：(输入token, 输出token, 前缀缓存命中token, 前缀缓存未命中token)
+    缓存字段优先取Deepseek的 prompt_cache_hit_tokens/prompt_cache_miss_tokens，
+    其次取OpenAI兼容格式的 cached_tokens（流式输出时仅有 usage_metadata.input_token_details）
+    """
+    usage_metadata = getattr(response, "usage_metadata", None) or {}
+    token_usage = (getattr(response, "response_metadata", None) or {}).get("token_usage") or {}
+    if usage_metadata:
+        input_tokens = usage_metadata.get("input_tokens", 0)
+        output_tokens = usage_metadata.get("output_tokens", 0)
+    elif token_usage:
+        # 兼容旧版本Langchain
+        input_tokens = token_usage.get("prompt_tokens", 0)
+        output_tokens = token_usage.get("completion_tokens", 0)
+    else:
+        return None
+
+    cache_hit = token_usage.get("prompt_cache_hit_tokens")
+    cache_miss = token_usage.get("prompt_cache_miss_tokens")
+    if cache_hit is None:
+        cache_hit = (usage_metadata.get("input_token_details") or {}).get("cache_read")
+    if cache_hit is None:
+        cache_hit = (token_usage.get("prompt_tokens_details") or {}).get("cached_tokens")
+    if cache_hit is None:
+        # 服务端未返回缓存信息：不计入命中率
+        return input_tokens, output_tokens, 0, 0
+    if cache_miss is None:
+        cache_miss = max(input_tokens - cache_hit, 0)
+    return input_tokens, output_tokens, cache_hit, cache_miss
 
 
 class CostTracker:
@@ -62,6 +123,7 @@ class CostTracker:
             ("answer_llm_call", "答智能体调用LLM汇总搜索结果并生成Cypher语句"),
             ("human_feedback", "人机评价机制（未开发）"),
             ("cypher_execution", "答智能体执行Cypher工具补充知识图谱"),
+            ("search_cache", "答智能体搜索缓存查询"),
         ]
         
         for key, desc in activity_definitions:
@@ -83,17 +145,27 @@ class CostTracker:
         """记录问智能体Cypher查询"""
         self.activities["ask_cypher_query"].add_db_call()
     
-    def record_ask_llm_call(self, input_tokens: int = 0, output_tokens: int = 0):
+    def record_ask_llm_call(self, input_tokens: int = 0, output_tokens: int = 0,
+                            cache_hit_tokens: int = 0, cache_miss_tokens: int = 0):
         """记录问智能体LLM调用"""
-        self.activities["ask_llm_call"].add_llm_call(input_tokens, output_tokens)
+        self.activities["ask_llm_call"].add_llm_call(input_tokens, output_tokens, cache_hit_tokens, cache_miss_tokens)
     
     def record_answer_search_call(self):
         """记录答智能体搜索调用"""
         self.activities["answer_search_call"].add_api_call()
     
-    def record_answer_llm_call(self, input_tokens: int = 0, output_tokens: int = 0):
+    def record_answer_llm_call(self, input_tokens: int = 0, output_tokens: int = 0,
+                               cache_hit_tokens: int = 0, cache_miss_tokens: int = 0):
         """记录答智能体LLM调用"""
-        self.activities["answer_llm_call"].add_llm_call(input_tokens, output_tokens)
+        self.activities["answer_llm_call"].add_llm_call(input_tokens, output_tokens, cache_hit_tokens, cache_miss_tokens)
+    
+    def record_search_cache_hit(self):
+        """记录搜索缓存命中（未调用SerpAPI）"""
+        self.activities["search_cache"].add_cache_lookup(True)
+    
+    def record_search_cache_miss(self):
+        """记录搜索缓存未命中（将调用SerpAPI）"""
+        self.activities["search_cache"].add_cache_lookup(False)
     
     def record_cypher_execution(self, statement_count: int = 1):
         """记录Cypher执行（可指定执行了多少条语句）"""
@@ -124,6 +196,11 @@ class CostTracker:
                     "input_tokens": stats.input_tokens,
                     "output_tokens": stats.output_tokens,
                     "api_calls": stats.api_calls,
+                    "cache_hits": stats.cache_hits,
+                    "cache_misses": stats.cache_misses,
+                    "prompt_cache_hit_tokens": stats.prompt_cache_hit_tokens,
+                    "prompt_cache_miss_tokens": stats.prompt_cache_miss_tokens,
+                    "prompt_cache_hit_ratio": stats.prompt_cache_hit_ratio,
                 }
                 for key, stats in self.activities.items()
             }
@@ -193,6 +270,13 @@ class CostTracker:
                 f"{self.activities['cypher_execution'].count}次",
                 "0"
             ),
+            (
+                8,
+                "答智能体搜索缓存查询",
+                "命中时不调用SerpAPI，无模型token消耗",
+                f"{self.activities['search_cache'].count}次",
+                f"命中:{self.activities['search_cache'].cache_hits} / 未命中:{self.activities['search_cache'].cache_misses} / 命中率:{self.activities['search_cache'].cache_hit_ratio:.1%}"
+            ),
         ]
         
         for row in rows:
@@ -212,15 +296,29 @@ class CostTracker:
         print(f"  - 外部API调用总次数: {total_api_calls}")
         print(f"  - 数据库查询次数: {self.activities['ask_cypher_query'].count}")
         print(f"  - 数据库写入次数: {self.activities['cypher_execution'].count}")
+        print(f"  - 搜索缓存命中率: {self.activities['search_cache'].cache_hit_ratio:.1%}")
+        for key, label in (("ask_llm_call", "问智能体"), ("answer_llm_call", "答智能体")):
+            stats = self.activities[key]
+            print(
+                f"  - {label}提示词前缀缓存命中率: {stats.prompt_cache_hit_ratio:.1%}"
+                f"（命中:{stats.prompt_cache_hit_tokens} / 未命中:{stats.prompt_cache_miss_tokens} token）"
+            )
         print(f"  - 工作流运行时长: {duration:.2f}秒")
         print()
 
 
 # 全局单例
 _global_tracker = CostTracker()
+# 当前上下文的追踪器：同时运行多个工作流任务时，每个任务（asyncio上下文）各自统计
+_current_tracker: ContextVar = ContextVar("cost_tracker", default=None)
 
 
 def get_tracker() -> CostTracker:
-    """获取全局追踪器实例"""
-    return _global_tracker
+    """获取当前任务的追踪器实例（未设置时为全局追踪器）"""
+    return _current_tracker.get() or _global_tracker
+
+
+def use_tracker(tracker: CostTracker):
+    """为当前上下文（asyncio任务及其派生的协程/线程）指定追踪器"""
+    _current_tracker.set(tracker)
 
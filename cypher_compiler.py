@@ -0,0 +1,214 @@
+"""
+Cypher批量编译器
+把LLM生成的逐条 MERGE 节点 / MATCH-MATCH-MERGE 关系语句识别为
+(label, name, props) 与 (src, rel, dst) 元组，再按Label/关系类型合并为参数化的 UNWIND 批量语句，
+减少数据库往返次数并让Neo4j复用查询计划；无法识别的语句原样保留，逐条执行
+"""
+
+import re
+
+# 字面量：单/双引号字符串、数字、布尔值、null
+_LITERAL = r"""'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*"|-?\d+(?:\.\d+)?|true|false|null"""
+# Label/关系类型：普通标识符（支持中文）或反引号包裹
+_NAME = r"`(?:[^`]|``)+`|\w+"
+
+_NODE_PATTERN = re.compile(
+    rf"^MERGE\s*\(\s*(?P<var>\w+)\s*:\s*(?P<label>{_NAME})\s*\{{\s*name\s*:\s*(?P<name>{_LITERAL})\s*\}}\s*\)"
+    rf"(?:\s+ON\s+CREATE\s+SET\s+(?P<set>.+?))?\s*;?$",
+    re.IGNORECASE | re.DOTALL,
+)
+
+_MATCH_NODE = rf"\(\s*(\w+)\s*:\s*({_NAME})\s*\{{\s*name\s*:\s*({_LITERAL})\s*\}}\s*\)"
+_RELATIONSHIP_PATTERN = re.compile(
+    rf"^MATCH\s*{_MATCH_NODE}\s*(?:MATCH\s*|,\s*){_MATCH_NODE}\s*"
+    rf"MERGE\s*\(\s*(?P<left>\w+)\s*\)\s*(?P<ldir><-|-)\s*\[\s*(?P<rvar>\w*)\s*:\s*(?P<rel>{_NAME})\s*\]\s*(?P<rdir>->|-)\s*\(\s*(?P<right>\w+)\s*\)"
+    rf"(?:\s+ON\s+CREATE\s+SET\s+(?P<set>.+?))?\s*;?$",
+    re.IGNORECASE | re.DOTALL,
+)
+
+# 语句中任意位置按name定位的节点模式：(变量:Label {name: 字面量 ...})
+_NAMED_NODE = re.compile(rf"\(\s*\w*\s*:\s*({_NAME})\s*\{{\s*name\s*:\s*({_LITERAL})\s*[,}}]")
+
+_SET_ITEM = re.compile(rf"\s*(\w+)\.(\w+)\s*=\s*({_LITERAL})\s*(?:,|$)", re.IGNORECASE)
+
+
+def _parse_literal(token: str):
+    lowered = token.lower()
+    if lowered == "true":
+        return True
+    if lowered == "false":
+        return False
+    if lowered == "null":
+        return None
+    if token[0] in "'\"":
+        # 去掉引号并处理常见转义
+        return re.sub(r"\\(.)", lambda m: {"n": "\n", "t": "\t"}.get(m.group(1), m.group(1)), token[1:-1])
+    return float(token) if "." in token else int(token)
+
+
+def _parse_name(token: str) -> str:
+    if token.startswith("`"):
+        return token[1:-1].replace("``", "`")
+    return token
+
+
+def _parse_set_clause(text: str, var: str):
+    """解析 ON CREATE SET 子句；只接受「变量.属性 = 字面量」形式，否则返回None（回退原样执行）"""
+    props = {}
+    if not text:
+        return props
+    pos = 0
+    while pos < len(text):
+        match = _SET_ITEM.match(text, pos)
+        if not match or match.group(1) != var:
+            return None
+        props[match.group(2)] = _parse_literal(match.group(3))
+        pos = match.end()
+    return props
+
+
+def compile_statement(stmt: str):
+    """
+    识别单条语句
+    返回：
+      节点 → {"kind": "node", "label", "name", "props"}
+      关系 → {"kind": "relationship", "src_label", "src", "rel", "dst_label", "dst", "props"}
+      无法识别 → None
+    """
+    normalized = " ".join(stmt.split())
+
+    match = _NODE_PATTERN.match(normalized)
+    if match:
+        props = _parse_set_clause(match.group("set"), match.group("var"))
+        name = _parse_literal(match.group("name"))
+        if props is None or not isinstance(name, str):
+            return None
+        return {"kind": "node", "label": _parse_name(match.group("label")), "name": name, "props": props}
+
+    match = _RELATIONSHIP_PATTERN.match(normalized)
+    if match:
+        var_a, label_a, name_a, var_b, label_b, name_b = match.groups()[:6]
+        nodes = {var_a: (_parse_name(label_a), _parse_literal(name_a)),
+                 var_b: (_parse_name(label_b), _parse_literal(name_b))}
+        left, right = match.group("left"), match.group("right")
+        if var_a == var_b or {left, right} != {var_a, var_b}:
+            return None
+        # 只支持有向关系：(l)-[]->(r) 或 (l)<-[]-(r)
+        if match.group("ldir") == "-" and match.group("rdir") == "->":
+            src, dst = left, right
+        elif match.group("ldir") == "<-" and match.group("rdir") == "-":
+            src, dst = right, left
+        else:
+            return None
+        props = _parse_set_clause(match.group("set"), match.group("rvar"))
+        if props is None or not all(isinstance(name, str) for _, name in nodes.values()):
+            return None
+        return {
+            "kind": "relationship",
+            "src_label": nodes[src][0],
+            "src": nodes[src][1],
+            "rel": _parse_name(match.group("rel")),
+            "dst_label": nodes[dst][0],
+            "dst": nodes[dst][1],
+            "props": props,
+        }
+    return None
+
+
+def extract_named_nodes(stmt: str) -> list:
+    """提取语句中所有 (变量:Label {name: ...}) 形式的节点，返回 [(label, name), ...]（去重、保持顺序）"""
+    nodes = []
+    for label, name in _NAMED_NODE.findall(" ".join(stmt.split())):
+        node = (_parse_name(label), _parse_literal(name))
+        if isinstance(node[1], str) and node not in nodes:
+            nodes.append(node)
+    return nodes
+
+
+def quote_name(name: str) -> str:
+    return "`" + name.replace("`", "``") + "`"
+
+
+def build_node_batch_query(label: str) -> str:
+    return (
+        "UNWIND $rows AS row\n"
+        f"MERGE (n:{quote_name(label)} {{name: row.name}})\n"
+        "ON CREATE SET n += row.props\n"
+        "RETURN row.idx AS idx"
+    )
+
+
+def build_relationship_batch_query(src_label: str, rel: str, dst_label: str) -> str:
+    """created：MERGE前该关系是否不存在（即本行新建了关系，供度数索引只统计新关系）"""
+    return (
+        "UNWIND $rows AS row\n"
+        f"MATCH (a:{quote_name(src_label)} {{name: row.src}})\n"
+        f"MATCH (b:{quote_name(dst_label)} {{name: row.dst}})\n"
+        f"OPTIONAL MATCH (a)-[existing:{quote_name(rel)}]->(b)\n"
+        "WITH row, a, b, count(existing) = 0 AS created\n"
+        f"MERGE (a)-[r:{quote_name(rel)}]->(b)\n"
+        "ON CREATE SET r += row.props\n"
+        "RETURN row.idx AS idx, created"
+    )
+
+
+def compile_statements(statements: list) -> list:
+    """
+    将有序语句列表编译为执行计划
+    statements：[(idx, 语句), ...]，idx 为该语句的步骤编号
+    返回：[{"query": 批量语句或None, "params": 参数或None, "statements": [(idx, 语句), ...]}, ...]
+          query为None表示原样执行的单条语句
+    节点/关系交替出现或遇到原样执行的语句时重新分组，
+    保证每条语句都在其前面的语句（批次）之后执行，不会被合并到更早的批次中
+    """
+    plan = []
+    buckets = {}
+    current_kind = None
+    for idx, stmt in statements:
+        compiled = compile_statement(stmt)
+        if compiled is None:
+            plan.append({"query": None, "params": None, "statements": [(idx, stmt)]})
+            # 关闭当前批次：其后的语句不能并入该语句之前的批次（如关系MERGE依赖该语句创建的节点）
+            buckets = {}
+            current_kind = None
+            continue
+        if compiled["kind"] != current_kind:
+            current_kind = compiled["kind"]
+            buckets = {}
+
+        if compiled["kind"] == "node":
+            key = ("node", compiled["label"])
+            row = {"idx": idx, "name": compiled["name"], "props": compiled["props"]}
+        else:
+            key = ("relationship", compiled["src_label"], compiled["rel"], compiled["dst_label"])
+            row = {"idx": idx, "src": compiled["src"], "dst": compiled["dst"], "props": compiled["props"]}
+
+        if key not in buckets:
+            query = build_node_batch_query(*key[1:]) if key[0] == "node" else build_relationship_batch_query(*key[1:])
+            buckets[key] = {"query": query, "params": {"rows": []}, "statements": []}
+            plan.append(buckets[key])
+        buckets[key]["params"]["rows"].append(row)
+        buckets[key]["statements"].append((idx, stmt))
+    return plan
+
+
+def count_created_relationships(item: dict, records: list) -> dict:
+    """
+    根据关系批量语句返回的 (idx, created) 行统计每个步骤新建的关系数：{idx: 1}
+    created 在MERGE前统一计算，同一批次内重复的 (起点, 终点) 只有第一次出现的步骤计为新建
+    """
+    rows = {row["idx"]: row for row in item["params"]["rows"]}
+    counted = set()
+    created = {}
+    for record in sorted(records, key=lambda r: r["idx"]):
+        if not record.get("created"):
+            continue
+        row = rows.get(record["idx"])
+        if row is None or "src" not in row:
+            continue
+        pair = (row["src"], row["dst"])
+        if pair in counted:
+            continue
+        counted.add(pair)
+        created[record["idx"]] = 1
+    return created
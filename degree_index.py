@@ -0,0 +1,95 @@
+"""
+实体度数索引
+进程内最小堆维护每个实体的关系数（度），启动时从Neo4j全量加载一次，
+之后根据Cypher写入结果增量更新，使「选取关系最少的实体」不再随图谱规模线性变慢
+"""
+
+import heapq
+import itertools
+from threading import Lock
+
+
+class DegreeIndex:
+    """
+    带惰性删除的最小堆：度数变化时压入新条目，旧条目在出堆时按版本号丢弃
+    排序规则与原查询一致：度数升序，其次按节点id升序（新建节点排在已有节点之后）
+    """
+    def __init__(self):
+        self.heap = []  # (度数, 排序序号, 实体键)
+        self.degrees = {}  # 实体键 → 当前度数
+        self.entities = {}  # 实体键 → {"name", "label"}
+        self.order = {}  # 实体键 → 排序序号
+        self.sequence = itertools.count()
+        self.lock = Lock()
+        self.seeded = False
+
+    @staticmethod
+    def entity_key(label: str, name: str) -> str:
+        return f"{label}:{name}"
+
+    def seed(self, rows: list):
+        """全量加载：rows 为 [{"name", "label", "degree", "node_id"}, ...]"""
+        with self.lock:
+            self.heap = []
+            self.degrees = {}
+            self.entities = {}
+            self.order = {}
+            rows = sorted(rows, key=lambda row: row.get("node_id", 0))
+            self.sequence = itertools.count()
+            for row in rows:
+                key = self.entity_key(row["label"], row["name"])
+                self._set(key, {"name": row["name"], "label": row["label"]}, row["degree"])
+            self.seeded = True
+
+    def _set(self, key: str, entity: dict, degree: int):
+        if key not in self.order:
+            self.order[key] = next(self.sequence)
+            self.entities[key] = entity
+        self.degrees[key] = degree
+        heapq.heappush(self.heap, (degree, self.order[key], key))
+
+    def contains(self, label: str, name: str) -> bool:
+        with self.lock:
+            return self.entity_key(label, name) in self.degrees
+
+    def add_node(self, label: str, name: str):
+        """新节点（已存在则忽略）"""
+        key = self.entity_key(label, name)
+        with self.lock:
+            if key not in self.degrees:
+                self._set(key, {"name": name, "label": label}, 0)
+
+    def add_relationship(self, src: tuple, dst: tuple) -> bool:
+        """
+        新增关系：两端实体度数各加1（src/dst 为 (label, name)）
+        任一端不在索引中时视为MATCH未命中，不更新并返回False
+        """
+        src_key, dst_key = self.entity_key(*src), self.entity_key(*dst)
+        with self.lock:
+            if src_key not in self.degrees or dst_key not in self.degrees:
+                return False
+            for key in (src_key, dst_key):
+                self._set(key, self.entities[key], self.degrees[key] + 1)
+            return True
+
+    def smallest(self, k: int, exclude_keys=None) -> list:
+        """返回度数最小的 k 个实体（跳过 exclude_keys），复杂度 O(k log n)"""
+        exclude_keys = set(exclude_keys or [])
+        picked = []
+        popped = []
+        with self.lock:
+            while self.heap and len(picked) < k:
+                entry = heapq.heappop(self.heap)
+                degree, _, key = entry
+                if self.degrees.get(key) != degree:
+                    continue  # 过期条目，直接丢弃
+                popped.append(entry)
+                if key not in exclude_keys:
+                    picked.append(dict(self.entities[key]))
+            # 有效条目放回堆中
+            for entry in popped:
+                heapq.heappush(self.heap, entry)
+        return picked
+
+    def __len__(self):
+        return len(self.degrees)
@@ -0,0 +1,110 @@
+"""
+图谱列式编码（/api/graph-data?format=columnar）
+默认格式中每个节点/关系都重复 "id": "node_123"、"type"、"label" 等键，且关系的 label/type 重复；
+列式格式改为整数id、Label/关系类型字典编码、按列存放的平行数组，显著减小响应体积与前端解析耗时
+
+格式说明（解码规则，decode_columnar 为参考实现）：
+{
+  "format": "columnar",
+  "labels": ["电脑", "电脑品牌", ...],        # 节点Label字典
+  "types":  ["品牌属于", ...],                # 关系类型字典
+  "nodes": {
+    "id":         [123, 124, ...],           # Neo4j节点id（默认格式中的 "node_123"）
+    "type":       [0, 1, ...],               # labels 下标；-1 表示无Label
+    "name":       ["联想", null, ...],       # name属性；null 表示无name
+    "properties": [{...}, {}, ...],          # 除 name 与 _version 外的其余属性
+    "version":    [3, 0, ...]                # 写入版本号（0 表示版本化之前写入）
+  },
+  "edges": {
+    "id":     [77, ...],                     # Neo4j关系id（默认格式中的 "edge_77"）
+    "source": [123, ...],                    # 起点节点id
+    "target": [124, ...],                    # 终点节点id
+    "type":   [0, ...]                       # types 下标
+  }
+}
+第 i 个节点 = 各 nodes 数组的第 i 个元素；其默认格式为
+  {"id": "node_" + id, "type": labels[type] 或 "未知类型",
+   "label": 无Label时为 "未知实体"，否则为 name 或 labels[type], "properties": {name, ...properties}, "version": version}
+第 j 条关系 = 各 edges 数组的第 j 个元素；其默认格式为
+  {"id": "edge_" + id, "from": "node_" + source, "to": "node_" + target, "label": types[type], "type": types[type]}
+"""
+
+from graph_version import VERSION_PROPERTY
+
+FORMAT_COLUMNAR = "columnar"
+
+
+class _Dictionary:
+    """字典编码：值 → 首次出现顺序的下标"""
+    def __init__(self):
+        self.values = []
+        self.index = {}
+
+    def encode(self, value) -> int:
+        if value not in self.index:
+            self.index[value] = len(self.values)
+            self.values.append(value)
+        return self.index[value]
+
+
+def encode_columnar(node_rows: list, edge_rows: list) -> dict:
+    """
+    将Neo4j查询原始行编码为列式格式
+    node_rows：[{"id", "labels", "properties"}, ...]；edge_rows：[{"edge_id", "source", "target", "type"}, ...]
+    """
+    labels, types = _Dictionary(), _Dictionary()
+    nodes = {"id": [], "type": [], "name": [], "properties": [], "version": []}
+    for row in node_rows:
+        properties = dict(row["properties"])
+        nodes["id"].append(row["id"])
+        nodes["type"].append(labels.encode(row["labels"][0]) if row["labels"] else -1)
+        nodes["name"].append(properties.pop("name", None))
+        nodes["version"].append(properties.pop(VERSION_PROPERTY, 0))
+        nodes["properties"].append(properties)
+
+    edges = {"id": [], "source": [], "target": [], "type": []}
+    for row in edge_rows:
+        edges["id"].append(row["edge_id"])
+        edges["source"].append(row["source"])
+        edges["target"].append(row["target"])
+        edges["type"].append(types.encode(row["type"]))
+
+    return {
+        "format": FORMAT_COLUMNAR,
+        "labels": labels.values,
+        "types": types.values,
+        "nodes": nodes,
+        "edges": edges
+    }
+
+
+def decode_columnar(data: dict) -> dict:
+    """参考解码：列式格式 → 默认格式的 {"nodes": [...], "edges": [...]}（前端可按同样规则实现）"""
+    labels, types = data["labels"], data["types"]
+    columns = data["nodes"]
+    nodes = []
+    for i, node_id in enumerate(columns["id"]):
+        label = labels[columns["type"][i]] if columns["type"][i] >= 0 else None
+        name = columns["name"][i]
+        properties = dict(columns["properties"][i])
+        if name is not None:
+            properties = {"name": name, **properties}
+        nodes.append({
+            "id": f"node_{node_id}",
+            "label": (name if name is not None else label) if label else "未知实体",
+            "type": label or "未知类型",
+            "properties": properties,
+            "version": columns["version"][i]
+        })
+    columns = data["edges"]
+    edges = [
+        {
+            "id": f"edge_{edge_id}",
+            "from": f"node_{columns['source'][j]}",
+            "to": f"node_{columns['target'][j]}",
+            "label": types[columns["type"][j]],
+            "type": types[columns["type"][j]]
+        }
+        for j, edge_id in enumerate(columns["id"])
+    ]
+    return {"nodes": nodes, "edges": edges}
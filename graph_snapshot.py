@@ -0,0 +1,72 @@
+"""
+图谱快照缓存
+以「图谱写入版本号 + 请求参数」为键缓存 /api/graph-data 已序列化的响应体：
+两轮写入之间的重复请求直接返回缓存，不再查询Neo4j、也不再重新序列化；
+同时生成 ETag，客户端携带 If-None-Match 且版本未变化时返回 304，连响应体都不必传输
+"""
+
+import hashlib
+import json
+import uuid
+from collections import OrderedDict
+from threading import Lock
+
+
+class GraphSnapshotCache:
+    """
+    进程内LRU缓存：(请求参数键) → (版本号, 响应体bytes)
+    版本号前进后旧版本的快照全部失效，在下次写入缓存时清除
+    """
+    def __init__(self, max_entries: int = 32):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = Lock()
+        # 进程标识：版本号计数器随进程重启可能回退，ETag中带上进程标识避免与重启前的ETag误匹配
+        self.epoch = uuid.uuid4().hex[:8]
+
+    @staticmethod
+    def request_key(**params) -> str:
+        """请求参数 → 缓存键（参数顺序无关）"""
+        return json.dumps(params, sort_keys=True, ensure_ascii=False, default=str)
+
+    def etag(self, version: int, key: str) -> str:
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:12]
+        return f'"{self.epoch}-{version}-{digest}"'
+
+    @staticmethod
+    def etag_matches(if_none_match: str, etag: str) -> bool:
+        """判断请求头 If-None-Match（可能为逗号分隔的多个值或弱校验 W/ 前缀）是否命中"""
+        if not if_none_match:
+            return False
+        candidates = [value.strip() for value in if_none_match.split(",")]
+        return "*" in candidates or any(value.removeprefix("W/") == etag for value in candidates)
+
+    def get(self, key: str, version: int):
+        """返回该版本下缓存的响应体，未命中或版本已变化时返回None"""
+        if self.max_entries <= 0:
+            return None
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] != version:
+                return None
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key: str, version: int, body: bytes):
+        if self.max_entries <= 0:
+            return
+        with self.lock:
+            # 清除旧版本快照；若查询期间版本已前进，旧版本的结果不覆盖新版本的快照
+            for stale in [k for k, (v, _) in self.entries.items() if v < version]:
+                del self.entries[stale]
+            current = self.entries.get(key)
+            if current is not None and current[0] > version:
+                return
+            self.entries[key] = (version, body)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
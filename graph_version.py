@@ -0,0 +1,192 @@
+"""
+图谱写入版本
+每次Cypher写入成功后，图谱版本号加一，并把本次写入涉及的节点及其新建关系打上 _version 属性，
+使 /api/graph-data 可以只返回某个版本之后新增/变更的节点与关系（增量刷新），
+并支持按节点/关系id游标分页，避免每次请求都全图查询、一次性返回；
+打标同时取回本次新增/变更的节点与新建关系，经变更推送（GraphChangeFeed）实时通知前端
+"""
+
+from threading import Lock
+
+from cypher_compiler import extract_named_nodes, quote_name
+
+# 节点/关系上记录写入版本的属性名（返回给前端时从properties中移除）
+VERSION_PROPERTY = "_version"
+
+# 分页游标：n:<节点id> 表示节点分页进行中，e:<关系id> 表示节点已取完、关系分页进行中
+CURSOR_NODES = "n"
+CURSOR_EDGES = "e"
+
+
+class GraphVersion:
+    """
+    进程内图谱版本计数器：首次使用时从Neo4j中已有的最大 _version 恢复，之后每次写入加一
+    写入方先以 current + 1 为本次版本号完成打标，再调用 bump 发布，
+    保证读取方看到版本号 v 时，版本 v 的打标已经提交（以 since=v 增量查询不会漏掉数据）
+    """
+    def __init__(self):
+        self.current = 0
+        self.seeded = False
+        self.lock = Lock()
+
+    def seed(self, value: int):
+        with self.lock:
+            self.current = max(self.current, int(value or 0))
+            self.seeded = True
+
+    def bump(self) -> int:
+        """打标完成后调用，发布并返回新的版本号"""
+        with self.lock:
+            self.current += 1
+            return self.current
+
+
+def _is_successful_write(step: dict) -> bool:
+    """执行成功的写语句（约束语句与纯查询不计）"""
+    if step.get("status") != "success" or step.get("type") == "constraint":
+        return False
+    cypher = step.get("cypher", "").upper()
+    return any(keyword in cypher for keyword in ("MERGE", "CREATE", "SET"))
+
+
+def has_successful_writes(execution_results: list) -> bool:
+    return any(_is_successful_write(step) for step in execution_results)
+
+
+def collect_written_nodes(execution_results: list) -> dict:
+    """
+    从Cypher执行结果中收集本次写入涉及的节点（按name定位的节点）
+    仅统计执行成功的写语句
+    返回：{label: [name, ...]}
+    """
+    written = {}
+    for step in execution_results:
+        if not _is_successful_write(step):
+            continue
+        for label, name in extract_named_nodes(step["cypher"]):
+            names = written.setdefault(label, [])
+            if name not in names:
+                names.append(name)
+    return written
+
+
+def build_stamp_query(label: str) -> str:
+    """
+    为某个Label下的写入节点打版本号，并为其尚无版本号的关系（即本次新建的关系）打版本号
+    返回被打标节点的数据、打标前的版本号（为null表示新建节点）以及新建关系的数据
+    """
+    return (
+        "UNWIND $names AS name\n"
+        f"MATCH (n:{quote_name(label)} {{name: name}})\n"
+        f"WITH n, n.{VERSION_PROPERTY} AS previous\n"
+        f"SET n.{VERSION_PROPERTY} = $version\n"
+        "WITH n, previous\n"
+        "OPTIONAL MATCH (n)-[r]-()\n"
+        f"WHERE r.{VERSION_PROPERTY} IS NULL\n"
+        f"SET r.{VERSION_PROPERTY} = $version\n"
+        "RETURN id(n) AS id, labels(n) AS labels, properties(n) AS properties, previous,\n"
+        "       collect(CASE WHEN r IS NOT NULL THEN "
+        "{edge_id: id(r), source: id(startNode(r)), target: id(endNode(r)), type: type(r)} END) AS edges"
+    )
+
+
+def build_node_version_index_query(label: str) -> str:
+    """按Label为 _version 建索引：单Label的 since 增量查询走索引，不再扫描该Label下全部节点"""
+    return f"CREATE INDEX IF NOT EXISTS FOR (n:{quote_name(label)}) ON (n.{VERSION_PROPERTY})"
+
+
+def build_edge_version_index_query(rel_type: str) -> str:
+    """按关系类型为 _version 建索引（单关系类型的 since 增量查询使用）"""
+    return f"CREATE INDEX IF NOT EXISTS FOR ()-[r:{quote_name(rel_type)}]-() ON (r.{VERSION_PROPERTY})"
+
+
+class GraphChangeFeed:
+    """
+    图谱变更推送：每次写入打标完成后发布一条带递增序号（seq）的变更，依次回调订阅者
+    订阅者在写入线程中被调用，应只做转发（如投递到事件循环），不应阻塞
+    前端发现序号不连续时，可用 since=上一条变更的 version 增量查询补齐
+    """
+    def __init__(self):
+        self.seq = 0
+        self.listeners = []
+        self.lock = Lock()
+
+    def subscribe(self, listener):
+        self.listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def publish(self, change: dict) -> dict:
+        """分配序号并通知订阅者（加锁保证订阅者按序号顺序收到变更），返回带序号的变更"""
+        with self.lock:
+            self.seq += 1
+            event = {"seq": self.seq, **change}
+            for listener in list(self.listeners):
+                try:
+                    listener(event)
+                except Exception as e:
+                    print(f"⚠️ 图谱变更推送失败：{str(e)[:100]}")
+            return event
+
+
+def encode_cursor(kind: str, last_id: int) -> str:
+    return f"{kind}:{last_id}"
+
+
+def decode_cursor(cursor: str):
+    """解析分页游标，返回 (kind, last_id)；为空时从节点开头开始"""
+    if not cursor:
+        return CURSOR_NODES, -1
+    kind, _, last_id = cursor.partition(":")
+    if kind not in (CURSOR_NODES, CURSOR_EDGES) or not last_id.lstrip("-").isdigit():
+        raise ValueError(f"无效的分页游标：{cursor}")
+    return kind, int(last_id)
+
+
+def parse_filter(value) -> list:
+    """解析逗号分隔的Label/关系类型过滤参数"""
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(",")
+    return [item.strip() for item in value if item and item.strip()]
+
+
+def build_nodes_page_query(labels: list, since: int = None, limit: int = None, ordered: bool = True) -> str:
+    """
+    按节点id升序分页查询节点；单个Label时走Label扫描，since 只返回该版本之后写入的节点
+    ordered=False 时不排序（流式导出用，避免排序阻塞首条记录返回）
+    """
+    pattern = f"(n:{quote_name(labels[0])})" if len(labels) == 1 else "(n)"
+    conditions = ["id(n) > $after"]
+    if len(labels) > 1:
+        conditions.append("any(l IN labels(n) WHERE l IN $labels)")
+    if since is not None:
+        conditions.append(f"n.{VERSION_PROPERTY} > $since")
+    return (
+        f"MATCH {pattern}\n"
+        f"WHERE {' AND '.join(conditions)}\n"
+        "RETURN id(n) AS id, labels(n) AS labels, properties(n) AS properties"
+        + ("\nORDER BY id" if ordered else "")
+        + ("\nLIMIT $limit" if limit else "")
+    )
+
+
+def build_edges_page_query(labels: list, types: list, since: int = None, limit: int = None, ordered: bool = True) -> str:
+    """按关系id升序分页查询关系；指定Label时只返回两端节点都满足Label过滤的关系"""
+    rel = f"[r:{'|'.join(quote_name(t) for t in types)}]" if types else "[r]"
+    conditions = ["id(r) > $after"]
+    if labels:
+        conditions.append("any(l IN labels(n) WHERE l IN $labels)")
+        conditions.append("any(l IN labels(m) WHERE l IN $labels)")
+    if since is not None:
+        conditions.append(f"r.{VERSION_PROPERTY} > $since")
+    return (
+        f"MATCH (n)-{rel}->(m)\n"
+        f"WHERE {' AND '.join(conditions)}\n"
+        "RETURN id(r) AS edge_id, id(n) AS source, id(m) AS target, type(r) AS type"
+        + ("\nORDER BY edge_id" if ordered else "")
+        + ("\nLIMIT $limit" if limit else "")
+    )
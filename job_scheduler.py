@@ -0,0 +1,122 @@
+"""
+工作流任务调度
+每次工作流运行是一个带ID的asyncio任务（Job），各自持有运行参数、进度与消耗统计，
+可同时运行多个；支持优雅停止（当前轮结束后退出）与立即取消，供 /api/jobs 查询状态
+"""
+
+import asyncio
+import time
+import uuid
+
+from cost_tracker import CostTracker, use_tracker
+
+# 任务状态
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_FINISHED = "finished"      # 正常结束（达到最大轮数或无可用实体）
+JOB_STOPPED = "stopped"        # 收到停止信号后优雅退出
+JOB_CANCELLED = "cancelled"    # 被立即取消
+JOB_FAILED = "failed"          # 异常结束
+ACTIVE_STATUSES = (JOB_PENDING, JOB_RUNNING)
+
+
+class Job:
+    """一次工作流运行"""
+    def __init__(self, params: dict):
+        self.id = uuid.uuid4().hex[:12]
+        self.params = params
+        self.status = JOB_PENDING
+        self.stop_requested = False
+        self.rounds_completed = 0  # 已完成的轮数（原全局 ask_count）
+        self.message = ""
+        self.error = ""
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.tracker = CostTracker()  # 每个任务独立统计消耗
+        self.task = None
+
+    @property
+    def running(self) -> bool:
+        """工作流循环是否应继续（未收到停止信号）"""
+        return self.status == JOB_RUNNING and not self.stop_requested
+
+    def to_dict(self, detail: bool = False) -> dict:
+        data = {
+            "id": self.id,
+            "status": self.status,
+            "params": self.params,
+            "rounds_completed": self.rounds_completed,
+            "stop_requested": self.stop_requested,
+            "message": self.message,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if detail:
+            data["cost_summary"] = self.tracker.get_summary()
+        return data
+
+
+class JobScheduler:
+    def __init__(self, max_history: int = 100):
+        """max_history：最多保留的已结束任务数，超出后丢弃最早结束的任务"""
+        self.jobs = {}
+        self.max_history = max_history
+
+    def submit(self, runner, params: dict) -> Job:
+        """创建任务并立即在当前事件循环中调度；runner 为 async def runner(job)"""
+        job = Job(params)
+        self.jobs[job.id] = job
+        job.task = asyncio.create_task(self._run(job, runner), name=f"workflow-{job.id}")
+        return job
+
+    async def _run(self, job: Job, runner):
+        # 任务在独立的上下文中运行：此处设置的统计器只对本任务（及其调用的线程）生效
+        use_tracker(job.tracker)
+        job.status = JOB_RUNNING
+        job.started_at = time.time()
+        try:
+            await runner(job)
+            job.status = JOB_STOPPED if job.stop_requested else JOB_FINISHED
+        except asyncio.CancelledError:
+            job.status = JOB_CANCELLED
+            job.message = job.message or "任务已取消"
+        except Exception as e:
+            job.status = JOB_FAILED
+            job.error = str(e)
+        finally:
+            job.finished_at = time.time()
+            self._prune()
+
+    def _prune(self):
+        finished = [job for job in self.jobs.values() if job.status not in ACTIVE_STATUSES]
+        for job in sorted(finished, key=lambda j: j.finished_at or 0)[:max(0, len(finished) - self.max_history)]:
+            del self.jobs[job.id]
+
+    def get(self, job_id: str):
+        return self.jobs.get(job_id)
+
+    def list(self) -> list:
+        return sorted(self.jobs.values(), key=lambda j: j.created_at, reverse=True)
+
+    def active(self) -> list:
+        return [job for job in self.jobs.values() if job.status in ACTIVE_STATUSES]
+
+    def stop(self, job_id: str) -> bool:
+        """优雅停止：当前轮结束后退出循环"""
+        job = self.jobs.get(job_id)
+        if job is None or job.status not in ACTIVE_STATUSES:
+            return False
+        job.stop_requested = True
+        return True
+
+    def cancel(self, job_id: str) -> bool:
+        """立即取消：中断正在等待的LLM/搜索/延迟（已提交到线程池的Neo4j写入会执行完）"""
+        job = self.jobs.get(job_id)
+        if job is None or job.status not in ACTIVE_STATUSES:
+            return False
+        job.stop_requested = True
+        job.task.cancel()
+        return True
@@ -0,0 +1,63 @@
+"""
+LLM响应缓存
+以「模型参数（模型名、temperature等）+ 渲染后消息」的哈希为键，把LLM响应持久化到本地SQLite
+（复用 SearchCache 的存储与LRU容量淘汰）；重跑相同轮次、回放或基准测试时直接返回缓存结果，
+不消耗token。实现LangChain的 BaseCache 接口，挂到 ChatOpenAI(cache=...) 上即对 invoke/ainvoke 生效
+"""
+
+import hashlib
+
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+from langchain_core.outputs import ChatGeneration
+
+from search_cache import SearchCache
+
+
+class LLMResponseCache(BaseCache):
+    def __init__(self, path: str, max_entries: int = 5000, bypass: bool = False):
+        """
+        path：SQLite文件路径
+        max_entries：最多保留的响应数，超出后淘汰最久未访问的条目
+        bypass：为True时不读缓存（总是调用LLM），但仍写入最新响应
+        """
+        self.store = SearchCache(path, max_entries=max_entries, ttl=0)
+        self.bypass = bypass
+
+    @staticmethod
+    def cache_key(prompt: str, llm_string: str) -> str:
+        """prompt为LangChain序列化后的消息列表，llm_string包含模型名、temperature等调用参数"""
+        return hashlib.sha256(f"{llm_string}\n{prompt}".encode("utf-8")).hexdigest()
+
+    def lookup(self, prompt: str, llm_string: str):
+        if self.bypass:
+            return None
+        value = self.store.get(self.cache_key(prompt, llm_string))
+        if value is None:
+            return None
+        try:
+            generations = loads(value)
+        except Exception as e:
+            print(f"⚠️ LLM响应缓存条目无法解析，忽略：{str(e)}")
+            return None
+        print("✅ 命中LLM响应缓存（不消耗token）")
+        return [_mark_cached(generation) for generation in generations]
+
+    def update(self, prompt: str, llm_string: str, return_val):
+        self.store.set(self.cache_key(prompt, llm_string), dumps(return_val))
+
+    def clear(self, **kwargs):
+        self.store.clear()
+
+
+def _mark_cached(generation):
+    """缓存命中的响应：token用量清零（本次调用未消耗token），并标记 llm_cache_hit"""
+    if not isinstance(generation, ChatGeneration):
+        return generation
+    message = generation.message
+    response_metadata = {k: v for k, v in (message.response_metadata or {}).items() if k != "token_usage"}
+    response_metadata["llm_cache_hit"] = True
+    update = {"response_metadata": response_metadata}
+    if hasattr(message, "usage_metadata"):
+        update["usage_metadata"] = {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0}
+    return ChatGeneration(message=message.model_copy(update=update), generation_info=generation.generation_info)
@@ -0,0 +1,125 @@
+"""
+LLM客户端工厂
+问/答智能体共用同一组长连接HTTP客户端，高并发时在途请求只占用协程而非线程
+"""
+
+import os
+import asyncio
+
+import httpx
+from langchain_core.load import dumps
+from langchain_core.messages import AIMessageChunk, message_chunk_to_message
+from langchain_core.outputs import ChatGeneration
+from langchain_core.runnables import RunnableLambda
+from langchain_openai import ChatOpenAI
+
+from config import DEEPSEEK_CONFIG
+from cost_tracker import extract_llm_usage
+from llm_cache import LLMResponseCache
+from rate_limiter import RateLimiter
+from snippet_packer import estimate_tokens
+
+# 连接池参数（可在DEEPSEEK_CONFIG中覆盖）
+_limits = httpx.Limits(
+    max_connections=DEEPSEEK_CONFIG.get("max_connections", 100),
+    max_keepalive_connections=DEEPSEEK_CONFIG.get("max_keepalive_connections", 20),
+    keepalive_expiry=DEEPSEEK_CONFIG.get("keepalive_expiry", 60),
+)
+_timeout = httpx.Timeout(DEEPSEEK_CONFIG.get("timeout", 120), connect=10)
+
+# 全局共享客户端：同步调用（invoke）与异步调用（ainvoke）分别复用
+http_client = httpx.Client(limits=_limits, timeout=_timeout)
+http_async_client = httpx.AsyncClient(limits=_limits, timeout=_timeout)
+
+# Deepseek全局限流：每分钟请求数 + 每分钟token数（0为不限），问/答智能体所有调用共享
+LLM_RATE_LIMITER = RateLimiter(
+    "Deepseek",
+    requests_per_minute=DEEPSEEK_CONFIG.get("requests_per_minute", 0),
+    tokens_per_minute=DEEPSEEK_CONFIG.get("tokens_per_minute", 0),
+)
+
+# LLM响应缓存（可选）：相同模型参数+相同消息直接返回上次的响应
+LLM_RESPONSE_CACHE = LLMResponseCache(
+    DEEPSEEK_CONFIG.get("response_cache_path") or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "cache", "llm_response_cache.sqlite3"
+    ),
+    max_entries=DEEPSEEK_CONFIG.get("response_cache_max_entries", 5000),
+    bypass=DEEPSEEK_CONFIG.get("response_cache_bypass", False),
+) if DEEPSEEK_CONFIG.get("response_cache", False) else None
+
+
+def create_chat_llm() -> ChatOpenAI:
+    """创建绑定共享HTTP客户端的Deepseek LLM实例"""
+    return ChatOpenAI(
+        model=DEEPSEEK_CONFIG["model_name"],
+        api_key=DEEPSEEK_CONFIG["api_key"],
+        base_url=DEEPSEEK_CONFIG["url"],
+        temperature=DEEPSEEK_CONFIG["temperature"],
+        max_tokens=DEEPSEEK_CONFIG["max-tokens"],
+        http_client=http_client,
+        http_async_client=http_async_client,
+        stream_usage=True,  # 流式输出时也返回token用量，便于统计
+        cache=LLM_RESPONSE_CACHE,  # None：不缓存
+    )
+
+
+# 流式调用（astream）不经过LangChain的缓存，由调用方通过以下两个函数显式查询/写入，
+# 缓存键与 invoke/ainvoke 相同（序列化后的消息 + 模型参数），两种调用方式共享缓存
+def lookup_cached_response(llm: ChatOpenAI, messages: list):
+    """查询流式调用的缓存；未启用缓存或未命中返回None"""
+    if not isinstance(llm.cache, LLMResponseCache):
+        return None
+    generations = llm.cache.lookup(dumps(messages), llm._get_llm_string())
+    return generations[0].message if generations else None
+
+
+def store_cached_response(llm: ChatOpenAI, messages: list, message):
+    """写入流式调用的完整响应（累加后的chunk）"""
+    if not isinstance(llm.cache, LLMResponseCache) or message is None:
+        return
+    if isinstance(message, AIMessageChunk):
+        message = message_chunk_to_message(message)
+    llm.cache.update(dumps(messages), llm._get_llm_string(), [ChatGeneration(message=message)])
+
+
+# ===================== 限流 =====================
+# 调用前按渲染后的提示词预扣输入token，响应返回后补扣实际输出token
+def estimate_prompt_tokens(prompt_value) -> int:
+    """估算提示词（PromptValue或消息列表）的输入token数"""
+    if hasattr(prompt_value, "to_string"):
+        return estimate_tokens(prompt_value.to_string())
+    return sum(estimate_tokens(str(getattr(message, "content", message))) for message in prompt_value)
+
+
+def record_llm_output(response):
+    """按响应中的实际输出token补扣额度（缓存命中的响应用量为0，不扣除）"""
+    usage = extract_llm_usage(response)
+    if usage:
+        LLM_RATE_LIMITER.record_tokens(usage[1])
+    return response
+
+
+def _to_messages(prompt_value) -> list:
+    return prompt_value.to_messages() if hasattr(prompt_value, "to_messages") else list(prompt_value)
+
+
+def with_rate_limit(llm: ChatOpenAI):
+    """
+    在LLM前后加上限流步骤：prompt | with_rate_limit(llm) 的每次调用都先等待额度
+    先查LLM响应缓存：命中时直接返回缓存响应，不等待也不占用限流额度，只有真正调用LLM才限流
+    """
+    def call(prompt_value, config=None):
+        cached = lookup_cached_response(llm, _to_messages(prompt_value))
+        if cached is not None:
+            return cached
+        LLM_RATE_LIMITER.acquire(estimate_prompt_tokens(prompt_value))
+        return record_llm_output(llm.invoke(prompt_value, config))
+
+    async def acall(prompt_value, config=None):
+        cached = await asyncio.to_thread(lookup_cached_response, llm, _to_messages(prompt_value))
+        if cached is not None:
+            return cached
+        await LLM_RATE_LIMITER.aacquire(estimate_prompt_tokens(prompt_value))
+        return record_llm_output(await llm.ainvoke(prompt_value, config))
+
+    return RunnableLambda(call, afunc=acall, name="rate_limited_llm")
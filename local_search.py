@@ -0,0 +1,246 @@
+"""
+本地离线搜索（BM25）
+对语料目录下的 .txt / .jsonl 文档建立磁盘倒排索引（SQLite），中文按相邻二字（bigram）切分，
+英文/数字按单词切分；查询只读取查询词项的倒排列表，毫秒级返回，无需访问外网。
+返回格式与SerpAPI一致（organic_results 列表），可直接替换搜索后端
+"""
+
+import asyncio
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from collections import Counter
+
+# 中日韩文字连续片段 / 英文数字单词
+CJK_RUN_PATTERN = re.compile(r"[㐀-䶿一-鿿豈-﫿]+")
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+# 索引结构版本：切词或表结构变化时递增，旧索引自动重建
+INDEX_VERSION = "1"
+
+
+def tokenize(text: str) -> list:
+    """中文连续片段切为相邻二字（单字片段保留单字），英文数字按单词切分（小写）"""
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    tokens = []
+    for run in CJK_RUN_PATTERN.findall(text):
+        if len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    tokens.extend(WORD_PATTERN.findall(CJK_RUN_PATTERN.sub(" ", text)))
+    return tokens
+
+
+def iter_corpus_documents(corpus_dir: str):
+    """
+    遍历语料目录，产出 (标题, 正文, 来源)
+    .txt：按空行分段，每段一篇文档，标题为文件名；
+    .jsonl：每行一个JSON对象，正文取 text/content/snippet，标题取 title
+    """
+    for root, _, files in os.walk(corpus_dir):
+        for file_name in sorted(files):
+            path = os.path.join(root, file_name)
+            source = os.path.relpath(path, corpus_dir)
+            if file_name.endswith(".txt"):
+                with open(path, "r", encoding="utf-8") as f:
+                    content = f.read()
+                title = os.path.splitext(file_name)[0]
+                for paragraph in re.split(r"\n\s*\n", content):
+                    paragraph = paragraph.strip()
+                    if paragraph:
+                        yield title, paragraph, source
+            elif file_name.endswith(".jsonl"):
+                with open(path, "r", encoding="utf-8") as f:
+                    for line_no, line in enumerate(f, 1):
+                        line = line.strip()
+                        if not line:
+                            continue
+                        try:
+                            doc = json.loads(line)
+                        except json.JSONDecodeError:
+                            print(f"⚠️ 跳过无法解析的JSONL行：{source}:{line_no}")
+                            continue
+                        text = doc.get("text") or doc.get("content") or doc.get("snippet") or ""
+                        if text.strip():
+                            yield doc.get("title", ""), text.strip(), doc.get("link") or f"{source}:{line_no}"
+
+
+def corpus_fingerprint(corpus_dir: str) -> str:
+    """语料目录指纹（文件路径+大小+修改时间），变化时重建索引"""
+    entries = []
+    for root, _, files in os.walk(corpus_dir):
+        for file_name in files:
+            if file_name.endswith((".txt", ".jsonl")):
+                path = os.path.join(root, file_name)
+                stat = os.stat(path)
+                entries.append(f"{os.path.relpath(path, corpus_dir)}|{stat.st_size}|{stat.st_mtime_ns}")
+    return INDEX_VERSION + ":" + ";".join(sorted(entries))
+
+
+class BM25Index:
+    """SQLite持久化的BM25倒排索引"""
+    def __init__(self, path: str, k1: float = 1.5, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.local = threading.local()  # 每个线程独立连接
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connect().executescript(
+            """
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS documents (
+                id INTEGER PRIMARY KEY,
+                title TEXT NOT NULL,
+                text TEXT NOT NULL,
+                source TEXT NOT NULL,
+                length INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS postings (
+                term TEXT NOT NULL,
+                doc_id INTEGER NOT NULL,
+                tf INTEGER NOT NULL,
+                doc_length INTEGER NOT NULL  -- 冗余存储文档长度，打分时无需回表
+            );
+            CREATE INDEX IF NOT EXISTS idx_postings_term ON postings(term);
+            """
+        )
+        self._stats = None
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            self.local.conn = conn
+        return conn
+
+    def meta(self, key: str):
+        row = self._connect().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def build(self, documents, fingerprint: str = "") -> int:
+        """用 (标题, 正文, 来源) 序列重建索引，返回文档数"""
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM postings")
+            conn.execute("DELETE FROM documents")
+            conn.execute("DELETE FROM meta")
+            total_length = 0
+            doc_count = 0
+            for doc_id, (title, text, source) in enumerate(documents, 1):
+                counts = Counter(tokenize(f"{title}\n{text}"))
+                length = sum(counts.values())
+                conn.execute(
+                    "INSERT INTO documents (id, title, text, source, length) VALUES (?, ?, ?, ?, ?)",
+                    (doc_id, title, text, source, length),
+                )
+                conn.executemany(
+                    "INSERT INTO postings (term, doc_id, tf, doc_length) VALUES (?, ?, ?, ?)",
+                    ((term, doc_id, tf, length) for term, tf in counts.items()),
+                )
+                total_length += length
+                doc_count += 1
+            conn.executemany(
+                "INSERT INTO meta (key, value) VALUES (?, ?)",
+                [
+                    ("doc_count", str(doc_count)),
+                    ("avg_length", str(total_length / doc_count if doc_count else 0)),
+                    ("fingerprint", fingerprint),
+                ],
+            )
+        self._stats = None
+        return doc_count
+
+    def _collection_stats(self):
+        if self._stats is None:
+            self._stats = (int(self.meta("doc_count") or 0), float(self.meta("avg_length") or 0))
+        return self._stats
+
+    def search(self, query: str, top_k: int = 5) -> list:
+        """返回 [(得分, 标题, 正文, 来源)]，按BM25得分降序"""
+        doc_count, avg_length = self._collection_stats()
+        terms = set(tokenize(query))
+        if not doc_count or not terms:
+            return []
+
+        conn = self._connect()
+        scores = {}
+        for term in terms:
+            postings = conn.execute(
+                "SELECT doc_id, tf, doc_length FROM postings WHERE term = ?", (term,)
+            ).fetchall()
+            if not postings:
+                continue
+            idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, tf, length in postings:
+                norm = self.k1 * (1 - self.b + self.b * length / avg_length) if avg_length else self.k1
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+        best = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:top_k]
+        results = []
+        for doc_id, score in best:
+            title, text, source = conn.execute(
+                "SELECT title, text, source FROM documents WHERE id = ?", (doc_id,)
+            ).fetchone()
+            results.append((score, title, text, source))
+        return results
+
+
+def _snippet_window(text: str, query: str, max_chars: int) -> str:
+    """截取包含查询词的片段，避免长文档只返回开头"""
+    if len(text) <= max_chars:
+        return text
+    normalized = unicodedata.normalize("NFKC", text).lower()
+    positions = [normalized.find(term) for term in tokenize(query)]
+    positions = [pos for pos in positions if pos >= 0]
+    start = max(0, min(positions) - max_chars // 4) if positions else 0
+    start = min(start, len(text) - max_chars)
+    return text[start:start + max_chars]
+
+
+class LocalSearchBackend:
+    """本地搜索后端：接口与 SerpApiClient 相同（search / asearch 返回 organic_results）"""
+    def __init__(self, config: dict, default_index_path: str = ""):
+        self.corpus_dir = config.get("local_corpus_dir", "")
+        self.top_k = config.get("top_n", 5)
+        self.snippet_chars = config.get("local_snippet_chars", 300)
+        self.index = BM25Index(config.get("local_index_path") or default_index_path)
+        self.build_lock = threading.Lock()
+        self.ready = False
+
+    def ensure_index(self):
+        """首次查询时检查语料指纹，语料有变化则重建索引"""
+        if self.ready:
+            return
+        with self.build_lock:
+            if self.ready:
+                return
+            if not self.corpus_dir or not os.path.isdir(self.corpus_dir):
+                raise ValueError(f"本地搜索语料目录不存在：{self.corpus_dir}")
+            fingerprint = corpus_fingerprint(self.corpus_dir)
+            if self.index.meta("fingerprint") != fingerprint:
+                print(f"[本地搜索] 正在为语料目录建立索引：{self.corpus_dir}")
+                doc_count = self.index.build(iter_corpus_documents(self.corpus_dir), fingerprint)
+                print(f"[本地搜索] 索引建立完成：{doc_count} 篇文档")
+            self.ready = True
+
+    def search(self, query: str) -> dict:
+        self.ensure_index()
+        return {
+            "organic_results": [
+                {
+                    "title": title,
+                    "snippet": _snippet_window(text, query, self.snippet_chars),
+                    "link": source,
+                    "score": round(score, 4),
+                }
+                for score, title, text, source in self.index.search(query, top_k=self.top_k)
+            ]
+        }
+
+    async def asearch(self, query: str) -> dict:
+        # 本地SQLite查询为毫秒级阻塞IO，放入线程避免占用事件循环
+        return await asyncio.to_thread(self.search, query)
@@ -1,17 +1,34 @@
-from fastapi import FastAPI, BackgroundTasks, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Request, Response
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware  # 导入 CORS 中间件
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
+from contextvars import ContextVar
+from contextlib import asynccontextmanager
 import time
 import os
 import asyncio
-from config import WORKFLOW_CONFIG
-from tools import get_graph_data, execute_neo4j_query
-from ask_agent import generate_question
-from answer_agent import generate_answer
-from cost_tracker import get_tracker
+import json
+from config import WORKFLOW_CONFIG, NEO4J_CONFIG
+from tools import get_graph_data, get_graph_page, iter_graph_ndjson, GRAPH_CHANGES, GRAPH_VERSION, ensure_graph_version, execute_neo4j_query, lease_least_relationship_entity, entity_leases
+from ask_agent import agenerate_question, agenerate_questions
+from answer_agent import agenerate_answer, agenerate_answers
+from job_scheduler import JobScheduler, Job
+from graph_columnar import FORMAT_COLUMNAR
+from graph_snapshot import GraphSnapshotCache
 
-app = FastAPI(title="知识图谱问答智能体")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用生命周期：启动时订阅图谱变更并经WebSocket转发，关闭时取消订阅"""
+    app.state.loop = asyncio.get_running_loop()
+    GRAPH_CHANGES.subscribe(forward_graph_change)
+    try:
+        yield
+    finally:
+        GRAPH_CHANGES.unsubscribe(forward_graph_change)
+
+
+app = FastAPI(title="知识图谱问答智能体", lifespan=lifespan)
 
 # ===================== 关键：添加 CORS 跨域配置 =====================
 # 允许的前端 Origin（替换为你的前端实际地址，开发环境可直接用 ["*"] 测试）
@@ -32,18 +49,67 @@ app.add_middleware(
 )
 
 # ===================== 全局状态管理 =====================
-workflow_running = False
-ask_count = 0
+# 工作流以任务（Job）形式运行：每个任务有独立的ID、参数、进度与消耗统计，可同时运行多个
+scheduler = JobScheduler()
 active_connections: List[WebSocket] = []
+# 当前协程所属的任务ID（推送消息时附带，前端据此区分同时运行的多个任务）
+current_job_id: ContextVar = ContextVar("current_job_id", default=None)
+# /api/graph-data 响应快照：图谱版本号未变化时直接返回已序列化的响应（或304），不再查询Neo4j
+graph_snapshots = GraphSnapshotCache(max_entries=NEO4J_CONFIG.get("graph_snapshot_cache_size", 32))
 
 class SignalRequest(BaseModel):
     signal: str
 
+
+class JobRequest(BaseModel):
+    """创建任务的参数，未指定的项使用 WORKFLOW_CONFIG 中的默认值"""
+    max_rounds: Optional[int] = None
+    worker_concurrency: Optional[int] = None
+    pipeline_depth: Optional[int] = None
+    ask_batch_size: Optional[int] = None
+    answer_batch_size: Optional[int] = None
+    loop_delay: Optional[float] = None
+
+
+def build_job_params(request: JobRequest = None) -> dict:
+    params = {
+        "max_rounds": WORKFLOW_CONFIG["max_ask_count"],
+        "worker_concurrency": WORKFLOW_CONFIG.get("worker_concurrency", 1),
+        "pipeline_depth": WORKFLOW_CONFIG.get("pipeline_depth", 0),
+        "ask_batch_size": WORKFLOW_CONFIG.get("ask_batch_size", 1),
+        "answer_batch_size": WORKFLOW_CONFIG.get("answer_batch_size", 1),
+        "loop_delay": WORKFLOW_CONFIG["loop_delay"],
+    }
+    if request is not None:
+        params.update({key: value for key, value in request.model_dump().items() if value is not None})
+    return params
+
 # ===================== WebSocket通信 =====================
 async def notify_clients(message: dict):
+    job_id = current_job_id.get()
+    if job_id is not None:
+        message = {**message, "job_id": job_id}
     for connection in active_connections:
         await connection.send_json(message)
 
+def forward_graph_change(change: dict):
+    """
+    图谱变更订阅者：在执行Cypher的线程中被调用，把变更投递到事件循环推送给前端
+    消息格式：{"role": "graph", "status": "delta", "content": {"seq", "version", "added_nodes", "changed_nodes", "added_edges"}}
+    """
+    message = {
+        "role": "graph",
+        "status": "delta",
+        "content": change,
+        "timestamp": time.time()
+    }
+    # 写入线程继承了任务协程的上下文，在此读取任务ID（事件循环回调中已无该上下文）
+    job_id = current_job_id.get()
+    if job_id is not None:
+        message["job_id"] = job_id
+    asyncio.run_coroutine_threadsafe(notify_clients(message), app.state.loop)
+
+
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()
@@ -60,18 +126,71 @@ async def websocket_endpoint(websocket: WebSocket):
 
 # ===================== API路由 =====================
 @app.get("/api/graph-data")
-async def fetch_graph_data():
+async def fetch_graph_data(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    label: Optional[str] = None,
+    type: Optional[str] = None,
+    since: Optional[int] = None,
+    format: Optional[str] = None,
+):
+    """
+    不带参数时返回全量图谱（与原接口一致）
+    分页：limit=每页条数，cursor=上一页返回的 next_cursor（为null表示已取完）
+    过滤：label=Label（逗号分隔多个），type=关系类型（逗号分隔多个）
+    增量：since=上次响应中的 version，只返回之后新增/变更的节点与关系
+    格式：format=columnar 返回列式编码（整数id、Label/关系类型字典、平行数组，解码规则见 graph_columnar.py）
+    缓存：响应带 ETag（随图谱写入版本变化）；请求头 If-None-Match 命中时返回304
+    """
     print(f"[API] 收到图谱数据请求 - 时间: {time.time()}")
+    paged = any(value is not None for value in (cursor, limit, label, type, since))
+    if format not in (None, "json", FORMAT_COLUMNAR):
+        return {
+            "code": 400,
+            "message": f"参数错误: 不支持的格式 {format}（可选 json / {FORMAT_COLUMNAR}）",
+            "data": None
+        }
+    columnar = format == FORMAT_COLUMNAR
+
+    # 先读取版本号再查询：查询期间发生的写入会使版本号前进，本次结果只会被缓存在较旧的版本号下
+    if not GRAPH_VERSION.seeded:
+        await asyncio.to_thread(ensure_graph_version)
+    version = GRAPH_VERSION.current
+    key = graph_snapshots.request_key(cursor=cursor, limit=limit, label=label, type=type, since=since, columnar=columnar)
+    etag = graph_snapshots.etag(version, key)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}  # 允许浏览器缓存，但每次携带 If-None-Match 校验
+    if graph_snapshots.etag_matches(request.headers.get("if-none-match"), etag):
+        print(f"[API] 图谱未变化（v{version}），返回304")
+        return Response(status_code=304, headers=headers)
+    body = graph_snapshots.get(key, version)
+    if body is not None:
+        print(f"[API] 命中图谱快照缓存（v{version}）")
+        return Response(content=body, media_type="application/json", headers=headers)
+
     try:
         print("[API] 正在查询Neo4j（异步执行）...")
         # 使用asyncio.to_thread将同步函数放到线程池执行，避免阻塞事件循环
-        data = await asyncio.to_thread(get_graph_data)
-        print(f"[API] 查询成功，节点数: {len(data.get('nodes', []))}, 边数: {len(data.get('edges', []))}")
-        # 包裹前端要求的外层格式
-        return {
+        if paged:
+            data = await asyncio.to_thread(get_graph_page, cursor, limit, label, type, since, columnar)
+        else:
+            data = await asyncio.to_thread(get_graph_data, columnar)
+        # 列式格式中节点/关系为按列存放的字典，数量取 id 列的长度
+        nodes, edges = (data["nodes"]["id"], data["edges"]["id"]) if columnar else (data["nodes"], data["edges"])
+        print(f"[API] 查询成功，节点数: {len(nodes)}, 边数: {len(edges)}")
+        # 包裹前端要求的外层格式；序列化一次后缓存，后续相同请求直接返回
+        body = json.dumps({
             "code": 200,
             "message": "success",
             "data": data
+        }, ensure_ascii=False, default=str).encode("utf-8")
+        graph_snapshots.put(key, version, body)
+        return Response(content=body, media_type="application/json", headers=headers)
+    except ValueError as e:
+        return {
+            "code": 400,
+            "message": f"参数错误: {str(e)}",
+            "data": None
         }
     except Exception as e:
         # 统一错误响应格式
@@ -82,128 +201,532 @@ async def fetch_graph_data():
             "data": None
         }
 
+@app.get("/api/graph-data/stream")
+async def stream_graph_data(
+    label: Optional[str] = None,
+    type: Optional[str] = None,
+    since: Optional[int] = None,
+    fetch_size: Optional[int] = None,
+):
+    """
+    流式导出图谱（NDJSON，每行一个JSON：meta → node... → edge... → end）
+    记录从Neo4j按 fetch_size 分批拉取、逐行发送，适合大图谱的全量导出；过滤参数同 /api/graph-data
+    """
+    print(f"[API] 收到图谱流式导出请求 - 时间: {time.time()}")
+    try:
+        # 读取当前图谱版本可能需要查询Neo4j，放到线程池执行；生成器由StreamingResponse在线程池中迭代
+        records = await asyncio.to_thread(iter_graph_ndjson, label, type, since, fetch_size)
+    except Exception as e:
+        print(f"[API] 图谱流式导出失败: {str(e)}")
+        return {
+            "code": 500,
+            "message": f"图谱查询失败: {str(e)}",
+            "data": None
+        }
+    return StreamingResponse(records, media_type="application/x-ndjson")
+
 @app.post("/api/signal")
-async def handle_signal(request: SignalRequest, background_tasks: BackgroundTasks):
-    global workflow_running, ask_count
-    if request.signal == "ask" and not workflow_running:
-        workflow_running = True
-        ask_count = 0
-        background_tasks.add_task(run_workflow)
-        return {"status": "success", "message": "工作流已启动"}
+async def handle_signal(request: SignalRequest):
+    # 兼容前端的启动/停止按钮：同一时间只由信号启动一个任务；需要并行运行多个任务请使用 /api/jobs
+    if request.signal == "ask" and not scheduler.active():
+        job = scheduler.submit(run_workflow, build_job_params())
+        return {"status": "success", "message": "工作流已启动", "job_id": job.id}
     elif request.signal == "stop":
-        workflow_running = False
+        for job in scheduler.active():
+            scheduler.stop(job.id)
         return {"status": "success", "message": "工作流已停止"}
     else:
         return {"status": "error", "message": "无效信号或工作流已在运行"}
 
+
+@app.post("/api/jobs")
+async def create_job(request: JobRequest):
+    """启动一个新的工作流任务（可与其他任务同时运行）"""
+    job = scheduler.submit(run_workflow, build_job_params(request))
+    return {"status": "success", "message": "任务已启动", "data": job.to_dict()}
+
+
+@app.get("/api/jobs")
+async def list_jobs():
+    return {"status": "success", "data": [job.to_dict() for job in scheduler.list()]}
+
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = scheduler.get(job_id)
+    if job is None:
+        return {"status": "error", "message": f"任务不存在：{job_id}"}
+    return {"status": "success", "data": job.to_dict(detail=True)}
+
+
+@app.post("/api/jobs/{job_id}/stop")
+async def stop_job(job_id: str):
+    """优雅停止：当前轮结束后退出"""
+    if not scheduler.stop(job_id):
+        return {"status": "error", "message": f"任务不存在或已结束：{job_id}"}
+    return {"status": "success", "message": "任务将在当前轮结束后停止"}
+
+
+@app.post("/api/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    """立即取消：中断正在等待的LLM/搜索调用与延迟"""
+    if not scheduler.cancel(job_id):
+        return {"status": "error", "message": f"任务不存在或已结束：{job_id}"}
+    return {"status": "success", "message": "任务已取消"}
+
 # ===================== 核心工作流 =====================
-async def run_workflow():
-    global workflow_running, ask_count
-    print("工作流启动，开始问答循环...")
-    
-    # 开始追踪消耗
-    tracker = get_tracker()
-    tracker.reset()  # 重置之前的统计
-    tracker.start_workflow()
-    
-    try:
-        ask_result={"status": "success"}
-        while workflow_running and ask_count < WORKFLOW_CONFIG["max_ask_count"]:
-            # 1. 调用问智能体（放到线程池执行，避免阻塞事件循环）
-            print(f"\n--- 第{ask_count + 1}轮：调用问智能体 ---")
-            ask_result = await asyncio.to_thread(generate_question)
+async def generate_ask_batch(job: Job, max_count: int, entities: list = None) -> list:
+    """
+    预先生成若干轮的问智能体结果
+    ask_batch_size > 1 时一次LLM调用为多个关系最少的实体生成问题（不超过剩余轮数 max_count）；
+    否则只生成一轮。返回结果列表，每项结构同 generate_question
+    entities：可选，调用方已选定（租用）的实体，批量模式下直接为这些实体生成问题
+    """
+    batch_size = min(job.params["ask_batch_size"], max_count)
+    if batch_size > 1:
+        print(f"\n--- 批量调用问智能体（{len(entities) if entities else batch_size}个实体） ---")
+        return await agenerate_questions(entities=entities, batch_size=batch_size)
+    return [None]  # None：由run_ask_stage逐轮生成
+
+
+def no_leasable_entity_result() -> dict:
+    """租不到实体时的问智能体结果（结构同 generate_question 的error结果），调用方据此终止工作流"""
+    return {"status": "error", "data": {}, "error": "无可用实体（数据库为空或实体均被其他任务占用）"}
+
+
+async def generate_leased_ask_batch(job: Job, max_count: int, entities: list) -> list:
+    """
+    为已租用的实体生成问智能体结果，返回 [(实体, 问智能体结果), ...]
+    批量调用失败（返回单个error结果）时丢弃该结果，结果记为None，由run_ask_stage逐个实体生成
+    """
+    ask_results = await generate_ask_batch(job, max_count, entities)
+    if len(ask_results) != len(entities) or any(
+            result is not None and result["status"] == "error" for result in ask_results):
+        print("⚠️ 批量生成问题失败，改为逐个实体生成")
+        ask_results = [None] * len(entities)
+    return list(zip(entities, ask_results))
+
+
+async def run_ask_stage(round_no: int, entity: dict = None, ask_result: dict = None):
+    """
+    问智能体阶段：生成问题并推送前端
+    entity：可选，指定核心实体（并发工作者模式下为租用的实体）
+    ask_result：可选，批量模式下已生成的问智能体结果（不再调用LLM）
+    返回：(ask_result, answer_input)；answer_input为None表示本轮无需调用答智能体
+    """
+    print(f"\n--- 第{round_no}轮：调用问智能体 ---")
+    if ask_result is None:
+        # 异步调用LLM，不占用线程池
+        ask_result = await agenerate_question(entity)
+
+    # 关键判断：问智能体返回error（无实体）→ 由调用方终止工作流
+    if ask_result["status"] == "error":
+        error_msg = f"问智能体报错：{ask_result['error']}"
+        await notify_clients({
+            "role": "system",
+            "status": "error",
+            "content": error_msg,
+            "timestamp": time.time()
+        })
+        print(error_msg)
+        return ask_result, None
+
+    # 问智能体正常（success/warning）→ 继续调用答智能体
+    if ask_result["status"] == "warning":
+        warn_msg = f"问智能体警告：{ask_result['error']}"
+        await notify_clients({
+            "role": "ask",
+            "status": "warning",
+            "content": warn_msg,
+            "timestamp": time.time()
+        })
+        print(warn_msg)
 
-            # 关键判断：问智能体返回error（无实体）→ 终止工作流
+    # 提取问智能体结果
+    question = ask_result["data"].get("question", "")
+    entity_label = ask_result["data"].get("entity_label", "")
+    entity_name = ask_result["data"].get("entity_name", "")
+
+    if not question:
+        error_msg = "问智能体未生成有效问题，终止本轮流程"
+        await notify_clients({
+            "role": "system",
+            "status": "error",
+            "content": error_msg,
+            "timestamp": time.time()
+        })
+        print(error_msg)
+        return ask_result, None
+
+    # 推送问智能体结果给前端
+    await notify_clients({
+        "role": "ask",
+        "status": "success",
+        "content": {
+            "question": question,
+            "core_entity": f"{entity_label}:{entity_name}" if entity_label else entity_name
+        },
+        "timestamp": time.time()
+    })
+    print(f"问智能体生成：问题={question}")
+    print(f"  核心实体Label={entity_label}，实体名={entity_name}")
+
+    answer_input = {
+        "question": question,
+        "entity_label": entity_label,
+        "entity_name": entity_name
+    }
+    return ask_result, answer_input
+
+
+async def run_answer_stage(round_no: int, answer_input: dict) -> dict:
+    """答智能体阶段：搜索、生成答案与Cypher、写入图谱并推送前端"""
+    print(f"--- 第{round_no}轮：调用答智能体 ---")
+
+    async def push_delta(kind: str, delta: str):
+        # 流式增量消息：前端按 round 拼接 answer / cypher 两类文本
+        await notify_clients({
+            "role": "answer",
+            "status": "delta",
+            "content": {
+                "round": round_no,
+                "question": answer_input.get("question", ""),
+                "kind": kind,
+                "delta": delta
+            },
+            "timestamp": time.time()
+        })
+
+    # 异步调用LLM，不占用线程池；开启stream_answer时逐块推送答案与Cypher
+    on_delta = push_delta if WORKFLOW_CONFIG.get("stream_answer", False) else None
+    answer_result = await agenerate_answer(
+        answer_input,
+        on_delta=on_delta,
+        incremental_cypher=WORKFLOW_CONFIG.get("incremental_cypher", False)
+    )
+    print("答智能体输出结果：",answer_result)
+    await publish_answer_result(answer_result)
+    return answer_result
+
+
+async def run_answer_batch_stage(batch: list) -> list:
+    """
+    批量答智能体阶段：一次LLM调用回答多个问题，结果按问题分别推送前端
+    batch：[(round_no, answer_input), ...]
+    """
+    round_nos = "、".join(str(round_no) for round_no, _ in batch)
+    print(f"--- 第{round_nos}轮：批量调用答智能体 ---")
+    answer_results = await agenerate_answers([answer_input for _, answer_input in batch])
+    for answer_result in answer_results:
+        print("答智能体输出结果：", answer_result)
+        await publish_answer_result(answer_result)
+    return answer_results
+
+
+async def publish_answer_result(answer_result: dict):
+    """推送答智能体结果给前端（包含分步执行结果）并打印执行摘要"""
+    await notify_clients({
+        "role": "answer",
+        "status": answer_result["status"],
+        "content": {
+            "question": answer_result["data"].get("question", ""),
+            "answer": answer_result["data"].get("answer", ""),
+            "cypher": answer_result["data"].get("cypher", ""),
+            "graph_update_summary": answer_result["data"].get("graph_update_summary", ""),
+            "cypher_steps": answer_result["data"].get("cypher_steps", [])
+        },
+        "error": answer_result.get("error", ""),
+        "timestamp": time.time()
+    })
+
+    # 打印执行摘要
+    print(f"答智能体结果：状态={answer_result['status']}")
+    print(f"  答案：{answer_result['data'].get('answer', '')[:50]}...")
+    print(f"  图谱更新：{answer_result['data'].get('graph_update_summary', '无')}")
+    if answer_result["data"].get("cypher_steps"):
+        print(f"  执行步骤：共 {len(answer_result['data']['cypher_steps'])} 条")
+
+
+async def run_sequential_rounds(job: Job) -> bool:
+    """
+    串行模式：问 → 答 → 延迟，逐轮执行
+    与其他模式一样通过实体租约选实体，多个任务同时运行时不会选中同一实体（答完后归还）
+    返回：是否因问智能体无有效实体而提前终止
+    """
+    max_rounds = job.params["max_rounds"]
+    pending = []  # 批量模式下已生成、尚未回答的 (实体, 问智能体结果)
+    answer_batch = []  # 批量答题模式下已生成、等待合并回答的 (轮次, 答智能体输入, 实体)
+    answer_batch_size = job.params["answer_batch_size"]
+    owner = f"{job.id}-sequential"
+    lease_batch_size = WORKFLOW_CONFIG.get("entity_batch_size", 10)
+
+    async def lease_entities(count: int) -> list:
+        entities = []
+        for _ in range(count):
+            entity = await asyncio.to_thread(
+                lease_least_relationship_entity, owner, max(lease_batch_size, count + len(answer_batch))
+            )
+            if entity is None:
+                break
+            entities.append(entity)
+        return entities
+
+    async def flush_answer_batch():
+        await run_answer_batch_stage([(round_no, answer_input) for round_no, answer_input, _ in answer_batch])
+        for _, _, entity in answer_batch:
+            entity_leases.release(entity)
+        job.rounds_completed += len(answer_batch)
+        answer_batch.clear()
+
+    try:
+        while job.running and job.rounds_completed + len(answer_batch) < max_rounds:
+            if not pending:
+                count = min(job.params["ask_batch_size"], max_rounds - job.rounds_completed - len(answer_batch))
+                entities = await lease_entities(count)
+                if not entities and answer_batch:
+                    # 候选实体都在等待合并回答：先回答并归还，再重新租用
+                    await flush_answer_batch()
+                    continue
+                pending = await generate_leased_ask_batch(job, count, entities) if entities \
+                    else [(None, no_leasable_entity_result())]
+            round_no = job.rounds_completed + len(answer_batch) + 1
+            entity, ask_result = pending.pop(0)
+            ask_result, answer_input = await run_ask_stage(round_no, entity, ask_result)
             if ask_result["status"] == "error":
-                error_msg = f"问智能体报错：{ask_result['error']}"
-                await notify_clients({
-                    "role": "system",
-                    "status": "error",
-                    "content": error_msg,
-                    "timestamp": time.time()
-                })
-                print(error_msg)
-                break  # 中断循环，停止工作流
-
-            # 2. 问智能体正常（success/warning）→ 继续调用答智能体
-            if ask_result["status"] == "warning":
-                warn_msg = f"问智能体警告：{ask_result['error']}"
-                await notify_clients({
-                    "role": "ask",
-                    "status": "warning",
-                    "content": warn_msg,
-                    "timestamp": time.time()
-                })
-                print(warn_msg)
-
-            # 提取问智能体结果
-            question = ask_result["data"].get("question", "")
-            entity_label = ask_result["data"].get("entity_label", "")
-            entity_name = ask_result["data"].get("entity_name", "")
-            
-            if not question:
-                error_msg = "问智能体未生成有效问题，终止本轮流程"
-                await notify_clients({
-                    "role": "system",
-                    "status": "error",
-                    "content": error_msg,
-                    "timestamp": time.time()
-                })
-                print(error_msg)
-                ask_count += 1
+                if answer_batch:
+                    await flush_answer_batch()
+                return True  # 中断循环，停止工作流
+            if answer_input is None:
+                entity_leases.release(entity)
+                job.rounds_completed += 1
+                continue
+
+            if answer_batch_size > 1:
+                # 凑满一批（或本批问题已用完）再合并回答
+                answer_batch.append((round_no, answer_input, entity))
+                if len(answer_batch) < answer_batch_size and pending:
+                    continue
+                await flush_answer_batch()
+            else:
+                await run_answer_stage(round_no, answer_input)
+                entity_leases.release(entity)
+                # 计数
+                job.rounds_completed += 1
+
+            # 延迟（异步等待，不阻塞事件循环）
+            if job.params["loop_delay"]:
+                await asyncio.sleep(job.params["loop_delay"])
+
+        # 循环结束时仍有未回答的问题（如最后一批中有轮次未生成有效问题）
+        if answer_batch and job.running:
+            await flush_answer_batch()
+        return False
+    finally:
+        # 归还本任务仍持有的租约（出错、取消或停止时未回答的实体）
+        entity_leases.release_owner(owner)
+
+
+async def run_pipelined_rounds(job: Job, depth: int) -> bool:
+    """
+    流水线模式：问智能体与答智能体通过有界队列衔接
+    第N轮答智能体生成/写入Cypher时，第N+1轮问智能体已在选实体、生成问题
+    depth：队列容量，即最多提前生成多少个待回答的问题
+    返回：是否因问智能体无有效实体而提前终止
+    """
+    queue = asyncio.Queue(maxsize=depth)
+    stop_marker = object()  # 队列结束标记
+    state = {"no_entity": False}
+
+    max_rounds = job.params["max_rounds"]
+    # 问智能体领先答智能体最多depth轮，此时前几轮尚未写入图谱；
+    # 通过实体租约保证领先生成的各轮选中不同的实体（答完后归还）
+    owner = f"{job.id}-pipeline"
+    lease_batch_size = WORKFLOW_CONFIG.get("entity_batch_size", 10)
+    held = []  # 本流水线已租用、尚未答完的实体
+    released = asyncio.Event()  # 消费者归还实体时置位，唤醒等待可用实体的生产者
+
+    def release_entity(entity: dict):
+        if entity is None:
+            return
+        entity_leases.release(entity)
+        if entity in held:
+            held.remove(entity)
+        released.set()
+
+    async def lease_entities(count: int) -> list:
+        """租用最多count个实体；全部候选实体都在流水线中处理时，等待消费者归还后重试"""
+        while True:
+            released.clear()
+            entities = []
+            for _ in range(count):
+                entity = await asyncio.to_thread(
+                    lease_least_relationship_entity, owner, max(lease_batch_size, count + len(held))
+                )
+                if entity is None:
+                    break
+                entities.append(entity)
+            if entities or not held:
+                held.extend(entities)
+                return entities
+            await released.wait()
+
+    async def ask_producer():
+        produced = 0
+        pending = []  # 批量模式下已生成、尚未入队的 (实体, 问智能体结果)
+        try:
+            while job.running and produced < max_rounds:
+                if not pending:
+                    count = min(job.params["ask_batch_size"], max_rounds - produced)
+                    entities = await lease_entities(count)
+                    if not entities:
+                        pending = [(None, no_leasable_entity_result())]
+                    else:
+                        pending = await generate_leased_ask_batch(job, count, entities)
+                entity, ask_result = pending.pop(0)
+                produced += 1
+                ask_result, answer_input = await run_ask_stage(produced, entity, ask_result)
+                if ask_result["status"] == "error":
+                    # 终止流水线：归还本实体及已租用、尚未生成问题的实体
+                    release_entity(entity)
+                    for pending_entity, _ in pending:
+                        release_entity(pending_entity)
+                    state["no_entity"] = True
+                    break
+                if answer_input is None:
+                    release_entity(entity)
+                    job.rounds_completed += 1
+                    continue
+                # 队列满时在此等待，保证问智能体最多领先depth轮
+                await queue.put((produced, answer_input, entity))
+        except BaseException:
+            # 被取消或出错：消费者可能已经退出，不能等待队列空位（会永久阻塞）；
+            # 丢弃排队中的问题后直接放入结束标记
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(stop_marker)
+            raise
+        # 正常结束：消费者仍在运行，等待其取走已排队的问题后再通知退出
+        await queue.put(stop_marker)
+
+    async def answer_consumer():
+        answer_batch_size = job.params["answer_batch_size"]
+        finished = False
+        while not finished:
+            # 取一个问题；批量答题模式下再顺带取走队列中已就绪的问题（最多answer_batch_size个）
+            batch = []
+            item = await queue.get()
+            while True:
+                if item is stop_marker:
+                    finished = True
+                    break
+                # 收到stop信号后继续取队列（避免生产者阻塞），但不再执行已排队的问题
+                if not job.running:
+                    print(f"工作流已停止，丢弃排队中的第{item[0]}轮问题")
+                    release_entity(item[2])
+                else:
+                    batch.append(item)
+                if len(batch) >= answer_batch_size or queue.empty():
+                    break
+                item = queue.get_nowait()
+            if not batch:
                 continue
+            if len(batch) == 1:
+                await run_answer_stage(batch[0][0], batch[0][1])
+            else:
+                await run_answer_batch_stage([(round_no, answer_input) for round_no, answer_input, _ in batch])
+            for _, _, entity in batch:
+                release_entity(entity)
+            job.rounds_completed += len(batch)
+            if job.params["loop_delay"]:
+                await asyncio.sleep(job.params["loop_delay"])
+
+    print(f"流水线模式启动，队列深度：{depth}")
+    producer_task = asyncio.create_task(ask_producer())
+    try:
+        await answer_consumer()
+    finally:
+        # 消费者异常退出时，取消仍在运行的生产者
+        if not producer_task.done():
+            producer_task.cancel()
+        await asyncio.gather(producer_task, return_exceptions=True)
+        # 归还本流水线仍持有的租约（未生成/未回答的实体）
+        entity_leases.release_owner(owner)
+    # 生产者异常需要上抛，由run_workflow统一处理
+    if not producer_task.cancelled() and producer_task.exception():
+        raise producer_task.exception()
+    return state["no_entity"]
+
+
+async def run_worker_pool_rounds(job: Job, concurrency: int) -> bool:
+    """
+    并发工作者模式：同时补全 concurrency 个关系最少的实体
+    每个工作者循环执行「租用实体 → 问 → 搜索 → 答 → 写入 → 归还租约」，
+    租约表保证两个工作者不会同时选中同一实体
+    返回：是否因无可租用实体而提前终止
+    """
+    state = {"started": 0, "no_entity": False}
+    # 候选实体数不少于并发数，否则任务指定的并发数高于配置时部分工作者租不到实体而空闲
+    batch_size = max(WORKFLOW_CONFIG.get("entity_batch_size", concurrency * 2), concurrency)
+
+    max_rounds = job.params["max_rounds"]
+
+    async def worker(worker_id: int):
+        owner = f"{job.id}-worker-{worker_id}"
+        while job.running and state["started"] < max_rounds:
+            entity = await asyncio.to_thread(lease_least_relationship_entity, owner, batch_size)
+            if entity is None:
+                # 其余实体均已被租用或数据库为空，本工作者退出
+                print(f"{owner} 无可租用实体，退出")
+                state["no_entity"] = True
+                return
+            try:
+                # 租用成功后再次检查，避免超出最大轮数
+                if not job.running or state["started"] >= max_rounds:
+                    return
+                state["started"] += 1
+                round_no = state["started"]
+                ask_result, answer_input = await run_ask_stage(round_no, entity)
+                if answer_input is not None:
+                    await run_answer_stage(round_no, answer_input)
+                job.rounds_completed += 1
+            finally:
+                entity_leases.release(entity)
+            if job.params["loop_delay"]:
+                await asyncio.sleep(job.params["loop_delay"])
+
+    print(f"并发工作者模式启动，并发数：{concurrency}")
+    await asyncio.gather(*(worker(i + 1) for i in range(concurrency)))
+    # 只有在一轮都未完成时才视为「无有效实体提前终止」
+    return state["no_entity"] and job.rounds_completed == 0
+
 
-            # 推送问智能体结果给前端
-            await notify_clients({
-                "role": "ask",
-                "status": "success",
-                "content": {
-                    "question": question,
-                    "core_entity": f"{entity_label}:{entity_name}" if entity_label else entity_name
-                },
-                "timestamp": time.time()
-            })
-            print(f"问智能体生成：问题={question}")
-            print(f"  核心实体Label={entity_label}，实体名={entity_name}")
-
-            # 3. 调用答智能体（放到线程池执行，避免阻塞事件循环）
-            print(f"--- 第{ask_count + 1}轮：调用答智能体 ---")
-            answer_input = {
-                "question": question,
-                "entity_label": entity_label,
-                "entity_name": entity_name
-            }
-            answer_result = await asyncio.to_thread(generate_answer, answer_input)
-            print("答智能体输出结果：",answer_result)
-            
-            # 推送答智能体结果给前端（包含分步执行结果）
-            await notify_clients({
-                "role": "answer",
-                "status": answer_result["status"],
-                "content": {
-                    "question": answer_result["data"].get("question", ""),
-                    "answer": answer_result["data"].get("answer", ""),
-                    "cypher": answer_result["data"].get("cypher", ""),
-                    "graph_update_summary": answer_result["data"].get("graph_update_summary", ""),
-                    "cypher_steps": answer_result["data"].get("cypher_steps", [])
-                },
-                "error": answer_result.get("error", ""),
-                "timestamp": time.time()
-            })
-            
-            # 打印执行摘要
-            print(f"答智能体结果：状态={answer_result['status']}")
-            print(f"  答案：{answer_result['data'].get('answer', '')[:50]}...")
-            print(f"  图谱更新：{answer_result['data'].get('graph_update_summary', '无')}")
-            if answer_result["data"].get("cypher_steps"):
-                print(f"  执行步骤：共 {len(answer_result['data']['cypher_steps'])} 条")
-
-            # 5. 计数+延迟
-            ask_count += 1
-            time.sleep(WORKFLOW_CONFIG["loop_delay"])
+async def run_workflow(job: Job):
+    """工作流任务主体（由 JobScheduler 在独立的asyncio任务中运行）"""
+    current_job_id.set(job.id)
+    print(f"工作流任务 {job.id} 启动，开始问答循环... 参数：{job.params}")
+    
+    # 开始追踪消耗（调度器已为本任务设置独立的追踪器）
+    tracker = job.tracker
+    tracker.start_workflow()
+    
+    try:
+        # worker_concurrency > 1 时启用并发工作者模式；pipeline_depth > 0 时启用流水线模式；否则逐轮串行执行
+        worker_concurrency = job.params["worker_concurrency"]
+        pipeline_depth = job.params["pipeline_depth"]
+        if worker_concurrency > 1:
+            no_entity = await run_worker_pool_rounds(job, worker_concurrency)
+        elif pipeline_depth > 0:
+            no_entity = await run_pipelined_rounds(job, pipeline_depth)
+        else:
+            no_entity = await run_sequential_rounds(job)
 
         # 工作流结束通知
-        end_msg = f"工作流已结束（触发{ask_count}次ask信号，{'因无有效实体提前终止' if 'ask_result' in locals() and ask_result.get('status') == 'error' else '达到最大次数正常终止'}）"
+        if job.stop_requested:
+            reason = "收到停止信号"
+        else:
+            reason = "因无有效实体提前终止" if no_entity else "达到最大次数正常终止"
+        end_msg = f"工作流已结束（触发{job.rounds_completed}次ask信号，{reason}）"
+        job.message = end_msg
         await notify_clients({
             "role": "system",  # 补充 role 字段，前端统一处理
             "status": "finished",
@@ -211,9 +734,19 @@ async def run_workflow():
             "timestamp": time.time()
         })
         print(end_msg)
+    except asyncio.CancelledError:
+        job.message = f"工作流已取消（已完成{job.rounds_completed}轮）"
+        await notify_clients({
+            "role": "system",
+            "status": "cancelled",
+            "content": job.message,
+            "timestamp": time.time()
+        })
+        print(job.message)
+        raise
     except Exception as e:
-        workflow_running = False
         error_msg = f"工作流异常结束：{str(e)}"
+        job.message = error_msg
         await notify_clients({
             "role": "system",  # 补充 role 字段
             "status": "error",
@@ -221,9 +754,8 @@ async def run_workflow():
             "timestamp": time.time()
         })
         print(error_msg)
+        raise
     finally:
-        workflow_running = False  # 确保最终重置工作流状态
-        
         # 结束追踪并打印统计表格
         tracker.end_workflow()
         tracker.print_table()
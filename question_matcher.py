@@ -0,0 +1,170 @@
+"""
+相似问题匹配
+问智能体经常生成措辞略有不同的同义问题（如"手机的品牌有哪些？"与"手机有哪些品牌？"），
+本模块先做标点/空白/语气词归一化，再用字符n-gram MinHash + LSH 分桶快速找出候选，
+最后用精确Jaccard相似度校验，使同义问题可以复用已缓存的搜索结果；
+数字/英文词（型号、年份）与实体用字必须完全一致，避免"iPhone 15"命中"iPhone 14"、"夏季两项"命中"冬季两项"
+"""
+
+import hashlib
+import random
+import re
+import threading
+import unicodedata
+
+# 不影响语义的常见虚词/语气词，归一化时去掉
+_FILLER_CHARS = set("的了吗呢吧啊呀么")
+# 疑问句式用字：同义改写时允许不同（如"有哪些"↔"有什么"），其余字视为实体用字，必须一致
+_TEMPLATE_CHARS = set("哪些什么有是多少几个怎样如何请问都还包含括")
+_LATIN_DIGIT_TOKEN = re.compile(r"[0-9a-z]+")
+_MERSENNE_PRIME = (1 << 61) - 1
+
+
+def normalize_question(text: str) -> str:
+    """归一化：全半角统一、小写、去除标点/空白/语气词"""
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    return "".join(
+        ch for ch in text
+        if ch not in _FILLER_CHARS and not unicodedata.category(ch).startswith(("P", "Z", "S", "C"))
+    )
+
+
+def char_shingles(normalized: str) -> set:
+    """字符1-gram + 2-gram集合：1-gram对语序不敏感，2-gram保留局部搭配"""
+    unigrams = set(normalized)
+    bigrams = {normalized[i:i + 2] for i in range(len(normalized) - 1)}
+    return unigrams | bigrams
+
+
+def exact_tokens(normalized: str) -> set:
+    """数字/英文词集合（如型号"iphone15"、年份"2026"），相似问题之间必须完全相同"""
+    return set(_LATIN_DIGIT_TOKEN.findall(normalized))
+
+
+def entity_chars_match(a: str, b: str) -> bool:
+    """两个问题之间不同的字（数字/英文除外）只能是疑问句式用字，不同的实体用字视为不同问题"""
+    differing = set(a) ^ set(b)
+    return all(
+        ch in _TEMPLATE_CHARS or _LATIN_DIGIT_TOKEN.fullmatch(ch)
+        for ch in differing
+    )
+
+
+def jaccard(a: set, b: set) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def _stable_hash(token: str) -> int:
+    # 不使用内置hash()：其结果随进程随机化，无法跨进程/重启保持一致
+    return int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class QuestionMatcher:
+    """
+    相似问题索引
+    threshold：shingle集合Jaccard相似度阈值
+    min_char_overlap：单字集合Jaccard下限，防止"手机有哪些品牌"与"电脑有哪些品牌"这类仅实体不同的问题被误判为相似
+    此外数字/英文词必须完全相同、不同的字只能是疑问句式用字（见 exact_tokens / entity_chars_match）
+    num_perm / bands：MinHash签名长度与LSH分段数（rows = num_perm / bands）
+    """
+    def __init__(self, threshold: float = 0.7, min_char_overlap: float = 0.8, num_perm: int = 64, bands: int = 16):
+        if num_perm % bands:
+            raise ValueError("num_perm 必须能被 bands 整除")
+        self.threshold = threshold
+        self.min_char_overlap = min_char_overlap
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        rng = random.Random(20240101)  # 固定种子：签名在不同进程间可复现
+        self.permutations = [
+            (rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME)) for _ in range(num_perm)
+        ]
+        self.exact = {}  # 归一化文本 → 原始问题
+        self.shingles = {}  # 原始问题 → shingle集合
+        self.normalized = {}  # 原始问题 → 归一化文本
+        self.buckets = {}  # (分段序号, 分段签名) → 原始问题集合
+        self.lock = threading.Lock()
+
+    def _signature(self, shingles: set) -> list:
+        hashes = [_stable_hash(token) for token in shingles]
+        return [
+            min(((a * h + b) % _MERSENNE_PRIME) for h in hashes)
+            for a, b in self.permutations
+        ]
+
+    def _band_keys(self, signature: list) -> list:
+        return [
+            (band, tuple(signature[band * self.rows:(band + 1) * self.rows]))
+            for band in range(self.bands)
+        ]
+
+    def add(self, question: str):
+        """将问题加入索引"""
+        normalized = normalize_question(question)
+        if not normalized:
+            return
+        shingles = char_shingles(normalized)
+        band_keys = self._band_keys(self._signature(shingles))
+        with self.lock:
+            if question in self.shingles:
+                return
+            self.exact.setdefault(normalized, question)
+            self.shingles[question] = shingles
+            self.normalized[question] = normalized
+            for key in band_keys:
+                self.buckets.setdefault(key, set()).add(question)
+
+    def remove(self, question: str):
+        """从索引中移除问题（如对应缓存已过期）"""
+        with self.lock:
+            shingles = self.shingles.pop(question, None)
+            if shingles is None:
+                return
+            normalized = self.normalized.pop(question)
+            if self.exact.get(normalized) == question:
+                del self.exact[normalized]
+            for key in self._band_keys(self._signature(shingles)):
+                bucket = self.buckets.get(key)
+                if bucket is not None:
+                    bucket.discard(question)
+                    if not bucket:
+                        del self.buckets[key]
+
+    def match(self, question: str):
+        """
+        查找最相似的已索引问题
+        返回：(原始问题, 相似度)；无满足阈值的问题时返回 (None, 0.0)
+        """
+        normalized = normalize_question(question)
+        if not normalized:
+            return None, 0.0
+        with self.lock:
+            if normalized in self.exact:
+                return self.exact[normalized], 1.0
+        shingles = char_shingles(normalized)
+        band_keys = self._band_keys(self._signature(shingles))
+        with self.lock:
+            candidates = set()
+            for key in band_keys:
+                candidates |= self.buckets.get(key, set())
+            best, best_score = None, 0.0
+            unigrams = set(normalized)
+            tokens = exact_tokens(normalized)
+            for candidate in candidates:
+                candidate_shingles = self.shingles[candidate]
+                score = jaccard(shingles, candidate_shingles)
+                if score < self.threshold or score <= best_score:
+                    continue
+                candidate_unigrams = {token for token in candidate_shingles if len(token) == 1}
+                if jaccard(unigrams, candidate_unigrams) < self.min_char_overlap:
+                    continue
+                candidate_normalized = self.normalized[candidate]
+                if exact_tokens(candidate_normalized) != tokens or not entity_chars_match(normalized, candidate_normalized):
+                    continue
+                best, best_score = candidate, score
+        return best, best_score
+
+    def __len__(self):
+        return len(self.shingles)
@@ -0,0 +1,79 @@
+"""
+全局限流（令牌桶）
+按「每分钟请求数」与「每分钟token数」分别限流：额度充足时不等待，额度用尽时按补充速率排队等待，
+并发轮次共享同一组令牌桶，避免集中触发上游429
+"""
+
+import asyncio
+import time
+from threading import Lock
+
+
+class TokenBucket:
+    """
+    令牌桶：每分钟补充 rate_per_minute 个令牌，最多积攒 capacity 个（默认为一分钟的额度）
+    采用预约方式：reserve 立即扣除令牌（余额可为负），返回需要等待的秒数，
+    因此并发调用方按先后顺序依次排队，不会同时醒来争抢
+    rate_per_minute <= 0 表示不限流
+    """
+    def __init__(self, rate_per_minute: float = 0, capacity: float = None):
+        self.rate = rate_per_minute / 60.0 if rate_per_minute and rate_per_minute > 0 else 0.0
+        self.capacity = capacity if capacity else rate_per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float = 1) -> float:
+        """预约 amount 个令牌，返回需要等待的秒数（单次预约不超过桶容量）"""
+        if not self.enabled or amount <= 0:
+            return 0.0
+        with self.lock:
+            self._refill(time.monotonic())
+            self.tokens -= min(amount, self.capacity)
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def consume(self, amount: float):
+        """事后扣除令牌（不等待），如响应返回后补扣实际输出token；余额不足时由后续调用方等待"""
+        if not self.enabled or amount <= 0:
+            return
+        with self.lock:
+            self._refill(time.monotonic())
+            self.tokens -= amount
+
+
+class RateLimiter:
+    """一个上游服务的限流器：请求数令牌桶 + token数令牌桶（可只启用其一）"""
+    def __init__(self, name: str, requests_per_minute: float = 0, tokens_per_minute: float = 0):
+        self.name = name
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+
+    def _reserve(self, estimated_tokens: int) -> float:
+        delay = max(self.requests.reserve(1), self.tokens.reserve(estimated_tokens))
+        if delay > 0:
+            print(f"⏳ {self.name}限流：等待{delay:.2f}秒")
+        return delay
+
+    def acquire(self, estimated_tokens: int = 0):
+        """同步等待额度：1个请求 + 预估的token数"""
+        delay = self._reserve(estimated_tokens)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def aacquire(self, estimated_tokens: int = 0):
+        """异步等待额度（仅挂起当前协程）"""
+        delay = self._reserve(estimated_tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def record_tokens(self, tokens: int):
+        """补扣调用前无法预估的token（如输出token）"""
+        self.tokens.consume(tokens)
@@ -0,0 +1,22 @@
+"""
+搜索后端选择
+所有后端实现相同接口：search(query) -> dict / async asearch(query) -> dict，
+返回值包含 organic_results 列表（每项含 title、snippet），由 tools.py 统一打包为搜索结果
+  serpapi：在线搜索（SerpApiClient，带超时/重试/熔断）
+  local：本地语料BM25离线搜索（LocalSearchBackend，无需外网）
+"""
+
+from local_search import LocalSearchBackend
+from search_client import SerpApiClient
+
+SEARCH_BACKENDS = ("serpapi", "local")
+
+
+def create_search_backend(config: dict, default_index_path: str = ""):
+    """按配置 backend 创建搜索后端（默认 serpapi）"""
+    name = config.get("backend", "serpapi")
+    if name == "serpapi":
+        return SerpApiClient(config)
+    if name == "local":
+        return LocalSearchBackend(config, default_index_path=default_index_path)
+    raise ValueError(f"未知的搜索后端：{name}（可选：{', '.join(SEARCH_BACKENDS)}）")
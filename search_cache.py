@@ -0,0 +1,121 @@
+"""
+搜索结果持久化缓存
+基于本地SQLite（WAL模式）：重启后缓存仍在，多个worker进程可共享同一文件；
+支持单条TTL过期与按最近访问时间（LRU）的容量淘汰
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+
+class SearchCache:
+    def __init__(self, path: str, max_entries: int = 10000, ttl: float = 7 * 24 * 3600):
+        """
+        path：SQLite文件路径（目录不存在时自动创建）
+        max_entries：最多保留的条目数，超出后淘汰最久未访问的条目
+        ttl：默认有效期（秒），<=0 表示永不过期
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.local = threading.local()  # 每个线程独立连接（sqlite3连接不可跨线程共享）
+        self.hits = 0
+        self.misses = 0
+        self.counter_lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._connect().execute(
+            """
+            CREATE TABLE IF NOT EXISTS search_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                expires_at REAL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._connect().execute("CREATE INDEX IF NOT EXISTS idx_search_cache_access ON search_cache(last_access)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            # isolation_level=None：自动提交；timeout：多进程写锁等待时间
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    def _count(self, hit: bool):
+        with self.counter_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key: str):
+        """读取缓存；未命中或已过期返回None"""
+        now = time.time()
+        conn = self._connect()
+        row = conn.execute("SELECT value, expires_at FROM search_cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self._count(False)
+            return None
+        value, expires_at = row
+        if expires_at is not None and expires_at <= now:
+            conn.execute("DELETE FROM search_cache WHERE key = ? AND expires_at <= ?", (key, now))
+            self._count(False)
+            return None
+        conn.execute("UPDATE search_cache SET last_access = ? WHERE key = ?", (now, key))
+        self._count(True)
+        return value
+
+    def set(self, key: str, value: str, ttl: float = None):
+        """写入缓存；ttl为空时使用默认有效期"""
+        now = time.time()
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = now + ttl if ttl and ttl > 0 else None
+        conn = self._connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO search_cache (key, value, created_at, expires_at, last_access) VALUES (?, ?, ?, ?, ?)",
+            (key, value, now, expires_at, now),
+        )
+        self._evict(conn, now)
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        """先清理过期条目，再按LRU淘汰超出容量的部分"""
+        conn.execute("DELETE FROM search_cache WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,))
+        overflow = conn.execute("SELECT COUNT(*) FROM search_cache").fetchone()[0] - self.max_entries
+        if overflow > 0:
+            conn.execute(
+                "DELETE FROM search_cache WHERE key IN (SELECT key FROM search_cache ORDER BY last_access ASC LIMIT ?)",
+                (overflow,),
+            )
+
+    def keys(self, limit: int = None) -> list:
+        """未过期的缓存键，按最近访问时间倒序"""
+        rows = self._connect().execute(
+            "SELECT key FROM search_cache WHERE expires_at IS NULL OR expires_at > ? ORDER BY last_access DESC LIMIT ?",
+            (time.time(), -1 if limit is None else limit),
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def __contains__(self, key: str) -> bool:
+        row = self._connect().execute(
+            "SELECT 1 FROM search_cache WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)", (key, time.time())
+        ).fetchone()
+        return row is not None
+
+    def clear(self):
+        """清空全部条目"""
+        self._connect().execute("DELETE FROM search_cache")
+
+    def __len__(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM search_cache").fetchone()[0]
+
+    def stats(self) -> dict:
+        with self.counter_lock:
+            return {"hits": self.hits, "misses": self.misses}
@@ -0,0 +1,188 @@
+"""
+SerpAPI搜索客户端
+长连接HTTP连接池 + 连接/读取超时 + 带抖动的指数退避重试 + 熔断器：
+上游变慢时单次请求有明确上限，上游不可用时快速失败，而不是拖住整轮问答
+"""
+
+import asyncio
+import random
+import time
+from threading import Lock
+
+import httpx
+
+SERPAPI_ENDPOINT = "https://serpapi.com/search.json"
+# 可重试的HTTP状态码：限流与服务端错误
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """熔断器打开：上游连续失败，暂停调用"""
+
+
+class TransientSearchError(Exception):
+    """可重试的临时错误（超时、连接失败、限流、5xx）"""
+
+
+class SearchHTTPError(Exception):
+    """不可重试的HTTP错误（4xx等）：只携带状态码与原因，不含请求URL（URL中带有 api_key）"""
+    def __init__(self, status_code: int, reason: str = ""):
+        super().__init__(f"HTTP {status_code} {reason}".strip())
+        self.status_code = status_code
+
+
+class CircuitBreaker:
+    """
+    熔断器：连续失败 failure_threshold 次后打开，reset_timeout 秒内直接拒绝请求；
+    之后进入半开状态放行一次试探请求，成功则关闭，失败则重新打开
+    """
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.half_open_probe = False
+        self.lock = Lock()
+
+    @property
+    def state(self) -> str:
+        with self.lock:
+            if self.opened_at is None:
+                return "closed"
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                return "half_open"
+            return "open"
+
+    def allow(self) -> bool:
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            # 半开状态：同一时间只放行一个试探请求
+            if self.half_open_probe:
+                return False
+            self.half_open_probe = True
+            return True
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.half_open_probe = False
+
+    def release_probe(self):
+        """试探请求既未成功也未失败（如被取消）时释放试探名额，熔断器状态不变"""
+        with self.lock:
+            self.half_open_probe = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.half_open_probe = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class SerpApiClient:
+    """SerpAPI客户端：同步/异步两套连接池，共用重试策略与熔断器"""
+    def __init__(self, config: dict):
+        self.config = config
+        timeout = httpx.Timeout(
+            config.get("timeout", 10),
+            connect=config.get("connect_timeout", 5),
+        )
+        limits = httpx.Limits(
+            max_connections=config.get("max_connections", 20),
+            max_keepalive_connections=config.get("max_keepalive_connections", 10),
+        )
+        self.client = httpx.Client(timeout=timeout, limits=limits)
+        self.async_client = httpx.AsyncClient(timeout=timeout, limits=limits)
+        self.max_retries = config.get("max_retries", 3)
+        self.backoff_base = config.get("backoff_base", 0.5)
+        self.backoff_max = config.get("backoff_max", 8)
+        self.breaker = CircuitBreaker(
+            failure_threshold=config.get("breaker_failure_threshold", 5),
+            reset_timeout=config.get("breaker_reset_timeout", 30),
+        )
+
+    def _params(self, query: str) -> dict:
+        api_key = self.config.get("api_key")
+        if not api_key:
+            raise ValueError("SERPAPI api_key 未配置")
+        return {
+            "q": query,
+            "engine": self.config.get("engine", "baidu"),
+            "hl": self.config.get("hl", "zh-CN"),
+            "gl": self.config.get("gl", "cn"),
+            "api_key": api_key,
+        }
+
+    def _backoff(self, attempt: int) -> float:
+        # Full Jitter：在 [0, min(上限, 基数*2^attempt)] 内随机，避免并发重试同时打到上游
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    @staticmethod
+    def _check_response(response: httpx.Response) -> dict:
+        if response.status_code in RETRYABLE_STATUS:
+            raise TransientSearchError(f"HTTP {response.status_code}")
+        if response.is_error:
+            # 不使用 raise_for_status：其异常信息包含完整URL（含 api_key），会进入日志与提示词
+            raise SearchHTTPError(response.status_code, response.reason_phrase)
+        return response.json()
+
+    def search(self, query: str) -> dict:
+        """同步搜索"""
+        params = self._params(query)
+        if not self.breaker.allow():
+            raise CircuitOpenError("搜索服务熔断中，暂停调用SerpAPI")
+        try:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    results = self._check_response(self.client.get(SERPAPI_ENDPOINT, params=params))
+                except (httpx.TransportError, TransientSearchError) as e:
+                    if attempt >= self.max_retries:
+                        self.breaker.record_failure()
+                        raise
+                    delay = self._backoff(attempt)
+                    print(f"⚠️ 搜索请求失败（{type(e).__name__}: {e}），{delay:.2f}秒后第{attempt + 1}次重试")
+                    time.sleep(delay)
+                    continue
+                except Exception:
+                    # 4xx等不可重试错误：上游可达，不计入熔断
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_success()
+                return results
+        except BaseException:
+            # 请求被取消/中断（未经过 record_success/record_failure）时释放半开试探名额，否则熔断器一直拒绝请求
+            self.breaker.release_probe()
+            raise
+
+    async def asearch(self, query: str) -> dict:
+        """异步搜索（仅占用协程，不占用线程）"""
+        params = self._params(query)
+        if not self.breaker.allow():
+            raise CircuitOpenError("搜索服务熔断中，暂停调用SerpAPI")
+        try:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    results = self._check_response(await self.async_client.get(SERPAPI_ENDPOINT, params=params))
+                except (httpx.TransportError, TransientSearchError) as e:
+                    if attempt >= self.max_retries:
+                        self.breaker.record_failure()
+                        raise
+                    delay = self._backoff(attempt)
+                    print(f"⚠️ 搜索请求失败（{type(e).__name__}: {e}），{delay:.2f}秒后第{attempt + 1}次重试")
+                    await asyncio.sleep(delay)
+                    continue
+                except Exception:
+                    # 4xx等不可重试错误：上游可达，不计入熔断
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_success()
+                return results
+        except BaseException:
+            # 请求被取消/中断（未经过 record_success/record_failure）时释放半开试探名额，否则熔断器一直拒绝请求
+            self.breaker.release_probe()
+            raise
@@ -0,0 +1,92 @@
+"""
+在途请求合并（single-flight）
+同一个键同时只执行一次实际调用：第一个调用方负责执行，其余并发调用方等待其结果。
+线程调用（do）与协程调用（ado）共用同一张在途表，两种调用方式之间同样会合并。
+执行方被取消/中断（如任务被取消）时不把取消传给等待方：等待方重新竞争，由其中一个重新执行调用
+"""
+
+import asyncio
+from concurrent.futures import Future
+from threading import Lock
+
+# 执行方被取消/中断时写入共享 Future 的标记：等待方据此重新发起调用，而不是随之失败
+_ABANDONED = object()
+
+
+class SingleFlight:
+    def __init__(self):
+        self.calls = {}  # 键 → 在途调用的 Future
+        self.lock = Lock()
+
+    def _claim(self, key: str):
+        """返回 (future, 是否由当前调用方执行)"""
+        with self.lock:
+            future = self.calls.get(key)
+            if future is not None:
+                return future, False
+            future = Future()
+            self.calls[key] = future
+            return future, True
+
+    def _finish(self, key: str, future: Future, result=None, error: BaseException = None):
+        with self.lock:
+            self.calls.pop(key, None)
+        # 防御：Future 已被取消/完成时不再设置结果，避免 InvalidStateError 覆盖执行方的真实结果
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def do(self, key: str, fn):
+        """
+        同步调用：fn 为无参函数
+        返回：(结果, 是否复用了其他调用方的结果)
+        """
+        while True:
+            future, leader = self._claim(key)
+            if not leader:
+                result = future.result()
+                if result is _ABANDONED:
+                    continue
+                return result, True
+            try:
+                result = fn()
+            except Exception as e:
+                self._finish(key, future, error=e)
+                raise
+            except BaseException:
+                self._finish(key, future, result=_ABANDONED)
+                raise
+            self._finish(key, future, result=result)
+            return result, False
+
+    async def ado(self, key: str, afn):
+        """
+        异步调用：afn 为返回协程的无参函数
+        返回：(结果, 是否复用了其他调用方的结果)
+        """
+        while True:
+            future, leader = self._claim(key)
+            if not leader:
+                # shield：等待方被取消时只取消自己的等待，不取消共享的 Future（否则执行方与其他等待方一起失败）
+                result = await asyncio.shield(asyncio.wrap_future(future))
+                if result is _ABANDONED:
+                    continue
+                return result, True
+            try:
+                result = await afn()
+            except Exception as e:
+                self._finish(key, future, error=e)
+                raise
+            except BaseException:
+                # 执行方被取消：不把 CancelledError 传给其他任务的等待方，由等待方重新执行
+                self._finish(key, future, result=_ABANDONED)
+                raise
+            self._finish(key, future, result=result)
+            return result, False
+
+    def in_flight(self) -> int:
+        with self.lock:
+            return len(self.calls)
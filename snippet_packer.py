@@ -0,0 +1,90 @@
+"""
+搜索摘要打包
+从多条搜索结果中去重、按与问题的词项重合度排序，并在token预算与字符上限内尽量多地装入有用摘要，
+让每次答智能体LLM调用在同样的输入token下获得更多事实
+"""
+
+import unicodedata
+
+from question_matcher import normalize_question, char_shingles, jaccard
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算token数：中日韩文字按1字1token，其余字符按4字符1token（偏保守）"""
+    cjk = sum(1 for ch in text if unicodedata.east_asian_width(ch) in ("W", "F"))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def _overlap_score(question_terms: set, snippet: str) -> float:
+    """词项重合度：问题的字符1/2-gram有多少比例出现在摘要中"""
+    if not question_terms:
+        return 0.0
+    return len(question_terms & char_shingles(normalize_question(snippet))) / len(question_terms)
+
+
+def dedupe_snippets(snippets: list, threshold: float = 0.8) -> list:
+    """去除重复/高度重叠的摘要（完全包含或字符n-gram相似度超过阈值），保留先出现的"""
+    kept = []
+    kept_shingles = []
+    for snippet in snippets:
+        normalized = normalize_question(snippet)
+        if not normalized:
+            continue
+        shingles = char_shingles(normalized)
+        duplicate = False
+        for existing, existing_shingles in zip(kept, kept_shingles):
+            existing_normalized = normalize_question(existing)
+            if normalized in existing_normalized or jaccard(shingles, existing_shingles) >= threshold:
+                duplicate = True
+                break
+            if existing_normalized in normalized:
+                # 新摘要包含旧摘要：用信息更完整的新摘要替换
+                index = kept.index(existing)
+                kept[index], kept_shingles[index] = snippet, shingles
+                duplicate = True
+                break
+        if not duplicate:
+            kept.append(snippet)
+            kept_shingles.append(shingles)
+    return kept
+
+
+def _truncate_to_budget(text: str, max_tokens: int, max_chars: int) -> str:
+    """截断到预算内，末尾加省略号（省略号计入预算）"""
+    end = min(len(text), max_chars - 1)
+    while end > 0 and estimate_tokens(text[:end]) + 1 > max_tokens:
+        end -= 1
+    truncated = text[:end].rstrip()
+    return truncated + "…" if truncated else ""
+
+
+def pack_snippets(question: str, snippets: list, token_budget: int = 600, max_chars: int = 500) -> list:
+    """
+    去重 → 按重合度排序（同分保持搜索引擎原有顺序）→ 在预算内贪心装入
+    token_budget：摘要部分总token上限；max_chars：摘要部分总字符上限
+    返回：装入的摘要列表（按相关度从高到低）
+    """
+    question_terms = char_shingles(normalize_question(question))
+    candidates = dedupe_snippets([snippet.strip() for snippet in snippets if snippet and snippet.strip()])
+    ranked = sorted(
+        enumerate(candidates),
+        key=lambda item: (-_overlap_score(question_terms, item[1]), item[0])
+    )
+
+    packed = []
+    used_tokens = 0
+    used_chars = 0
+    for _, snippet in ranked:
+        tokens = estimate_tokens(snippet)
+        if used_tokens + tokens <= token_budget and used_chars + len(snippet) <= max_chars:
+            packed.append(snippet)
+            used_tokens += tokens
+            used_chars += len(snippet)
+        elif not packed:
+            # 最相关的一条单独就超出预算：截断后装入，保证至少有一条结果
+            truncated = _truncate_to_budget(snippet, token_budget, max_chars)
+            if truncated:
+                packed.append(truncated)
+                used_tokens += estimate_tokens(truncated)
+                used_chars += len(truncated)
+    return packed
@@ -31,7 +31,7 @@ def debug_answer_agent_full_flow():
         print(f"问题：{result['data']['question']}")
         print(f"答案：{result['data']['answer']}")
         print(f"Cypher语句：{result['data']['cypher']}")
-        print(f"图谱更新结果：{result['data']['graph_update_result']}")
+        print(f"图谱更新结果：{result['data']['graph_update_summary']}")
 
         # 验证图谱更新
         print("\n4. 验证 Neo4j 图谱更新...")
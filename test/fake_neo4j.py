@@ -0,0 +1,167 @@
+# 测试用Neo4j替身：以 config-demo.py 作为配置、把 Neo4jGraph 换成内存假连接后导入 tools，无需连接数据库
+import sys
+import os
+import types
+import tempfile
+import importlib.util
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(PROJECT_ROOT)
+
+
+class FakeCounters:
+    def __init__(self, relationships_created: int = 0):
+        self.relationships_created = relationships_created
+
+
+class FakeRecord:
+    def __init__(self, row: dict):
+        self.row = row
+
+    def data(self) -> dict:
+        return dict(self.row)
+
+
+class FakeResult:
+    def __init__(self, rows: list, relationships_created: int = 0):
+        self.rows = rows
+        self.counters = FakeCounters(relationships_created)
+
+    def __iter__(self):
+        return iter([FakeRecord(row) for row in self.rows])
+
+    def consume(self):
+        return self
+
+
+class FakeTransaction:
+    """显式事务：语句先记入事务，commit 后才算写入；未提交即退出视为回滚"""
+    def __init__(self, graph):
+        self.graph = graph
+        self.statements = []
+
+    def run(self, query: str, params: dict = None):
+        result = self.graph.execute(query, params)
+        self.statements.append(query)
+        return result
+
+    def commit(self):
+        FakeGraph.committed.extend(self.statements)
+        self.statements = []
+
+    def rollback(self):
+        FakeGraph.rolled_back.extend(self.statements)
+        self.statements = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if self.statements:
+            FakeGraph.rolled_back.extend(self.statements)
+        return False
+
+
+class FakeSession:
+    def __init__(self, graph):
+        self.graph = graph
+
+    def run(self, query: str, params: dict = None):
+        result = self.graph.execute(query, params)
+        FakeGraph.committed.append(query)
+        return result
+
+    def begin_transaction(self):
+        return FakeTransaction(self.graph)
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class FakeDriver:
+    def __init__(self, graph):
+        self.graph = graph
+
+    def session(self, **kwargs):
+        return FakeSession(self.graph)
+
+
+class FakeGraph:
+    """
+    替换 langchain 的 Neo4jGraph：连接池中的各连接共用同一个 handler 与执行记录
+    handler(query, params) 返回记录列表，或 (记录列表, 新建关系数)；抛出异常模拟执行失败
+    """
+    handler = None
+    committed = []  # 已提交（自动提交或事务提交）的语句
+    rolled_back = []  # 事务回滚丢弃的语句
+
+    def __init__(self, **kwargs):
+        self._driver = FakeDriver(self)
+        self._database = kwargs.get("database")
+
+    @classmethod
+    def reset(cls, handler=None):
+        cls.handler = handler
+        cls.committed = []
+        cls.rolled_back = []
+
+    def execute(self, query: str, params: dict = None) -> FakeResult:
+        output = FakeGraph.handler(query, params or {}) if FakeGraph.handler else []
+        rows, created = output if isinstance(output, tuple) else (output, 0)
+        return FakeResult(rows or [], created)
+
+    def query(self, query: str, params: dict = None) -> list:
+        rows = self.execute(query, params).rows
+        FakeGraph.committed.append(query)
+        return rows
+
+
+_config = None
+
+
+def demo_config():
+    """以 config-demo.py 作为 config 模块（只加载一次，测试可直接修改其中的配置字典）"""
+    global _config
+    if _config is None:
+        spec = importlib.util.spec_from_file_location("config", os.path.join(PROJECT_ROOT, "config-demo.py"))
+        _config = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(_config)
+        # 搜索缓存写到临时目录，不污染项目 cache/ 目录
+        _config.SERPAPI_CONFIG["cache_path"] = os.path.join(tempfile.mkdtemp(), "search_cache.sqlite3")
+    return _config
+
+
+def import_with_fakes(module_name: str, fakes: dict = None):
+    """
+    在伪造的 config / Neo4jGraph（及 fakes 中给出的其他模块）下导入模块，导入后恢复 sys.modules，
+    已导入的模块仍保留对替身的引用；tools 只导入一次，供各测试文件共用
+    """
+    graphs = types.ModuleType("langchain_community.graphs")
+    graphs.Neo4jGraph = FakeGraph
+    fakes = {
+        "config": demo_config(),
+        "langchain_community": types.ModuleType("langchain_community"),
+        "langchain_community.graphs": graphs,
+        **(fakes or {}),
+    }
+    saved = {name: sys.modules.get(name) for name in fakes}
+    sys.modules.update(fakes)
+    try:
+        __import__("tools")
+        return __import__(module_name)
+    finally:
+        for name, module in saved.items():
+            if module is None:
+                sys.modules.pop(name, None)
+            else:
+                sys.modules[name] = module
+
+
+def import_tools():
+    return import_with_fakes("tools")
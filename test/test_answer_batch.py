@@ -0,0 +1,56 @@
+# 批量答智能体输出拆分测试（不调用LLM，仅验证按问题分段与Cypher提取）
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+pytest.importorskip("httpx")
+pytest.importorskip("langchain_openai")
+
+from fake_neo4j import import_with_fakes
+
+answer_agent = import_with_fakes("answer_agent")
+split_answer_sections = answer_agent.split_answer_sections
+extract_cypher = answer_agent.extract_cypher
+
+BATCH_OUTPUT = """### 问题1
+回复结果：华为总部位于深圳。
+```cypher
+CREATE CONSTRAINT 城市_name_unique FOR (n:城市) REQUIRE n.name IS UNIQUE;
+MERGE (c:城市 {name: '深圳'});
+MATCH (b:品牌 {name: '华为'})
+MATCH (c:城市 {name: '深圳'})
+MERGE (b)-[r:总部位于]->(c);
+```
+
+### 问题2
+回复结果：小米成立于2010年。
+```cypher
+MATCH (b:品牌 {name: '小米'})
+SET b.founded = '2010';
+```
+"""
+
+
+def test_split_by_section_marker():
+    """测试1：按「### 问题N」分段，每段只包含该问题的答案与Cypher"""
+    sections = split_answer_sections(BATCH_OUTPUT, 3)
+    assert "华为" in sections[0] and "小米" not in sections[0], f"❌ 第1段错误：{sections[0]}"
+    assert extract_cypher(sections[1]) == "MATCH (b:品牌 {name: '小米'})\nSET b.founded = '2010';", "❌ 第2段Cypher错误"
+    assert sections[2] == "", "❌ 缺失的问题应返回空段"
+    print("✅ 按标记分段正常")
+
+
+def test_split_without_marker():
+    """测试2：模型未输出分段标记时，按Cypher代码块顺序切分"""
+    output = BATCH_OUTPUT.replace("### 问题1\n", "").replace("### 问题2\n", "")
+    sections = split_answer_sections(output, 2)
+    assert "深圳" in extract_cypher(sections[0]) and "小米" in extract_cypher(sections[1]), f"❌ 切分错误：{sections}"
+    assert sections[1].startswith("回复结果：小米"), "❌ 第2段应包含对应的回复结果"
+    print("✅ 无标记时按代码块切分正常")
+
+
+if __name__ == "__main__":
+    test_split_by_section_marker()
+    test_split_without_marker()
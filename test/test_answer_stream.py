@@ -0,0 +1,101 @@
+# 答智能体流式输出测试（LLM与Neo4j均为替身，不调用Deepseek与数据库）
+import sys
+import os
+import asyncio
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+pytest.importorskip("httpx")
+pytest.importorskip("langchain_openai")
+
+from langchain_core.messages import AIMessageChunk
+
+from fake_neo4j import FakeGraph, import_with_fakes
+
+answer_agent = import_with_fakes("answer_agent")
+AnswerStreamSplitter = answer_agent.AnswerStreamSplitter
+
+OUTPUT = "回复结果：华为总部位于深圳。\n```cypher\nMERGE (c:城市 {name: '深圳'});\n```\n以上为写入语句。"
+
+
+def split_in_chunks(text: str, size: int) -> list:
+    splitter = AnswerStreamSplitter()
+    deltas = []
+    for i in range(0, len(text), size):
+        deltas.extend(splitter.feed(text[i:i + size]))
+    deltas.extend(splitter.flush())
+    merged = {"answer": "", "cypher": ""}
+    for kind, delta in deltas:
+        merged[kind] += delta
+    return merged
+
+
+def test_split_answer_and_cypher():
+    """测试1：任意分块大小下（围栏被拆在两个chunk之间）都能正确拆出答案与Cypher"""
+    for size in (1, 2, 3, 5, 9, len(OUTPUT)):
+        merged = split_in_chunks(OUTPUT, size)
+        assert merged["cypher"] == "\nMERGE (c:城市 {name: '深圳'});\n", f"❌ 分块{size}时Cypher错误：{merged}"
+        assert merged["answer"] == "回复结果：华为总部位于深圳。\n\n以上为写入语句。", f"❌ 分块{size}时答案错误：{merged}"
+    print("✅ 答案与Cypher拆分正常")
+
+
+def test_unclosed_block_flushed_as_cypher():
+    """测试2：代码块未闭合时，flush把剩余内容作为Cypher输出；不完整的围栏前缀不会被误当作答案"""
+    splitter = AnswerStreamSplitter()
+    deltas = splitter.feed("答案```cyp") + splitter.feed("her\nMERGE (n:A {name: 'a'});") + splitter.flush()
+    assert ("answer", "答案") in deltas, f"❌ 答案错误：{deltas}"
+    assert "".join(d for k, d in deltas if k == "cypher") == "\nMERGE (n:A {name: 'a'});", f"❌ Cypher错误：{deltas}"
+    print("✅ 未闭合代码块正常输出")
+
+
+class BrokenStreamLLM:
+    """流式输出到一半断开的LLM替身：最后一条语句尚未以分号结束"""
+    cache = None
+
+    async def astream(self, messages):
+        for text in ["回复结果：华为总部位于深圳。\n```cypher\nMERGE (b:品牌 {name: '华为'});\n", "MATCH (b:品牌 {name: '华"]:
+            yield AIMessageChunk(content=text)
+            await asyncio.sleep(0)
+        raise ConnectionError("流式连接中断")
+
+
+def test_stream_abort_discards_truncated_cypher():
+    """测试3：流式输出中断时执行器只提交已完整的语句，截断的语句不执行，且执行器任务已结束"""
+    FakeGraph.reset()
+    deltas = []
+
+    async def on_delta(kind, delta):
+        deltas.append(kind)
+
+    async def fake_search(question):
+        return "搜索结果：华为总部位于深圳"
+
+    async def run():
+        executor = answer_agent.IncrementalCypherExecutor(core_label="品牌")
+        try:
+            await answer_agent._astream_answer_chain(
+                {"question": "华为总部在哪？", "entity_label": "品牌", "entity_name": "华为"}, on_delta, executor
+            )
+            assert False, "❌ 流式中断应抛出异常"
+        except ConnectionError:
+            pass
+        pending = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        return executor, pending
+
+    llm, search = answer_agent.llm, answer_agent.asearch_tool
+    answer_agent.llm, answer_agent.asearch_tool = BrokenStreamLLM(), fake_search
+    try:
+        executor, pending = asyncio.run(run())
+    finally:
+        answer_agent.llm, answer_agent.asearch_tool = llm, search
+    assert executor.closed and not pending, f"❌ 执行器任务未结束：{pending}"
+    assert FakeGraph.committed == ["MERGE (b:品牌 {name: '华为'});"], f"❌ 提交内容错误：{FakeGraph.committed}"
+    assert "cypher" in deltas, "❌ 中断前的增量应已推送"
+    print("✅ 流式中断时丢弃截断的Cypher")
+
+
+if __name__ == "__main__":
+    test_split_answer_and_cypher()
+    test_unclosed_block_flushed_as_cypher()
+    test_stream_abort_discards_truncated_cypher()
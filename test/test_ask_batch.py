@@ -0,0 +1,56 @@
+# 批量问智能体输出解析测试（不调用LLM，仅验证逐行拆分与校验）
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+pytest.importorskip("httpx")
+pytest.importorskip("langchain_openai")
+
+from fake_neo4j import import_with_fakes
+
+ask_agent = import_with_fakes("ask_agent")
+_parse_batch_output = ask_agent._parse_batch_output
+
+ENTITIES = [
+    {"name": "华为", "label": "品牌"},
+    {"name": "小米", "label": "品牌"},
+    {"name": "苹果", "label": "品牌"},
+]
+
+
+def test_match_by_core_entity():
+    """测试1：按「@@@」后的核心实体匹配（顺序打乱、带编号、带Label前缀均可）"""
+    raw_output = "1. 小米的创始人是谁？@@@品牌:小米\n2、华为总部在哪里？@@@华为\n3) 苹果有哪些产品？@@@苹果"
+    results = _parse_batch_output(raw_output, ENTITIES)
+    questions = [r["data"]["question"] for r in results]
+    assert questions == ["华为总部在哪里？", "小米的创始人是谁？", "苹果有哪些产品？"], f"❌ 匹配错误：{questions}"
+    assert all(r["status"] == "success" for r in results), "❌ 合规问题应为success"
+    print("✅ 按核心实体匹配正常")
+
+
+def test_validate_each_line():
+    """测试2：逐行校验，非疑问句为warning，缺失的实体返回空问题"""
+    raw_output = "华为总部在哪里？@@@华为\n小米是一家公司@@@小米"
+    results = _parse_batch_output(raw_output, ENTITIES)
+    assert results[0]["status"] == "success", "❌ 第1行应合规"
+    assert results[1]["status"] == "warning", "❌ 非疑问句应为warning"
+    assert results[2]["status"] == "warning" and results[2]["data"]["question"] == "", "❌ 缺失实体应返回空问题"
+    assert results[2]["data"]["entity_name"] == "苹果", "❌ 缺失实体信息错误"
+    print("✅ 逐行校验正常")
+
+
+def test_fill_remaining_by_position():
+    """测试3：部分行按名称匹配后，其余未标注实体的行按顺序补到空缺的实体"""
+    raw_output = "小米的创始人是谁？@@@小米\n华为总部在哪里？\n苹果有哪些产品？"
+    results = _parse_batch_output(raw_output, ENTITIES)
+    questions = [r["data"]["question"] for r in results]
+    assert questions == ["华为总部在哪里？", "小米的创始人是谁？", "苹果有哪些产品？"], f"❌ 补位错误：{questions}"
+    print("✅ 按顺序补位正常")
+
+
+if __name__ == "__main__":
+    test_match_by_core_entity()
+    test_validate_each_line()
+    test_fill_remaining_by_position()
@@ -0,0 +1,115 @@
+# Cypher批量编译器测试（纯解析逻辑，无需连接Neo4j）
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cypher_compiler import compile_statement, compile_statements, count_created_relationships
+
+
+def test_compile_node():
+    """测试1：节点MERGE识别（含ON CREATE SET属性）"""
+    compiled = compile_statement(
+        "MERGE (b1:电脑品牌 {name: '联想'}) ON CREATE SET b1.english_name = 'Lenovo', b1.rank = 1;"
+    )
+    assert compiled == {
+        "kind": "node",
+        "label": "电脑品牌",
+        "name": "联想",
+        "props": {"english_name": "Lenovo", "rank": 1},
+    }, f"❌ 节点解析结果错误：{compiled}"
+    print("✅ 节点MERGE识别正常")
+
+
+def test_compile_relationship():
+    """测试2：MATCH-MATCH-MERGE关系识别（含反向关系）"""
+    compiled = compile_statement(
+        "MATCH (w:运动项目 {name: '冬季两项'})\nMATCH (p1:比赛项目 {name: '个人赛'})\nMERGE (w)-[r1:包含]->(p1);"
+    )
+    assert compiled == {
+        "kind": "relationship",
+        "src_label": "运动项目",
+        "src": "冬季两项",
+        "rel": "包含",
+        "dst_label": "比赛项目",
+        "dst": "个人赛",
+        "props": {},
+    }, f"❌ 关系解析结果错误：{compiled}"
+
+    reverse = compile_statement(
+        "MATCH (w:运动项目 {name: '冬季两项'}) MATCH (p1:比赛项目 {name: '个人赛'}) MERGE (p1)<-[:包含]-(w);"
+    )
+    assert reverse["src"] == "冬季两项" and reverse["dst"] == "个人赛", f"❌ 反向关系解析错误：{reverse}"
+    print("✅ 关系MERGE识别正常")
+
+
+def test_unsupported_statements_fall_back():
+    """测试3：无法识别的语句返回None（原样执行）"""
+    unsupported = [
+        "CREATE CONSTRAINT 电脑_name_unique FOR (n:电脑) REQUIRE n.name IS UNIQUE;",
+        "MERGE (c)-[r1:拥有]->(b1) ON CREATE SET r1.create_time = date();",
+        "MERGE (n:电脑 {name: '电脑'}) ON CREATE SET n.created = timestamp();",
+        "MATCH (a:A {name: 'a'}) MATCH (b:B {name: 'b'}) MERGE (a)-[:REL]-(b);",
+    ]
+    for stmt in unsupported:
+        assert compile_statement(stmt) is None, f"❌ 不应被编译：{stmt}"
+    print("✅ 无法识别的语句正确回退")
+
+
+def test_compile_plan_groups_by_label():
+    """测试4：执行计划按Label/关系类型分组，且保持节点先于关系"""
+    statements = [
+        "CREATE CONSTRAINT 比赛项目_name_unique FOR (n:比赛项目) REQUIRE n.name IS UNIQUE;",
+        "MERGE (p1:比赛项目 {name: '个人赛'});",
+        "MERGE (p2:比赛项目 {name: '冲刺赛'});",
+        "MATCH (w:运动项目 {name: '冬季两项'})\nMATCH (p1:比赛项目 {name: '个人赛'})\nMERGE (w)-[r1:包含]->(p1);",
+        "MATCH (w:运动项目 {name: '冬季两项'})\nMATCH (p2:比赛项目 {name: '冲刺赛'})\nMERGE (w)-[r2:包含]->(p2);",
+    ]
+    plan = compile_statements(list(enumerate(statements, 1)))
+
+    assert len(plan) == 3, f"❌ 执行计划条数错误：{len(plan)}"
+    assert plan[0]["query"] is None, "❌ 约束语句应原样执行"
+    assert [row["name"] for row in plan[1]["params"]["rows"]] == ["个人赛", "冲刺赛"], "❌ 节点批次错误"
+    assert "UNWIND $rows" in plan[2]["query"] and len(plan[2]["params"]["rows"]) == 2, "❌ 关系批次错误"
+    assert [idx for idx, _ in plan[2]["statements"]] == [4, 5], "❌ 步骤编号错误"
+    print("✅ 执行计划分组正常")
+
+
+def test_raw_statement_keeps_order():
+    """测试5：原样执行的语句之后的MERGE不会并入其之前的批次"""
+    statements = [
+        "MERGE (a:运动项目 {name: '个人赛'});",
+        "MERGE (b:运动项目 {name: '冲刺赛'}) SET b.distance = 10;",  # 无法编译，原样执行
+        "MERGE (c:运动项目 {name: '追逐赛'});",
+        "MATCH (a:运动项目 {name: '个人赛'}) MATCH (b:运动项目 {name: '冲刺赛'}) MERGE (a)-[:相关]->(b);",
+    ]
+    plan = compile_statements(list(enumerate(statements, 1)))
+    steps = [[idx for idx, _ in item["statements"]] for item in plan]
+    assert steps == [[1], [2], [3], [4]], f"❌ 执行顺序错误：{steps}"
+    assert plan[1]["query"] is None and plan[2]["query"] is not None, "❌ 批次类型错误"
+    print("✅ 原样语句前后顺序保持正常")
+
+
+def test_count_created_relationships():
+    """测试6：只有MERGE前不存在的关系计为新建，同一批次内重复的关系只计一次"""
+    rel = "MATCH (a:品牌 {{name: '{}'}}) MATCH (b:城市 {{name: '{}'}}) MERGE (a)-[:总部位于]->(b);"
+    plan = compile_statements([
+        (1, rel.format("华为", "深圳")),
+        (2, rel.format("华为", "深圳")),
+        (3, rel.format("小米", "北京")),
+        (4, rel.format("联想", "北京")),
+    ])
+    assert len(plan) == 1 and "RETURN row.idx AS idx, created" in plan[0]["query"], f"❌ 批量语句错误：{plan}"
+    # 华为→深圳 新建（批内重复一次）；小米→北京 已存在；联想 节点未匹配到，不返回该行
+    records = [{"idx": 1, "created": True}, {"idx": 2, "created": True}, {"idx": 3, "created": False}]
+    created = count_created_relationships(plan[0], records)
+    assert created == {1: 1}, f"❌ 新建关系统计错误：{created}"
+    print("✅ 新建关系统计正常")
+
+
+if __name__ == "__main__":
+    test_compile_node()
+    test_compile_relationship()
+    test_unsupported_statements_fall_back()
+    test_compile_plan_groups_by_label()
+    test_raw_statement_keeps_order()
+    test_count_created_relationships()
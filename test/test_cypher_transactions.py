@@ -0,0 +1,66 @@
+# 按阶段事务执行Cypher测试（Neo4j为内存替身，验证分阶段、事务提交与失败阶段的逐条回退）
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+pytest.importorskip("httpx")
+
+from fake_neo4j import FakeGraph, import_tools
+
+tools = import_tools()
+
+CONSTRAINT = "CREATE CONSTRAINT 城市_name_unique FOR (n:城市) REQUIRE n.name IS UNIQUE;"
+NODES = ["MERGE (c:城市 {name: '深圳'});", "MERGE (b:品牌 {name: '华为'});"]
+RELATIONSHIPS = [
+    "MATCH (b:品牌 {name: '华为'})\nMATCH (c:城市 {name: '深圳'})\nMERGE (b)-[r:总部位于]->(c);",
+    "MATCH (b:品牌 {name: '华为'})\nMATCH (c:城市 {name: '北京'})\nMERGE (b)-[r:设有研究所]->(c);",
+]
+CYPHER = "\n".join([CONSTRAINT, *NODES, *RELATIONSHIPS])
+
+
+def test_group_statements_by_phase():
+    """测试1：相邻且类型相同的语句归为一个阶段，保持原有顺序"""
+    phases = tools.group_statements_by_phase([CONSTRAINT, *NODES, *RELATIONSHIPS, "MERGE (c:城市 {name: '北京'});"])
+    assert [(kind, len(stmts)) for kind, stmts in phases] == \
+        [("constraint", 1), ("node", 2), ("relationship", 2), ("node", 1)], f"❌ 分阶段错误：{phases}"
+    print("✅ 语句分阶段正常")
+
+
+def test_each_phase_commits_in_one_transaction():
+    """测试2：每个阶段在一个事务中执行，全部成功时与逐条执行的步骤结果一致"""
+    FakeGraph.reset(lambda query, params: ([{"n": 1}], 1 if "MERGE (b)-[" in query else 0))
+    result = tools.execute_neo4j_query(CYPHER, transactional=True, compiled=False)
+    assert result["status"] == "success" and result["total_statements"] == 5, result
+    assert [(r["step"], r["status"], r["type"]) for r in result["results"]] == [
+        (1, "success", "constraint"), (2, "success", "node"), (3, "success", "node"),
+        (4, "success", "relationship"), (5, "success", "relationship")
+    ], f"❌ 步骤结果错误：{result['results']}"
+    assert FakeGraph.committed == [CONSTRAINT, *NODES, *RELATIONSHIPS] and FakeGraph.rolled_back == [], \
+        f"❌ 提交内容错误：{FakeGraph.committed}"
+    print("✅ 按阶段事务提交正常")
+
+
+def test_failed_phase_falls_back_per_statement():
+    """测试3：某阶段中一条语句失败时该阶段回滚并逐条执行，其他阶段不受影响"""
+    def handler(query, params):
+        if "北京" in query:
+            raise RuntimeError("ConstraintValidationFailed: 节点不存在")
+        return [{"n": 1}]
+
+    FakeGraph.reset(handler)
+    result = tools.execute_neo4j_query(CYPHER, transactional=True, compiled=False)
+    statuses = [(r["step"], r["status"]) for r in result["results"]]
+    assert statuses == [(1, "success"), (2, "success"), (3, "success"), (4, "success"), (5, "error")], \
+        f"❌ 回退结果错误：{statuses}"
+    assert "约束验证失败" in result["results"][4]["error"], result["results"][4]
+    assert FakeGraph.rolled_back == [RELATIONSHIPS[0]], f"❌ 失败阶段应回滚：{FakeGraph.rolled_back}"
+    assert FakeGraph.committed == [CONSTRAINT, *NODES, RELATIONSHIPS[0]], f"❌ 提交内容错误：{FakeGraph.committed}"
+    print("✅ 失败阶段回退为逐条执行")
+
+
+if __name__ == "__main__":
+    test_group_statements_by_phase()
+    test_each_phase_commits_in_one_transaction()
+    test_failed_phase_falls_back_per_statement()
@@ -0,0 +1,54 @@
+# 实体度数索引测试（纯内存结构，无需连接Neo4j）
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from degree_index import DegreeIndex
+
+
+def build_index():
+    index = DegreeIndex()
+    index.seed([
+        {"node_id": 3, "label": "电脑品牌", "name": "华为", "degree": 1},
+        {"node_id": 1, "label": "电脑", "name": "电脑", "degree": 2},
+        {"node_id": 2, "label": "电脑品牌", "name": "联想", "degree": 1},
+    ])
+    return index
+
+
+def test_smallest_follows_degree_then_node_id():
+    """测试1：按度数升序、节点id升序选取"""
+    index = build_index()
+    names = [entity["name"] for entity in index.smallest(3)]
+    assert names == ["联想", "华为", "电脑"], f"❌ 排序错误：{names}"
+    print("✅ 最小度数实体选取正常")
+
+
+def test_incremental_updates():
+    """测试2：新增节点/关系后索引同步更新"""
+    index = build_index()
+    index.add_node("电脑品牌", "惠普")
+    assert index.smallest(1)[0]["name"] == "惠普", "❌ 新节点（度数0）应排在最前"
+
+    assert index.add_relationship(("电脑", "电脑"), ("电脑品牌", "惠普")), "❌ 两端均存在时应更新"
+    assert index.add_relationship(("电脑", "电脑"), ("电脑品牌", "联想")), "❌ 两端均存在时应更新"
+    names = [entity["name"] for entity in index.smallest(4)]
+    assert names == ["华为", "惠普", "联想", "电脑"], f"❌ 更新后排序错误：{names}"
+
+    assert not index.add_relationship(("电脑品牌", "不存在"), ("电脑", "电脑")), "❌ 端点缺失时不应更新"
+    print("✅ 增量更新正常")
+
+
+def test_exclude_leased_entities():
+    """测试3：排除已租用实体，且查询不影响索引内容"""
+    index = build_index()
+    picked = index.smallest(1, exclude_keys=["电脑品牌:联想"])
+    assert picked[0]["name"] == "华为", f"❌ 未排除已租用实体：{picked}"
+    assert len(index.smallest(10)) == 3, "❌ 查询后索引条目丢失"
+    print("✅ 租用实体排除正常")
+
+
+if __name__ == "__main__":
+    test_smallest_follows_degree_then_node_id()
+    test_incremental_updates()
+    test_exclude_leased_entities()
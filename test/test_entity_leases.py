@@ -0,0 +1,68 @@
+# 实体租约测试（Neo4j为内存替身，验证并发工作者不会选中同一实体）
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+pytest.importorskip("httpx")
+
+from fake_neo4j import FakeGraph, import_tools
+
+tools = import_tools()
+
+ENTITIES = [{"name": name, "label": "品牌"} for name in ("华为", "小米", "苹果")]
+
+
+def candidates_handler(respect_exclude: bool = True):
+    """候选实体查询替身：按固定顺序返回实体；respect_exclude=False 模拟查询之后实体才被其他工作者租用"""
+    def handler(query, params):
+        rows = [
+            {"entity_name": entity["name"], "entity_labels": [entity["label"]]}
+            for entity in ENTITIES
+            if not respect_exclude or f"{entity['label']}:{entity['name']}" not in params["exclude_keys"]
+        ]
+        return rows[:params["limit"]]
+    return handler
+
+
+def test_lease_table():
+    """测试1：同一实体只能被一个租用者持有，归还后可再次租用；release_owner 归还该租用者的全部租约"""
+    leases = tools.EntityLeaseTable()
+    assert leases.acquire(ENTITIES[0], "job-a") and not leases.acquire(ENTITIES[0], "job-b"), "❌ 同一实体被重复租用"
+    leases.release(ENTITIES[0])
+    assert leases.acquire(ENTITIES[0], "job-b"), "❌ 归还后应可再次租用"
+    leases.acquire(ENTITIES[1], "job-a")
+    leases.acquire(ENTITIES[2], "job-a")
+    leases.release_owner("job-a")
+    assert leases.leased_keys() == ["品牌:华为"], f"❌ release_owner 结果错误：{leases.leased_keys()}"
+    print("✅ 租约表正常")
+
+
+def test_lease_least_relationship_entity():
+    """测试2：各工作者依次租到不同的关系最少实体，全部被租用后返回None"""
+    FakeGraph.reset(candidates_handler())
+    tools.entity_leases.leases.clear()
+    leased = [tools.lease_least_relationship_entity(f"worker-{i}", 5) for i in range(4)]
+    assert [entity and entity["name"] for entity in leased] == ["华为", "小米", "苹果", None], f"❌ 租用结果错误：{leased}"
+    tools.entity_leases.release_owner("worker-1")
+    assert tools.lease_least_relationship_entity("worker-3", 5)["name"] == "小米", "❌ 归还的实体应可被再次租用"
+    tools.entity_leases.leases.clear()
+    print("✅ 租用关系最少的实体正常")
+
+
+def test_lease_skips_entity_leased_after_query():
+    """测试3：查询与租用之间候选实体被其他工作者抢先租用时，改租下一个候选"""
+    FakeGraph.reset(candidates_handler(respect_exclude=False))
+    tools.entity_leases.leases.clear()
+    tools.entity_leases.acquire(ENTITIES[0], "worker-0")
+    entity = tools.lease_least_relationship_entity("worker-1", 5)
+    assert entity["name"] == "小米", f"❌ 应跳过已被租用的实体：{entity}"
+    tools.entity_leases.leases.clear()
+    print("✅ 跳过已被抢先租用的实体")
+
+
+if __name__ == "__main__":
+    test_lease_table()
+    test_lease_least_relationship_entity()
+    test_lease_skips_entity_leased_after_query()
@@ -0,0 +1,64 @@
+# 图谱列式编码测试（纯函数，无需连接Neo4j）
+import sys
+import os
+import json
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from graph_columnar import encode_columnar, decode_columnar
+
+NODE_ROWS = [
+    {"id": 1, "labels": ["电脑"], "properties": {"name": "电脑", "_version": 2}},
+    {"id": 2, "labels": ["电脑品牌"], "properties": {"name": "联想", "founded": "1984"}},
+    {"id": 3, "labels": ["电脑品牌"], "properties": {"name": "华为", "_version": 3}},
+    {"id": 4, "labels": [], "properties": {"name": "孤立节点"}},
+    {"id": 5, "labels": ["城市"], "properties": {}},
+]
+EDGE_ROWS = [
+    {"edge_id": 10, "source": 2, "target": 1, "type": "品牌属于"},
+    {"edge_id": 11, "source": 3, "target": 1, "type": "品牌属于"},
+]
+
+
+def expected_default_format():
+    """与 get_graph_data 默认格式相同的格式化规则"""
+    nodes = []
+    for n in NODE_ROWS:
+        properties = {k: v for k, v in n["properties"].items() if k != "_version"}
+        nodes.append({
+            "id": f"node_{n['id']}",
+            "label": properties.get("name", n["labels"][0]) if n["labels"] else "未知实体",
+            "type": n["labels"][0] if n["labels"] else "未知类型",
+            "properties": properties,
+            "version": n["properties"].get("_version", 0)
+        })
+    edges = [
+        {"id": f"edge_{r['edge_id']}", "from": f"node_{r['source']}", "to": f"node_{r['target']}",
+         "label": r["type"], "type": r["type"]}
+        for r in EDGE_ROWS
+    ]
+    return {"nodes": nodes, "edges": edges}
+
+
+def test_dictionary_encoding():
+    """测试1：Label/关系类型按首次出现顺序字典编码，无Label记为-1"""
+    data = encode_columnar(NODE_ROWS, EDGE_ROWS)
+    assert data["labels"] == ["电脑", "电脑品牌", "城市"] and data["types"] == ["品牌属于"], "❌ 字典错误"
+    assert data["nodes"]["type"] == [0, 1, 1, -1, 2] and data["edges"]["type"] == [0, 0], "❌ 下标错误"
+    assert data["nodes"]["name"][4] is None and data["edges"]["source"] == [2, 3], "❌ 列数据错误"
+    print("✅ 字典编码正常")
+
+
+def test_round_trip_and_size():
+    """测试2：解码后与默认格式一致，且编码后体积更小"""
+    data = encode_columnar(NODE_ROWS, EDGE_ROWS)
+    expected = expected_default_format()
+    assert decode_columnar(data) == expected, f"❌ 解码结果不一致：{decode_columnar(data)}"
+    columnar_size = len(json.dumps(data, ensure_ascii=False))
+    default_size = len(json.dumps(expected, ensure_ascii=False))
+    assert columnar_size < default_size, f"❌ 列式编码未减小体积：{columnar_size} >= {default_size}"
+    print(f"✅ 编解码一致（{default_size} → {columnar_size} 字符）")
+
+
+if __name__ == "__main__":
+    test_dictionary_encoding()
+    test_round_trip_and_size()
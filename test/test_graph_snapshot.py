@@ -0,0 +1,52 @@
+# 图谱快照缓存与ETag测试（纯内存结构，无需连接Neo4j）
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from graph_snapshot import GraphSnapshotCache
+
+
+def test_snapshot_invalidated_by_version():
+    """测试1：同一版本命中缓存，版本前进后旧快照失效且不会覆盖新快照"""
+    cache = GraphSnapshotCache(max_entries=4)
+    key = cache.request_key(limit=None, format="columnar")
+    cache.put(key, 3, b"v3")
+    assert cache.get(key, 3) == b"v3", "❌ 同版本应命中"
+    assert cache.get(key, 4) is None, "❌ 版本前进后不应命中"
+    cache.put(key, 5, b"v5")
+    cache.put(key, 4, b"v4")  # 较慢的旧查询晚于新查询完成
+    assert cache.get(key, 5) == b"v5" and len(cache.entries) == 1, "❌ 旧版本结果不应覆盖新快照"
+    print("✅ 快照按版本失效正常")
+
+
+def test_lru_and_disabled():
+    """测试2：超出容量按最近访问淘汰；容量为0时不缓存"""
+    cache = GraphSnapshotCache(max_entries=2)
+    keys = [cache.request_key(cursor=f"n:{i}") for i in range(3)]
+    cache.put(keys[0], 1, b"0")
+    cache.put(keys[1], 1, b"1")
+    cache.get(keys[0], 1)
+    cache.put(keys[2], 1, b"2")
+    assert cache.get(keys[1], 1) is None and cache.get(keys[0], 1) == b"0", "❌ LRU淘汰错误"
+    disabled = GraphSnapshotCache(max_entries=0)
+    disabled.put(keys[0], 1, b"0")
+    assert disabled.get(keys[0], 1) is None, "❌ 容量为0时不应缓存"
+    print("✅ LRU淘汰正常")
+
+
+def test_etag():
+    """测试3：ETag随版本与参数变化，If-None-Match 支持多值与弱校验前缀"""
+    cache = GraphSnapshotCache()
+    key = cache.request_key(label="电脑", since=None)
+    assert key == cache.request_key(since=None, label="电脑"), "❌ 缓存键应与参数顺序无关"
+    etag = cache.etag(7, key)
+    assert etag != cache.etag(8, key) and etag != cache.etag(7, cache.request_key(label="城市")), "❌ ETag应随版本/参数变化"
+    assert cache.etag_matches(f'"other", W/{etag}', etag) and cache.etag_matches("*", etag), "❌ ETag匹配错误"
+    assert not cache.etag_matches(None, etag) and not cache.etag_matches('"other"', etag), "❌ 不应匹配"
+    print("✅ ETag生成与匹配正常")
+
+
+if __name__ == "__main__":
+    test_snapshot_invalidated_by_version()
+    test_lru_and_disabled()
+    test_etag()
@@ -0,0 +1,90 @@
+# 图谱写入版本与分页查询构造测试（纯函数，无需连接Neo4j）
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from graph_version import (
+    GraphVersion, GraphChangeFeed, collect_written_nodes, encode_cursor, decode_cursor, parse_filter,
+    build_nodes_page_query, build_edges_page_query, build_node_version_index_query, build_edge_version_index_query,
+)
+
+
+def test_collect_written_nodes():
+    """测试1：只收集执行成功的写语句中按name定位的节点"""
+    results = [
+        {"status": "success", "type": "constraint", "cypher": "CREATE CONSTRAINT 城市_name_unique FOR (n:城市) REQUIRE n.name IS UNIQUE;"},
+        {"status": "success", "type": "node", "cypher": "MERGE (c:城市 {name: '深圳'});"},
+        {"status": "success", "type": "relationship",
+         "cypher": "MATCH (b:品牌 {name: '华为'})\nMATCH (c:城市 {name: '深圳'})\nMERGE (b)-[r:总部位于]->(c);"},
+        {"status": "error", "type": "node", "cypher": "MERGE (c:城市 {name: '北京'});"},
+        {"status": "success", "type": "match", "cypher": "MATCH (b:品牌 {name: '小米'}) RETURN b;"},
+    ]
+    written = collect_written_nodes(results)
+    assert written == {"城市": ["深圳"], "品牌": ["华为"]}, f"❌ 收集结果错误：{written}"
+    print("✅ 写入节点收集正常")
+
+
+def test_cursor_and_filters():
+    """测试2：游标编解码与过滤参数解析"""
+    assert decode_cursor(None) == ("n", -1), "❌ 空游标应从节点开头开始"
+    assert decode_cursor(encode_cursor("e", 42)) == ("e", 42), "❌ 游标编解码错误"
+    try:
+        decode_cursor("x:abc")
+        assert False, "❌ 无效游标应报错"
+    except ValueError:
+        pass
+    assert parse_filter("电脑, 电脑品牌,") == ["电脑", "电脑品牌"], "❌ 过滤参数解析错误"
+    print("✅ 游标与过滤参数正常")
+
+
+def test_page_queries():
+    """测试3：单Label走Label扫描，since与limit按需拼接"""
+    query = build_nodes_page_query(["电脑"], since=3, limit=100)
+    assert query.startswith("MATCH (n:`电脑`)") and "n._version > $since" in query and "LIMIT $limit" in query, query
+    query = build_nodes_page_query([])
+    assert "$labels" not in query and "LIMIT" not in query and "$since" not in query, query
+    query = build_edges_page_query(["电脑", "电脑品牌"], ["品牌属于"], limit=10)
+    assert "[r:`品牌属于`]" in query and "labels(m)" in query, query
+    assert "ORDER BY" not in build_edges_page_query([], [], ordered=False), "❌ 流式导出不应排序"
+    print("✅ 分页查询构造正常")
+
+
+def test_version_seed_and_bump():
+    """测试4：版本号从已有最大值恢复后递增"""
+    version = GraphVersion()
+    version.seed(7)
+    assert version.seeded and version.bump() == 8 and version.current == 8, "❌ 版本号递增错误"
+    print("✅ 版本号递增正常")
+
+
+def test_change_feed():
+    """测试5：变更按序号递增推送，单个订阅者出错不影响其他订阅者"""
+    feed = GraphChangeFeed()
+    received = []
+
+    def broken(event):
+        raise RuntimeError("连接已断开")
+
+    feed.subscribe(broken)
+    feed.subscribe(received.append)
+    feed.publish({"version": 3, "added_nodes": []})
+    feed.unsubscribe(broken)
+    event = feed.publish({"version": 4, "added_nodes": []})
+    assert [e["seq"] for e in received] == [1, 2] and event["version"] == 4, f"❌ 推送错误：{received}"
+    print("✅ 变更推送正常")
+
+
+def test_version_index_queries():
+    """测试6：按Label/关系类型为 _version 建索引（可重复执行）"""
+    assert build_node_version_index_query("电脑") == "CREATE INDEX IF NOT EXISTS FOR (n:`电脑`) ON (n._version)"
+    assert build_edge_version_index_query("品牌属于") == "CREATE INDEX IF NOT EXISTS FOR ()-[r:`品牌属于`]-() ON (r._version)"
+    print("✅ 版本号索引语句正常")
+
+
+if __name__ == "__main__":
+    test_collect_written_nodes()
+    test_cursor_and_filters()
+    test_page_queries()
+    test_version_seed_and_bump()
+    test_change_feed()
+    test_version_index_queries()
@@ -0,0 +1,83 @@
+# 增量Cypher执行器测试（Neo4j为内存替身，验证流式执行、事务提交与整块回滚）
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+pytest.importorskip("httpx")
+
+from fake_neo4j import FakeGraph, import_tools
+
+tools = import_tools()
+
+CONSTRAINT = "CREATE CONSTRAINT 品牌_name_unique FOR (n:品牌) REQUIRE n.name IS UNIQUE;"
+NODE = "MERGE (b:品牌 {name: '华为'});"
+RELATIONSHIP = "MATCH (b:品牌 {name: '华为'})\nMATCH (c:城市 {name: '深圳'})\nMERGE (b)-[r:总部位于]->(c);"
+
+
+def failing_handler(keyword: str):
+    def handler(query, params):
+        if keyword in query:
+            raise RuntimeError("ConstraintValidationFailed")
+        return [{"n": 1}], 1 if "MERGE (b)-[" in query else 0
+    return handler
+
+
+def test_stream_commits_at_close():
+    """测试1：跨分片的语句到达即在事务中执行，代码块结束时才提交；约束语句单独执行"""
+    FakeGraph.reset(failing_handler("不存在的关键字"))
+    executor = tools.IncrementalCypherExecutor(core_label="品牌")
+    text = f"{CONSTRAINT}\n{NODE}\n{RELATIONSHIP}\n"
+    for i in range(0, len(text), 7):
+        executor.feed(text[i:i + 7])
+    assert FakeGraph.committed == [CONSTRAINT], f"❌ 关闭前数据语句不应提交：{FakeGraph.committed}"
+    result = executor.close()
+    assert result["status"] == "success" and [r["step"] for r in result["results"]] == [1, 2, 3], result
+    assert FakeGraph.committed == [CONSTRAINT, NODE, RELATIONSHIP], f"❌ 提交内容错误：{FakeGraph.committed}"
+    assert result["results"][2]["relationships_created"] == 1, "❌ 未记录新建关系数"
+    print("✅ 流式执行并在结束时提交")
+
+
+def test_dangerous_statement_rolls_back_block():
+    """测试2：代码块末尾出现DELETE时，已执行的数据语句整体回滚（与非流式模式整块拒绝一致）"""
+    FakeGraph.reset(failing_handler("不存在的关键字"))
+    executor = tools.IncrementalCypherExecutor(core_label="品牌")
+    executor.feed(f"{NODE}\n{RELATIONSHIP}\nMATCH (n:品牌 {{name: '小米'}}) DETACH DELETE n;\n")
+    result = executor.close()
+    assert result["status"] == "error" and "危险操作" in result["message"], result
+    assert FakeGraph.committed == [] and FakeGraph.rolled_back == [NODE, RELATIONSHIP], \
+        f"❌ 数据语句应回滚：{FakeGraph.committed} / {FakeGraph.rolled_back}"
+    assert all(r["status"] == "error" for r in result["results"]), f"❌ 回滚的语句应标记为失败：{result['results']}"
+    print("✅ 危险语句导致整块回滚")
+
+
+def test_abort_discards_truncated_statement():
+    """测试3：流式输出中断时丢弃未以分号结束的截断语句，只提交已完整的语句"""
+    FakeGraph.reset(failing_handler("不存在的关键字"))
+    executor = tools.IncrementalCypherExecutor(core_label="品牌")
+    executor.feed(f"{NODE}\nMATCH (b:品牌 {{name: '华为'}})\nMATCH (c:城市 {{name: '深")
+    result = executor.close(discard_partial=True)
+    assert result["status"] == "success" and result["total_statements"] == 1, result
+    assert FakeGraph.committed == [NODE], f"❌ 截断语句不应执行：{FakeGraph.committed}"
+    print("✅ 中断时丢弃截断语句")
+
+
+def test_failed_statement_falls_back_to_per_statement():
+    """测试4：事务中语句失败时回滚，代码块结束后逐条执行，失败语句单独报错"""
+    FakeGraph.reset(failing_handler("总部位于"))
+    executor = tools.IncrementalCypherExecutor(core_label="品牌")
+    executor.feed(f"{NODE}\n{RELATIONSHIP}\nMERGE (c:城市 {{name: '深圳'}});\n")
+    assert FakeGraph.rolled_back == [NODE], f"❌ 失败后应回滚事务：{FakeGraph.rolled_back}"
+    result = executor.close()
+    statuses = [(r["step"], r["status"]) for r in result["results"]]
+    assert statuses == [(1, "success"), (2, "error"), (3, "success")], f"❌ 逐条执行结果错误：{statuses}"
+    assert FakeGraph.committed == [NODE, "MERGE (c:城市 {name: '深圳'});"], f"❌ 提交内容错误：{FakeGraph.committed}"
+    print("✅ 事务失败后回退为逐条执行")
+
+
+if __name__ == "__main__":
+    test_stream_commits_at_close()
+    test_dangerous_statement_rolls_back_block()
+    test_abort_discards_truncated_statement()
+    test_failed_statement_falls_back_to_per_statement()
@@ -0,0 +1,75 @@
+# 工作流任务调度测试（模拟工作流，不调用LLM/Neo4j）
+import sys
+import os
+import asyncio
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from job_scheduler import JobScheduler, JOB_FINISHED, JOB_STOPPED, JOB_CANCELLED, JOB_FAILED
+from cost_tracker import get_tracker
+
+
+async def fake_workflow(job):
+    """模拟工作流：每轮异步等待 loop_delay 秒，并记录一次LLM调用"""
+    while job.running and job.rounds_completed < job.params["max_rounds"]:
+        get_tracker().record_ask_llm_call(10, 5)
+        await asyncio.sleep(job.params["loop_delay"])
+        job.rounds_completed += 1
+
+
+def test_jobs_run_concurrently():
+    """测试1：多个任务同时运行、互不阻塞，各自统计消耗"""
+    async def run():
+        scheduler = JobScheduler()
+        jobs = [scheduler.submit(fake_workflow, {"max_rounds": 3, "loop_delay": 0.05}) for _ in range(3)]
+        start = time.perf_counter()
+        await asyncio.gather(*(job.task for job in jobs))
+        return jobs, time.perf_counter() - start
+
+    jobs, elapsed = asyncio.run(run())
+    assert all(job.status == JOB_FINISHED and job.rounds_completed == 3 for job in jobs), "❌ 任务未正常结束"
+    assert elapsed < 0.3, f"❌ 任务未并行执行：{elapsed:.2f}秒"
+    assert all(job.tracker.activities["ask_llm_call"].count == 3 for job in jobs), "❌ 各任务消耗统计应互相独立"
+    print(f"✅ 多任务并行正常（{elapsed:.2f}秒）")
+
+
+def test_stop_and_cancel():
+    """测试2：优雅停止在当前轮结束后退出；取消立即中断等待"""
+    async def run():
+        scheduler = JobScheduler()
+        stopped = scheduler.submit(fake_workflow, {"max_rounds": 100, "loop_delay": 0.05})
+        cancelled = scheduler.submit(fake_workflow, {"max_rounds": 100, "loop_delay": 10})
+        await asyncio.sleep(0.12)
+        assert scheduler.stop(stopped.id) and scheduler.cancel(cancelled.id), "❌ 停止/取消失败"
+        await asyncio.gather(stopped.task, cancelled.task)
+        assert not scheduler.cancel(cancelled.id), "❌ 已结束的任务不能再次取消"
+        return stopped, cancelled, scheduler
+
+    stopped, cancelled, scheduler = asyncio.run(run())
+    assert stopped.status == JOB_STOPPED and 0 < stopped.rounds_completed < 100, f"❌ 优雅停止错误：{stopped.to_dict()}"
+    assert cancelled.status == JOB_CANCELLED and cancelled.rounds_completed == 0, "❌ 取消错误"
+    assert [job.id for job in scheduler.list()] == [cancelled.id, stopped.id], "❌ 任务列表应按创建时间倒序"
+    print("✅ 停止与取消正常")
+
+
+def test_failed_job():
+    """测试3：工作流异常时任务标记为failed并记录错误"""
+    async def broken(job):
+        raise RuntimeError("Neo4j连接失败")
+
+    async def run():
+        scheduler = JobScheduler()
+        job = scheduler.submit(broken, {})
+        await job.task
+        return job
+
+    job = asyncio.run(run())
+    assert job.status == JOB_FAILED and job.error == "Neo4j连接失败", f"❌ 异常状态错误：{job.to_dict()}"
+    assert "cost_summary" in job.to_dict(detail=True), "❌ 详情应包含消耗统计"
+    print("✅ 异常任务状态正常")
+
+
+if __name__ == "__main__":
+    test_jobs_run_concurrently()
+    test_stop_and_cancel()
+    test_failed_job()
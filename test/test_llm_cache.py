@@ -0,0 +1,103 @@
+# LLM响应缓存测试（使用LangChain的FakeListChatModel模拟LLM，无需调用Deepseek）
+import sys
+import os
+import asyncio
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import SystemMessage, HumanMessage
+from langchain_core.prompts import ChatPromptTemplate
+
+from llm_cache import LLMResponseCache
+
+MESSAGES = [SystemMessage(content="你是问智能体"), HumanMessage(content="实体：手机（Label：产品）")]
+
+
+def test_same_messages_hit_cache():
+    """测试1：相同消息第二次调用直接返回缓存响应（同步/异步共享），token用量记为0"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache = LLMResponseCache(os.path.join(tmp_dir, "llm.sqlite3"))
+        llm = FakeListChatModel(responses=["手机的品牌有哪些？@@@手机", "另一个回答"], cache=cache)
+
+        first = llm.invoke(MESSAGES)
+        second = asyncio.run(llm.ainvoke(MESSAGES))
+        assert first.content == second.content == "手机的品牌有哪些？@@@手机", f"❌ 未命中缓存：{second.content}"
+        assert second.response_metadata.get("llm_cache_hit"), "❌ 缓存响应未标记"
+        assert second.usage_metadata["input_tokens"] == 0, "❌ 缓存响应不应计入token"
+
+        other = llm.invoke([MESSAGES[0], HumanMessage(content="实体：电脑（Label：产品）")])
+        assert other.content == "另一个回答", "❌ 不同消息不应命中缓存"
+    print("✅ 相同消息命中缓存正常")
+
+
+def test_bypass_and_eviction():
+    """测试2：bypass时总是调用LLM；超出容量后淘汰最久未访问的响应"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "llm.sqlite3")
+        # 同一个模型实例（模型参数不变），仅切换缓存的bypass设置
+        llm = FakeListChatModel(responses=["旧回答", "新回答", "不应调用"], cache=LLMResponseCache(path))
+        llm.invoke(MESSAGES)
+
+        llm.cache = LLMResponseCache(path, bypass=True)
+        assert llm.invoke(MESSAGES).content == "新回答", "❌ bypass时不应读缓存"
+        llm.cache = LLMResponseCache(path)
+        assert llm.invoke(MESSAGES).content == "新回答", "❌ bypass时应写入最新响应"
+
+        small = LLMResponseCache(os.path.join(tmp_dir, "small.sqlite3"), max_entries=2)
+        llm = FakeListChatModel(responses=["a", "b", "c"], cache=small)
+        for i in range(3):
+            llm.invoke([HumanMessage(content=f"问题{i}")])
+        assert len(small.store) == 2, f"❌ 容量淘汰错误：{len(small.store)}"
+    print("✅ bypass与容量淘汰正常")
+
+
+class CountingLimiter:
+    """限流器替身：只记录等待额度的次数"""
+    def __init__(self):
+        self.acquired = 0
+
+    def acquire(self, tokens=0):
+        self.acquired += 1
+
+    async def aacquire(self, tokens=0):
+        self.acquired += 1
+
+    def record_tokens(self, tokens):
+        pass
+
+
+def test_cache_hit_skips_rate_limit():
+    """测试3：with_rate_limit 先查缓存，命中时不等待也不占用限流额度（同步/异步一致）"""
+    pytest.importorskip("langchain_openai")
+    from fake_neo4j import import_with_fakes
+    llm_client = import_with_fakes("llm_client")
+
+    prompt = ChatPromptTemplate.from_messages([("system", "你是问智能体"), ("human", "{entity}")])
+    limiter, llm_client.LLM_RATE_LIMITER = llm_client.LLM_RATE_LIMITER, CountingLimiter()
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            llm = FakeListChatModel(responses=["手机的品牌有哪些？@@@手机", "不应调用"],
+                                    cache=LLMResponseCache(os.path.join(tmp_dir, "llm.sqlite3")))
+            chain = prompt | llm_client.with_rate_limit(llm)
+            first = chain.invoke({"entity": "手机"})
+            second = chain.invoke({"entity": "手机"})
+            third = asyncio.run(chain.ainvoke({"entity": "手机"}))
+            assert first.content == second.content == third.content == "手机的品牌有哪些？@@@手机", "❌ 未命中缓存"
+            assert third.response_metadata.get("llm_cache_hit"), "❌ 缓存响应未标记"
+            assert llm_client.LLM_RATE_LIMITER.acquired == 1, \
+                f"❌ 只有真正调用LLM才应限流：{llm_client.LLM_RATE_LIMITER.acquired}"
+    finally:
+        llm_client.LLM_RATE_LIMITER = limiter
+    print("✅ 缓存命中不占用限流额度")
+
+
+if __name__ == "__main__":
+    test_same_messages_hit_cache()
+    test_bypass_and_eviction()
+    test_cache_hit_skips_rate_limit()
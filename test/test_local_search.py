@@ -0,0 +1,73 @@
+# 本地BM25离线搜索测试（临时语料目录与索引文件，无需外网）
+import sys
+import os
+import json
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from local_search import tokenize, LocalSearchBackend
+
+
+def write_corpus(corpus_dir: str):
+    with open(os.path.join(corpus_dir, "手机.txt"), "w", encoding="utf-8") as f:
+        f.write("华为是中国的手机品牌，总部位于广东深圳。\n\n小米成立于2010年，总部位于北京。")
+    with open(os.path.join(corpus_dir, "docs.jsonl"), "w", encoding="utf-8") as f:
+        f.write(json.dumps({"title": "苹果公司", "text": "苹果公司总部位于美国加州库比蒂诺，发布iPhone手机。"}, ensure_ascii=False) + "\n")
+        f.write("不是JSON的行\n")
+
+
+def test_tokenize():
+    """测试1：中文按二字切分，英文数字按单词切分"""
+    assert tokenize("华为手机") == ["华为", "为手", "手机"], f"❌ 中文切分错误：{tokenize('华为手机')}"
+    assert tokenize("iPhone 15发布") == ["发布", "iphone", "15"], f"❌ 混合切分错误：{tokenize('iPhone 15发布')}"
+    print("✅ 切词正常")
+
+
+def test_bm25_ranking():
+    """测试2：查询返回最相关的文档，格式与SerpAPI一致"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        corpus_dir = os.path.join(tmp_dir, "corpus")
+        os.makedirs(corpus_dir)
+        write_corpus(corpus_dir)
+        backend = LocalSearchBackend({"local_corpus_dir": corpus_dir, "local_index_path": os.path.join(tmp_dir, "index.sqlite3")})
+
+        results = backend.search("华为的总部在哪里？")["organic_results"]
+        assert results and "华为" in results[0]["snippet"], f"❌ 排序错误：{results}"
+        assert results[0]["title"] == "手机", "❌ 标题错误"
+
+        results = backend.search("iPhone是哪家公司的？")["organic_results"]
+        assert results[0]["title"] == "苹果公司", f"❌ JSONL文档检索错误：{results}"
+        assert backend.search("量子计算")["organic_results"] == [], "❌ 无关查询应返回空结果"
+
+        start = time.perf_counter()
+        for _ in range(100):
+            backend.search("小米成立于哪一年？")
+        elapsed_ms = (time.perf_counter() - start) * 1000 / 100
+        print(f"✅ BM25检索正常（平均 {elapsed_ms:.2f}ms/次）")
+
+
+def test_rebuild_on_corpus_change():
+    """测试3：索引持久化复用，语料变化后自动重建"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        corpus_dir = os.path.join(tmp_dir, "corpus")
+        os.makedirs(corpus_dir)
+        write_corpus(corpus_dir)
+        config = {"local_corpus_dir": corpus_dir, "local_index_path": os.path.join(tmp_dir, "index.sqlite3")}
+        LocalSearchBackend(config).search("华为")
+
+        reopened = LocalSearchBackend(config)
+        reopened.ensure_index()
+        assert reopened.index.meta("doc_count") == "3", f"❌ 文档数错误：{reopened.index.meta('doc_count')}"
+
+        with open(os.path.join(corpus_dir, "新增.txt"), "w", encoding="utf-8") as f:
+            f.write("荣耀是从华为独立出来的手机品牌。")
+        rebuilt = LocalSearchBackend(config)
+        assert rebuilt.search("荣耀")["organic_results"][0]["title"] == "新增", "❌ 语料变化后未重建索引"
+        print("✅ 索引持久化与重建正常")
+
+
+if __name__ == "__main__":
+    test_tokenize()
+    test_bm25_ranking()
+    test_rebuild_on_corpus_change()
@@ -0,0 +1,50 @@
+# 提示词前缀缓存token统计测试（模拟LLM响应元数据，无需调用Deepseek）
+import sys
+import os
+from types import SimpleNamespace
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cost_tracker import CostTracker, extract_llm_usage
+
+
+def test_extract_deepseek_usage():
+    """测试1：优先读取Deepseek返回的 prompt_cache_hit/miss_tokens"""
+    response = SimpleNamespace(
+        usage_metadata={"input_tokens": 1200, "output_tokens": 300},
+        response_metadata={"token_usage": {"prompt_cache_hit_tokens": 1024, "prompt_cache_miss_tokens": 176}},
+    )
+    assert extract_llm_usage(response) == (1200, 300, 1024, 176), f"❌ 解析错误：{extract_llm_usage(response)}"
+    print("✅ Deepseek缓存字段解析正常")
+
+
+def test_extract_streaming_usage():
+    """测试2：流式响应只有 usage_metadata.input_token_details 时同样可统计；无缓存信息时不计入"""
+    response = SimpleNamespace(
+        usage_metadata={"input_tokens": 1000, "output_tokens": 200, "input_token_details": {"cache_read": 768}},
+        response_metadata={},
+    )
+    assert extract_llm_usage(response) == (1000, 200, 768, 232), f"❌ 解析错误：{extract_llm_usage(response)}"
+
+    response = SimpleNamespace(usage_metadata={"input_tokens": 10, "output_tokens": 5}, response_metadata={})
+    assert extract_llm_usage(response) == (10, 5, 0, 0), "❌ 无缓存信息时应记为0"
+    assert extract_llm_usage(None) is None, "❌ 无响应时应返回None"
+    print("✅ 流式/缺省缓存字段解析正常")
+
+
+def test_hit_ratio_per_agent():
+    """测试3：按智能体分别统计前缀缓存命中率"""
+    tracker = CostTracker()
+    tracker.record_answer_llm_call(1200, 300, 1024, 176)
+    tracker.record_answer_llm_call(1200, 300, 0, 1200)
+    tracker.record_ask_llm_call(400, 20, 384, 16)
+    answer = tracker.get_summary()["activities"]["answer_llm_call"]
+    assert answer["prompt_cache_hit_tokens"] == 1024 and answer["prompt_cache_miss_tokens"] == 1376, "❌ 累计错误"
+    assert abs(answer["prompt_cache_hit_ratio"] - 1024 / 2400) < 1e-9, "❌ 答智能体命中率错误"
+    assert abs(tracker.activities["ask_llm_call"].prompt_cache_hit_ratio - 0.96) < 1e-9, "❌ 问智能体命中率错误"
+    print("✅ 分智能体命中率统计正常")
+
+
+if __name__ == "__main__":
+    test_extract_deepseek_usage()
+    test_extract_streaming_usage()
+    test_hit_ratio_per_agent()
@@ -0,0 +1,64 @@
+# 相似问题匹配测试（纯内存索引，无需SerpAPI）
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from question_matcher import QuestionMatcher, normalize_question
+
+
+def test_normalize_question():
+    """测试1：归一化去除标点、空白、语气词并统一全半角"""
+    assert normalize_question("手机 的品牌有哪些？") == "手机品牌有哪些", "❌ 归一化结果错误"
+    assert normalize_question("ＡＩ是什么?") == normalize_question("ai是什么？"), "❌ 全半角/大小写未统一"
+    print("✅ 问题归一化正常")
+
+
+def test_paraphrase_matches_cached_question():
+    """测试2：同义改写的问题命中已索引问题"""
+    matcher = QuestionMatcher(threshold=0.7)
+    matcher.add("手机的品牌有哪些？")
+    matcher.add("冬季两项包含哪些比赛项目？")
+
+    matched, score = matcher.match("手机有哪些品牌？")
+    assert matched == "手机的品牌有哪些？", f"❌ 未命中同义问题：{matched}"
+    assert score >= 0.7, f"❌ 相似度低于阈值：{score}"
+
+    matched, score = matcher.match("手机的品牌有哪些呢?")
+    assert matched == "手机的品牌有哪些？" and score == 1.0, "❌ 归一化后相同的问题应精确命中"
+    print("✅ 同义问题匹配正常")
+
+
+def test_different_entity_not_matched():
+    """测试3：仅实体不同的问题不能复用缓存"""
+    matcher = QuestionMatcher(threshold=0.7)
+    matcher.add("手机有哪些品牌？")
+    matched, _ = matcher.match("电脑有哪些品牌？")
+    assert matched is None, f"❌ 不同实体的问题被误判为相似：{matched}"
+
+    matcher.remove("手机有哪些品牌？")
+    assert matcher.match("手机的品牌有哪些？")[0] is None, "❌ 移除后仍能命中"
+    print("✅ 不同实体正确区分")
+
+
+def test_different_model_year_or_entity_char_not_matched():
+    """测试4：型号/年份数字不同、实体仅一字之差的问题即使相似度超过阈值也不能复用缓存"""
+    matcher = QuestionMatcher(threshold=0.7)
+    cases = [
+        ("iPhone 14有哪些颜色？", "iPhone 15有哪些颜色？"),
+        ("冬季两项包含哪些比赛项目？", "夏季两项包含哪些比赛项目？"),
+        ("2022年冬奥会在哪里举办？", "2026年冬奥会在哪里举办？"),
+    ]
+    for cached, _ in cases:
+        matcher.add(cached)
+    for cached, question in cases:
+        matched, score = matcher.match(question)
+        assert matched is None, f"❌ {question} 被误判为与 {matched} 相似（{score:.3f}）"
+    assert matcher.match("iphone14有哪些颜色")[0] == "iPhone 14有哪些颜色？", "❌ 相同型号的问题应命中"
+    print("✅ 型号/年份/实体用字不同正确区分")
+
+
+if __name__ == "__main__":
+    test_normalize_question()
+    test_paraphrase_matches_cached_question()
+    test_different_entity_not_matched()
+    test_different_model_year_or_entity_char_not_matched()
@@ -0,0 +1,49 @@
+# 令牌桶限流测试（使用较高的速率，测试在1秒内完成）
+import sys
+import os
+import asyncio
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rate_limiter import TokenBucket, RateLimiter
+
+
+def test_burst_then_wait():
+    """测试1：额度内不等待，额度用尽后按补充速率排队"""
+    bucket = TokenBucket(rate_per_minute=600)  # 每秒10个，容量600
+    assert bucket.reserve(600) == 0.0, "❌ 额度内不应等待"
+    first = bucket.reserve(1)
+    second = bucket.reserve(1)
+    assert 0.05 < first <= 0.11 and second > first, f"❌ 排队等待时间错误：{first}, {second}"
+    assert TokenBucket(0).reserve(10 ** 9) == 0.0, "❌ 速率为0时应不限流"
+    print("✅ 令牌桶预约正常")
+
+
+def test_token_budget_shared_by_coroutines():
+    """测试2：并发协程共享token额度，超出部分被限速"""
+    limiter = RateLimiter("测试", requests_per_minute=0, tokens_per_minute=6000)  # 每秒100个token
+
+    async def run():
+        start = time.perf_counter()
+        await asyncio.gather(*(limiter.aacquire(estimated_tokens=3000) for _ in range(2)))
+        await limiter.aacquire(estimated_tokens=30)
+        return time.perf_counter() - start
+
+    elapsed = asyncio.run(run())
+    assert 0.2 < elapsed < 0.6, f"❌ 限速时间错误：{elapsed:.2f}秒"
+    print(f"✅ 协程共享额度正常（等待 {elapsed:.2f}秒）")
+
+
+def test_record_output_tokens():
+    """测试3：事后补扣的输出token会让后续调用等待"""
+    limiter = RateLimiter("测试", tokens_per_minute=6000)
+    limiter.record_tokens(6010)
+    delay = limiter.tokens.reserve(0.1)
+    assert delay > 0.05, f"❌ 补扣后应等待：{delay}"
+    print("✅ 输出token补扣正常")
+
+
+if __name__ == "__main__":
+    test_burst_then_wait()
+    test_token_budget_shared_by_coroutines()
+    test_record_output_tokens()
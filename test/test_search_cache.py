@@ -0,0 +1,55 @@
+# 搜索结果持久化缓存测试（使用临时SQLite文件，无需SerpAPI）
+import sys
+import os
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search_cache import SearchCache
+
+
+def test_persist_across_instances():
+    """测试1：缓存写入后，新实例（模拟重启/其他进程）仍可读取"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "cache", "search.sqlite3")
+        SearchCache(path).set("手机的品牌有哪些？", "搜索结果：华为、小米")
+        reopened = SearchCache(path)
+        assert reopened.get("手机的品牌有哪些？") == "搜索结果：华为、小米", "❌ 重新打开后缓存丢失"
+        assert reopened.get("不存在的问题？") is None, "❌ 未命中时应返回None"
+        assert reopened.stats() == {"hits": 1, "misses": 1}, f"❌ 命中统计错误：{reopened.stats()}"
+    print("✅ 缓存持久化正常")
+
+
+def test_ttl_expiry():
+    """测试2：条目过期后视为未命中"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache = SearchCache(os.path.join(tmp_dir, "search.sqlite3"))
+        cache.set("过期问题？", "搜索结果：旧数据", ttl=0.05)
+        cache.set("长期问题？", "搜索结果：新数据")
+        time.sleep(0.1)
+        assert cache.get("过期问题？") is None, "❌ 过期条目仍被返回"
+        assert cache.get("长期问题？") == "搜索结果：新数据", "❌ 未过期条目丢失"
+    print("✅ TTL过期正常")
+
+
+def test_lru_eviction():
+    """测试3：超出容量时淘汰最久未访问的条目"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache = SearchCache(os.path.join(tmp_dir, "search.sqlite3"), max_entries=2)
+        cache.set("问题A？", "A")
+        time.sleep(0.01)
+        cache.set("问题B？", "B")
+        time.sleep(0.01)
+        cache.get("问题A？")  # 访问A，使B成为最久未访问
+        time.sleep(0.01)
+        cache.set("问题C？", "C")
+        assert len(cache) == 2, f"❌ 容量限制失效：{len(cache)}"
+        assert "问题B？" not in cache, "❌ 应淘汰最久未访问的条目"
+        assert "问题A？" in cache and "问题C？" in cache, "❌ 淘汰了错误的条目"
+    print("✅ LRU淘汰正常")
+
+
+if __name__ == "__main__":
+    test_persist_across_instances()
+    test_ttl_expiry()
+    test_lru_eviction()
@@ -0,0 +1,127 @@
+# SerpAPI客户端重试/熔断测试（使用httpx.MockTransport模拟上游，不发起真实请求）
+import sys
+import os
+import asyncio
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+
+from search_client import SerpApiClient, CircuitBreaker, CircuitOpenError, TransientSearchError, SearchHTTPError
+
+TEST_CONFIG = {
+    "api_key": "test-secret-key",
+    "engine": "google",
+    "max_retries": 2,
+    "backoff_base": 0,  # 测试中不等待
+    "breaker_failure_threshold": 2,
+    "breaker_reset_timeout": 60,
+}
+
+
+def build_client(handler) -> SerpApiClient:
+    client = SerpApiClient(TEST_CONFIG)
+    client.client = httpx.Client(transport=httpx.MockTransport(handler))
+    client.async_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return client
+
+
+def test_retry_transient_errors():
+    """测试1：5xx/限流自动重试，最终成功"""
+    responses = [503, 429, 200]
+
+    def handler(request):
+        status = responses.pop(0)
+        return httpx.Response(status, json={"organic_results": [{"snippet": "华为、小米"}]})
+
+    results = build_client(handler).search("手机的品牌有哪些？")
+    assert results["organic_results"][0]["snippet"] == "华为、小米", "❌ 重试后结果错误"
+    assert responses == [], "❌ 重试次数错误"
+    print("✅ 临时错误重试正常")
+
+
+def test_circuit_breaker_fails_fast():
+    """测试2：连续失败后熔断，后续请求不再访问上游"""
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(500)
+
+    client = build_client(handler)
+    for _ in range(2):
+        try:
+            client.search("问题？")
+            assert False, "❌ 应抛出异常"
+        except TransientSearchError:
+            pass
+    upstream_calls = len(calls)
+
+    try:
+        asyncio.run(client.asearch("问题？"))
+        assert False, "❌ 熔断后应快速失败"
+    except CircuitOpenError:
+        pass
+    assert len(calls) == upstream_calls, "❌ 熔断期间仍访问了上游"
+    print("✅ 熔断快速失败正常")
+
+
+def test_breaker_half_open_probe():
+    """测试3：熔断到期后放行一次试探请求，成功则恢复"""
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.allow(), "❌ 到期后应放行试探请求"
+    assert not breaker.allow(), "❌ 半开状态只允许一个试探请求"
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow(), "❌ 试探成功后应恢复"
+    print("✅ 半开试探正常")
+
+
+def test_cancelled_probe_releases_half_open():
+    """测试4：半开试探请求被取消时释放试探名额，之后的请求仍可试探"""
+    async def handler(request):
+        await asyncio.sleep(10)
+        return httpx.Response(200, json={})
+
+    client = build_client(handler)
+    client.breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    client.breaker.record_failure()
+
+    async def run():
+        probe = asyncio.create_task(client.asearch("问题？"))
+        await asyncio.sleep(0.05)
+        probe.cancel()
+        try:
+            await probe
+            assert False, "❌ 试探请求应被取消"
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(run())
+    assert client.breaker.state == "half_open" and client.breaker.allow(), "❌ 试探取消后熔断器不应一直拒绝请求"
+    print("✅ 试探请求取消后释放名额正常")
+
+
+def test_http_error_hides_api_key():
+    """测试5：4xx错误信息只含状态码与原因，不泄露URL中的 api_key"""
+    def handler(request):
+        return httpx.Response(401, json={"error": "Invalid API key"})
+
+    client = build_client(handler)
+    try:
+        client.search("问题？")
+        assert False, "❌ 应抛出异常"
+    except SearchHTTPError as e:
+        assert e.status_code == 401 and "401" in str(e), f"❌ 错误信息缺少状态码：{e}"
+        assert TEST_CONFIG["api_key"] not in str(e) and "serpapi.com" not in str(e), f"❌ 错误信息泄露了URL：{e}"
+    assert client.breaker.state == "closed", "❌ 4xx不应计入熔断"
+    print("✅ HTTP错误信息不含 api_key")
+
+
+if __name__ == "__main__":
+    test_retry_transient_errors()
+    test_circuit_breaker_fails_fast()
+    test_breaker_half_open_probe()
+    test_cancelled_probe_releases_half_open()
+    test_http_error_hides_api_key()
@@ -0,0 +1,127 @@
+# 在途请求合并测试（模拟并发的相同搜索请求）
+import sys
+import os
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from single_flight import SingleFlight
+
+
+def test_threads_share_one_call():
+    """测试1：多个线程同时请求同一个键，只执行一次"""
+    flights = SingleFlight()
+    calls = []
+
+    def slow_search():
+        calls.append(threading.get_ident())
+        time.sleep(0.2)
+        return "搜索结果：华为、小米"
+
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        results = list(pool.map(lambda _: flights.do("手机品牌有哪些", slow_search), range(5)))
+
+    assert len(calls) == 1, f"❌ 实际调用次数：{len(calls)}"
+    assert all(result == "搜索结果：华为、小米" for result, _ in results), "❌ 结果不一致"
+    assert sum(shared for _, shared in results) == 4, "❌ 复用结果的调用方数量错误"
+    assert flights.in_flight() == 0, "❌ 调用结束后在途表未清理"
+    print("✅ 线程并发请求合并正常")
+
+
+def test_async_and_thread_callers_share_one_call():
+    """测试2：协程与线程调用方之间同样合并"""
+    flights = SingleFlight()
+    calls = []
+
+    async def slow_search():
+        calls.append("async")
+        await asyncio.sleep(0.2)
+        return "搜索结果"
+
+    async def run():
+        thread_task = asyncio.create_task(asyncio.to_thread(
+            lambda: (time.sleep(0.05), flights.do("key", lambda: calls.append("thread") or "线程结果"))[1]
+        ))
+        results = await asyncio.gather(flights.ado("key", slow_search), flights.ado("key", slow_search))
+        return results, await thread_task
+
+    (first, second), thread_result = asyncio.run(run())
+    assert calls == ["async"], f"❌ 实际调用：{calls}"
+    assert first == ("搜索结果", False) and second == ("搜索结果", True), "❌ 协程结果错误"
+    assert thread_result == ("搜索结果", True), f"❌ 线程调用方未复用结果：{thread_result}"
+    print("✅ 协程/线程混合请求合并正常")
+
+
+def test_error_propagates_and_clears():
+    """测试3：执行方异常会传递给等待方，且之后可重新发起调用"""
+    flights = SingleFlight()
+
+    def failing():
+        raise RuntimeError("SerpAPI超时")
+
+    try:
+        flights.do("key", failing)
+        assert False, "❌ 应抛出异常"
+    except RuntimeError:
+        pass
+    assert flights.do("key", lambda: "重试成功") == ("重试成功", False), "❌ 异常后未能重新调用"
+    print("✅ 异常传递与清理正常")
+
+
+def test_cancelled_waiter_does_not_cancel_call():
+    """测试4：等待方被取消不影响执行方与其他等待方"""
+    flights = SingleFlight()
+
+    async def slow_search():
+        await asyncio.sleep(0.2)
+        return "搜索结果"
+
+    async def run():
+        leader = asyncio.create_task(flights.ado("key", slow_search))
+        await asyncio.sleep(0.01)
+        cancelled = asyncio.create_task(flights.ado("key", slow_search))
+        waiter = asyncio.create_task(flights.ado("key", slow_search))
+        await asyncio.sleep(0.05)
+        cancelled.cancel()
+        return await asyncio.gather(leader, waiter, cancelled, return_exceptions=True)
+
+    leader, waiter, cancelled = asyncio.run(run())
+    assert leader == ("搜索结果", False) and waiter == ("搜索结果", True), f"❌ 结果错误：{leader} {waiter}"
+    assert isinstance(cancelled, asyncio.CancelledError), f"❌ 被取消的等待方应抛出CancelledError：{cancelled}"
+    assert flights.in_flight() == 0, "❌ 调用结束后在途表未清理"
+    print("✅ 等待方取消不影响共享调用")
+
+
+def test_cancelled_leader_hands_call_to_waiter():
+    """测试5：执行方被取消时，等待方不随之失败，而是重新执行调用"""
+    flights = SingleFlight()
+    calls = []
+
+    async def slow_search():
+        calls.append("search")
+        await asyncio.sleep(0.1)
+        return "搜索结果"
+
+    async def run():
+        leader = asyncio.create_task(flights.ado("key", slow_search))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(flights.ado("key", slow_search))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await asyncio.gather(leader, waiter, return_exceptions=True)
+
+    leader, waiter = asyncio.run(run())
+    assert isinstance(leader, asyncio.CancelledError), f"❌ 执行方应被取消：{leader}"
+    assert waiter == ("搜索结果", False), f"❌ 等待方应重新执行并拿到结果：{waiter}"
+    assert calls == ["search", "search"] and flights.in_flight() == 0, f"❌ 实际调用：{calls}"
+    print("✅ 执行方取消后由等待方重新执行")
+
+
+if __name__ == "__main__":
+    test_threads_share_one_call()
+    test_async_and_thread_callers_share_one_call()
+    test_error_propagates_and_clears()
+    test_cancelled_waiter_does_not_cancel_call()
+    test_cancelled_leader_hands_call_to_waiter()
@@ -0,0 +1,46 @@
+# 搜索摘要打包测试（去重、按相关度排序、token预算）
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from snippet_packer import estimate_tokens, dedupe_snippets, pack_snippets
+
+
+def test_dedupe_snippets():
+    """测试1：完全重复与被包含的摘要只保留一条"""
+    snippets = [
+        "华为是中国的手机品牌",
+        "华为是中国的手机品牌。",
+        "华为是中国的手机品牌，总部位于深圳",
+        "小米成立于2010年",
+    ]
+    kept = dedupe_snippets(snippets)
+    assert kept == ["华为是中国的手机品牌，总部位于深圳", "小米成立于2010年"], f"❌ 去重结果错误：{kept}"
+    print("✅ 摘要去重正常")
+
+
+def test_rank_by_overlap():
+    """测试2：与问题重合度高的摘要排在前面"""
+    packed = pack_snippets(
+        "华为的总部在哪里？",
+        ["小米成立于2010年", "华为总部位于广东深圳", "苹果公司发布了新款手机"],
+    )
+    assert packed[0] == "华为总部位于广东深圳", f"❌ 排序错误：{packed}"
+    assert len(packed) == 3, "❌ 预算充足时应全部装入"
+    print("✅ 相关度排序正常")
+
+
+def test_token_budget():
+    """测试3：超出预算的摘要被跳过，单条超长时截断保留"""
+    packed = pack_snippets("华为总部", ["华为总部位于深圳", "华为" * 50], token_budget=20, max_chars=500)
+    assert packed == ["华为总部位于深圳"], f"❌ 预算控制错误：{packed}"
+
+    packed = pack_snippets("华为", ["华为" * 50], token_budget=20, max_chars=500)
+    assert len(packed) == 1 and estimate_tokens(packed[0]) <= 20 and packed[0].endswith("…"), f"❌ 截断错误：{packed}"
+    print("✅ token预算控制正常")
+
+
+if __name__ == "__main__":
+    test_dedupe_snippets()
+    test_rank_by_overlap()
+    test_token_budget()
@@ -0,0 +1,166 @@
+# 工作流轮次执行测试（串行/流水线/并发工作者模式；问/答智能体与Neo4j均为替身，不调用LLM与数据库）
+import sys
+import os
+import types
+import asyncio
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+
+from fake_neo4j import FakeGraph, import_with_fakes
+
+ENTITIES = [{"name": f"实体{i}", "label": "产品"} for i in range(6)]
+asked = []  # 问智能体收到的实体名（批量调用记为 "batch:实体名,..."）
+answered = []  # 答智能体收到的问题
+in_flight = []  # 正在回答的实体名：同一实体同时出现两次说明被重复选中
+overlaps = []
+agent_behavior = {"batch_error": False}
+
+
+def _question_result(entity: dict) -> dict:
+    return {
+        "status": "success",
+        "data": {"question": f"{entity['name']}有哪些型号？", "entity_label": entity["label"], "entity_name": entity["name"]},
+        "error": ""
+    }
+
+
+async def agenerate_question(entity=None):
+    asked.append(entity["name"] if entity else None)
+    await asyncio.sleep(0)
+    return _question_result(entity or ENTITIES[0])
+
+
+async def agenerate_questions(entities=None, batch_size=5):
+    asked.append("batch:" + ",".join(entity["name"] for entity in entities or []))
+    await asyncio.sleep(0)
+    if agent_behavior["batch_error"]:
+        # 与 ask_agent.agenerate_questions 一致：批量调用异常时只返回一个error结果
+        return [{"status": "error", "data": {}, "error": "[问智能体批量执行失败] 原因：超时"}]
+    return [_question_result(entity) for entity in entities]
+
+
+async def agenerate_answer(answer_input, on_delta=None, incremental_cypher=False):
+    answered.append(answer_input["question"])
+    if answer_input["entity_name"] in in_flight:
+        overlaps.append(answer_input["entity_name"])
+    in_flight.append(answer_input["entity_name"])
+    await asyncio.sleep(0.01)
+    in_flight.remove(answer_input["entity_name"])
+    return {"status": "success", "data": {"question": answer_input["question"], "answer": "答案"}, "error": ""}
+
+
+async def agenerate_answers(answer_inputs):
+    return [await agenerate_answer(answer_input) for answer_input in answer_inputs]
+
+
+main = import_with_fakes("main", {
+    "ask_agent": types.SimpleNamespace(agenerate_question=agenerate_question, agenerate_questions=agenerate_questions),
+    "answer_agent": types.SimpleNamespace(agenerate_answer=agenerate_answer, agenerate_answers=agenerate_answers),
+})
+from job_scheduler import Job, JOB_RUNNING
+
+
+def least_relationship_handler(query: str, params: dict):
+    """候选实体查询：按 ENTITIES 顺序返回未被排除的实体"""
+    if "relationCount" not in query:
+        return []
+    rows = [
+        {"entity_name": entity["name"], "entity_labels": [entity["label"]]}
+        for entity in ENTITIES
+        if f"{entity['label']}:{entity['name']}" not in params["exclude_keys"]
+    ]
+    return rows[:params["limit"]]
+
+
+def make_job(**params) -> Job:
+    asked.clear()
+    answered.clear()
+    overlaps.clear()
+    agent_behavior["batch_error"] = False
+    FakeGraph.reset(least_relationship_handler)
+    job = Job({"max_rounds": 3, "worker_concurrency": 1, "pipeline_depth": 0, "ask_batch_size": 1,
+               "answer_batch_size": 1, "loop_delay": 0, **params})
+    job.status = JOB_RUNNING
+    return job
+
+
+def test_pipeline_batch_error_falls_back_per_entity():
+    """测试1：流水线模式批量出题失败时，已租用的实体逐个生成问题，不提前终止"""
+    job = make_job(pipeline_depth=2, ask_batch_size=3)
+    agent_behavior["batch_error"] = True
+    no_entity = asyncio.run(main.run_pipelined_rounds(job, 2))
+    assert not no_entity, "❌ 批量出题失败不应按无实体终止"
+    assert asked == ["batch:实体0,实体1,实体2", "实体0", "实体1", "实体2"], f"❌ 出题顺序错误：{asked}"
+    assert job.rounds_completed == 3 and len(answered) == 3, f"❌ 完成轮数错误：{job.rounds_completed}"
+    assert main.entity_leases.leased_keys() == [], "❌ 结束后仍有未归还的租约"
+    print("✅ 批量出题失败回退为逐个生成")
+
+
+def test_worker_pool_leases_distinct_entities():
+    """测试2：并发工作者同时处理的实体互不相同，达到最大轮数后退出并归还全部租约"""
+    job = make_job(worker_concurrency=3, max_rounds=7)
+    no_entity = asyncio.run(main.run_worker_pool_rounds(job, 3))
+    assert not no_entity and job.rounds_completed == 7, f"❌ 完成轮数错误：{job.rounds_completed}"
+    assert not overlaps, f"❌ 同一实体被多个工作者同时处理：{overlaps}"
+    assert len(set(asked[:3])) == 3, f"❌ 首批工作者应租到不同实体：{asked[:3]}"
+    assert main.entity_leases.leased_keys() == [], "❌ 结束后仍有未归还的租约"
+    print("✅ 并发工作者租用不同实体")
+
+
+def test_worker_pool_uses_at_least_concurrency_candidates():
+    """测试3：候选实体数配置小于并发数时，每个工作者仍能租到实体"""
+    job = make_job(worker_concurrency=4, max_rounds=4)
+    main.WORKFLOW_CONFIG["entity_batch_size"], batch_size = 2, main.WORKFLOW_CONFIG.get("entity_batch_size")
+    try:
+        no_entity = asyncio.run(main.run_worker_pool_rounds(job, 4))
+    finally:
+        main.WORKFLOW_CONFIG["entity_batch_size"] = batch_size
+    assert not no_entity and sorted(asked) == ["实体0", "实体1", "实体2", "实体3"], f"❌ 租用结果错误：{asked}"
+    print("✅ 候选实体数不少于并发数")
+
+
+def test_concurrent_sequential_jobs_lease_distinct_entities():
+    """测试4：两个串行任务同时运行时各自租用不同实体，结束后归还全部租约"""
+    first = make_job(max_rounds=3)
+    second = Job(dict(first.params))
+    second.status = JOB_RUNNING
+
+    async def run_both():
+        return await asyncio.gather(main.run_sequential_rounds(first), main.run_sequential_rounds(second))
+
+    assert asyncio.run(run_both()) == [False, False], "❌ 串行任务不应提前终止"
+    assert first.rounds_completed == second.rounds_completed == 3, "❌ 完成轮数错误"
+    assert not overlaps and asked[:2] == ["实体0", "实体1"], f"❌ 两个任务同时选中了相同实体：{asked}"
+    assert main.entity_leases.leased_keys() == [], "❌ 结束后仍有未归还的租约"
+    print("✅ 并行的串行任务租用不同实体")
+
+
+def test_sequential_batches_release_leases():
+    """测试5：串行模式批量出题、合并回答时，答完一批后归还该批实体的租约"""
+    job = make_job(max_rounds=4, ask_batch_size=2, answer_batch_size=2)
+    assert not asyncio.run(main.run_sequential_rounds(job)), "❌ 串行任务不应提前终止"
+    assert asked == ["batch:实体0,实体1", "batch:实体0,实体1"], f"❌ 出题结果错误：{asked}"
+    assert job.rounds_completed == 4 and main.entity_leases.leased_keys() == [], "❌ 结束后仍有未归还的租约"
+    print("✅ 串行批量模式归还租约")
+
+
+def test_lifespan_subscribes_graph_changes():
+    """测试6：应用启动时订阅图谱变更推送，关闭时取消订阅"""
+    from fastapi.testclient import TestClient
+    with TestClient(main.app):
+        assert main.forward_graph_change in main.GRAPH_CHANGES.listeners, "❌ 启动后应订阅图谱变更"
+    assert main.forward_graph_change not in main.GRAPH_CHANGES.listeners, "❌ 关闭后应取消订阅"
+    print("✅ 生命周期内订阅图谱变更")
+
+
+if __name__ == "__main__":
+    test_pipeline_batch_error_falls_back_per_entity()
+    test_worker_pool_leases_distinct_entities()
+    test_worker_pool_uses_at_least_concurrency_candidates()
+    test_concurrent_sequential_jobs_lease_distinct_entities()
+    test_sequential_batches_release_leases()
+    test_lifespan_subscribes_graph_changes()
@@ -1,12 +1,28 @@
+import asyncio
+import json
 import os
 import re
 from queue import Queue
 from threading import Lock
 
 from langchain_community.graphs import Neo4jGraph
-from serpapi import Client
 
 from config import NEO4J_CONFIG, SERPAPI_CONFIG  # 导入SerpAPI配置
+from cypher_compiler import compile_statement, compile_statements, count_created_relationships
+from degree_index import DegreeIndex
+from graph_version import (
+    GraphVersion, GraphChangeFeed, VERSION_PROPERTY, CURSOR_NODES, CURSOR_EDGES,
+    has_successful_writes, collect_written_nodes, build_stamp_query, encode_cursor, decode_cursor, parse_filter,
+    build_nodes_page_query, build_edges_page_query, build_node_version_index_query, build_edge_version_index_query,
+)
+from graph_columnar import encode_columnar
+from search_cache import SearchCache
+from question_matcher import QuestionMatcher, normalize_question
+from single_flight import SingleFlight
+from search_backend import create_search_backend
+from snippet_packer import pack_snippets
+from rate_limiter import RateLimiter
+from cost_tracker import get_tracker
 
 # ===================== Neo4j连接池 =====================
 class Neo4jConnectionPool:
@@ -82,27 +98,7 @@ def update_graph_tool(cypher: str) -> dict:
             }
         
         # 调用增强的执行函数
-        result = execute_neo4j_query(cypher)
-        
-        if result["status"] == "success":
-            # 统计执行情况
-            success_count = len([r for r in result["results"] if r["status"] == "success"])
-            error_count = len([r for r in result["results"] if r["status"] == "error"])
-            
-            summary = f"执行完成：成功 {success_count} 条，失败 {error_count} 条"
-            
-            return {
-                "status": "success" if error_count == 0 else "partial",
-                "summary": summary,
-                "total": result["total_statements"],
-                "details": result["results"]
-            }
-        else:
-            return {
-                "status": "error",
-                "summary": result.get("message", "执行失败"),
-                "details": result.get("results", [])
-            }
+        return summarize_execution(execute_neo4j_query(cypher))
             
     except Exception as e:
         error_msg = f"[图谱更新失败] 原因：{str(e)}"
@@ -113,6 +109,29 @@ def update_graph_tool(cypher: str) -> dict:
             "details": []
         }
 
+
+def summarize_execution(result: dict) -> dict:
+    """将 execute_neo4j_query 的执行结果整理为图谱更新工具的返回格式"""
+    if result["status"] == "success":
+        # 统计执行情况
+        success_count = len([r for r in result["results"] if r["status"] == "success"])
+        error_count = len([r for r in result["results"] if r["status"] == "error"])
+        
+        summary = f"执行完成：成功 {success_count} 条，失败 {error_count} 条"
+        
+        return {
+            "status": "success" if error_count == 0 else "partial",
+            "summary": summary,
+            "total": result["total_statements"],
+            "details": result["results"]
+        }
+    else:
+        return {
+            "status": "error",
+            "summary": result.get("message", "执行失败"),
+            "details": result.get("results", [])
+        }
+
 # def get_graph_data():
 #     """工具a：查询知识图谱数据（供前端展示）"""
 #     try:
@@ -142,8 +161,47 @@ def update_graph_tool(cypher: str) -> dict:
 #         return {"nodes": formatted_nodes, "edges": formatted_edges}
 #     except Exception as e:
 #         return {"error": f"图谱查询失败: {str(e)}"}, 500
-def get_graph_data():
-    """工具a：查询知识图谱数据（适配前端要求格式）"""
+def _format_graph_node(n: dict) -> dict:
+    """格式化节点：适配前端要求的字段（写入版本号从properties中移出，单独返回）"""
+    properties = dict(n["properties"])
+    version = properties.pop(VERSION_PROPERTY, 0)
+    return {
+        "id": f"node_{n['id']}",  # 统一前缀，确保与 edge 的 from/to 对应
+        "label": properties.get("name", n["labels"][0]) if n["labels"] else "未知实体",
+        "type": n["labels"][0] if n["labels"] else "未知类型",  # type 字段复用第一个 label
+        "properties": properties,  # 保留完整属性（空对象时返回 {}）
+        "version": version
+    }
+
+
+def _format_graph_edge(r: dict) -> dict:
+    """格式化关系：适配前端要求的字段"""
+    return {
+        "id": f"edge_{r['edge_id']}",  # 关系唯一标识（加前缀区分节点 id）
+        "from": f"node_{r['source']}",  # 对应节点的 id（带前缀）
+        "to": f"node_{r['target']}",    # 对应节点的 id（带前缀）
+        "label": r["type"],             # 关系标签复用 type
+        "type": r["type"]               # 关系类型字段
+    }
+
+
+def _build_graph_payload(node_rows: list, edge_rows: list, columnar: bool = False) -> dict:
+    """按请求的格式组装图谱数据：默认为前端节点/关系列表，columnar 为列式编码（见 graph_columnar）"""
+    if columnar:
+        return encode_columnar(node_rows, edge_rows)
+    return {
+        "nodes": [_format_graph_node(n) for n in node_rows],
+        "edges": [_format_graph_edge(r) for r in edge_rows]
+    }
+
+
+def get_graph_data(columnar: bool = False):
+    """
+    工具a：查询知识图谱数据（适配前端要求格式；columnar=True 时返回列式编码）
+    返回中带当前图谱版本号 version，可作为之后 since 增量查询的起点
+    """
+    # 先读取版本号再查询（同 get_graph_page）：查询期间的写入以 since=version 增量查询时可取到
+    version = ensure_graph_version().current
     query_graph = None
     try:
         # 从连接池获取连接，避免与工作流冲突导致阻塞
@@ -157,30 +215,7 @@ def get_graph_data():
         nodes = query_graph.query(nodes_query)  # 使用连接池中的连接查询
         relationships = query_graph.query(relationships_query)
 
-        # 格式化节点：适配前端要求的字段
-        formatted_nodes = [
-            {
-                "id": f"node_{n['id']}",  # 统一前缀，确保与 edge 的 from/to 对应
-                "label": n["properties"].get("name", n["labels"][0]) if n["labels"] else "未知实体",
-                "type": n["labels"][0] if n["labels"] else "未知类型",  # type 字段复用第一个 label
-                "properties": n["properties"]  # 保留完整属性（空对象时返回 {}）
-            }
-            for n in nodes
-        ]
-
-        # 格式化关系：适配前端要求的字段
-        formatted_edges = [
-            {
-                "id": f"edge_{r['edge_id']}",  # 关系唯一标识（加前缀区分节点 id）
-                "from": f"node_{r['source']}",  # 对应节点的 id（带前缀）
-                "to": f"node_{r['target']}",    # 对应节点的 id（带前缀）
-                "label": r["type"],             # 关系标签复用 type
-                "type": r["type"]               # 关系类型字段
-            }
-            for r in relationships
-        ]
-
-        return {"nodes": formatted_nodes, "edges": formatted_edges}
+        return {**_build_graph_payload(nodes, relationships, columnar), "version": version}
     except Exception as e:
         # 抛出异常，由上层接口统一处理错误响应
         raise Exception(str(e))
@@ -190,8 +225,267 @@ def get_graph_data():
             neo4j_pool.release_connection(query_graph)
 
 
+def get_graph_page(cursor: str = None, limit: int = None, labels=None, types=None, since: int = None,
+                   columnar: bool = False):
+    """
+    工具a（分页/增量版）：按游标分页查询图谱，先返回节点、节点取完后返回关系
+    cursor：上一页返回的 next_cursor（为空从头开始）；limit：每页最多返回的节点+关系数（为空不分页）
+    labels/types：Label、关系类型过滤（列表或逗号分隔字符串）；指定labels时只返回两端都满足的关系
+    since：只返回写入版本号大于 since 的节点/关系（增量刷新，取值为上次响应中的 version；需开启 graph_versioning）
+    columnar：为True时节点/关系按列式编码返回（见 graph_columnar）
+    返回：{"nodes", "edges", "next_cursor"（为None表示已取完）, "version"（当前图谱版本号）}
+    性能：_version 索引按Label/关系类型建立，只有单个label（或单个type）的 since 查询走索引；
+         不带since、多Label或不过滤时仍需扫描（Label）全部节点/关系，id()游标只减少返回量而非扫描量
+    """
+    labels, types = parse_filter(labels), parse_filter(types)
+    kind, after = decode_cursor(cursor)
+    if limit is not None and limit <= 0:
+        raise ValueError("limit 必须为正整数")
+    if since is not None and not graph_versioning_enabled():
+        raise ValueError("since 增量查询需开启 NEO4J_CONFIG[\"graph_versioning\"]")
+    # 先读取版本号再查询：查询期间新写入的数据版本号更大，下次以 since=version 增量查询时可取到
+    version = ensure_graph_version().current
+    query_graph = None
+    try:
+        query_graph = neo4j_pool.get_connection()
+        nodes, edges, next_cursor = [], [], None
+        params = {"labels": labels, "since": since}
+        if kind == CURSOR_NODES:
+            nodes = query_graph.query(
+                build_nodes_page_query(labels, since, limit),
+                params={**params, "after": after, "limit": limit}
+            )
+            if limit and len(nodes) == limit:
+                next_cursor = encode_cursor(CURSOR_NODES, nodes[-1]["id"])
+            # 节点已取完：本页剩余额度用于关系
+            kind, after = CURSOR_EDGES, -1
+        remaining = (limit - len(nodes)) if limit else None
+        if next_cursor is None and (remaining is None or remaining > 0):
+            edges = query_graph.query(
+                build_edges_page_query(labels, types, since, remaining),
+                params={**params, "types": types, "after": after, "limit": remaining}
+            )
+            if remaining and len(edges) == remaining:
+                next_cursor = encode_cursor(CURSOR_EDGES, edges[-1]["edge_id"])
+        elif next_cursor is None:
+            # 本页恰好被节点填满：下一页从关系开头开始
+            next_cursor = encode_cursor(CURSOR_EDGES, -1)
+        return {**_build_graph_payload(nodes, edges, columnar), "next_cursor": next_cursor, "version": version}
+    finally:
+        if query_graph is not None:
+            neo4j_pool.release_connection(query_graph)
+
+
+def iter_graph_ndjson(labels=None, types=None, since: int = None, fetch_size: int = None):
+    """
+    工具a（流式导出版）：逐条从Neo4j拉取节点与关系，按NDJSON（每行一个JSON）逐行生成，
+    内存占用与图谱规模无关；首行为元信息，之后依次为节点、关系，末行为统计
+      {"kind": "meta", "version"}
+      {"kind": "node", ...节点（与 get_graph_data 格式一致）}
+      {"kind": "edge", ...关系}
+      {"kind": "end", "nodes": 节点数, "edges": 关系数}
+    中途出错时输出 {"kind": "error", "message"} 后结束（响应头已发出，无法再改状态码）
+    fetch_size：驱动每批从数据库拉取的记录数，默认读取 NEO4J_CONFIG["stream_fetch_size"]
+    过滤参数同 get_graph_page；参数错误在开始生成前抛出 ValueError
+    """
+    labels, types = parse_filter(labels), parse_filter(types)
+    if since is not None and not graph_versioning_enabled():
+        raise ValueError("since 增量查询需开启 NEO4J_CONFIG[\"graph_versioning\"]")
+    fetch_size = fetch_size or NEO4J_CONFIG.get("stream_fetch_size", 1000)
+    version = ensure_graph_version().current
+    params = {"labels": labels, "types": types, "since": since, "after": -1}
+
+    def dump(item: dict) -> bytes:
+        # 属性中可能包含Neo4j时间类型等非JSON类型，统一转为字符串
+        return (json.dumps(item, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+
+    def generate():
+        query_graph = neo4j_pool.get_connection()
+        counts = {"node": 0, "edge": 0}
+        try:
+            yield dump({"kind": "meta", "version": version})
+            with query_graph._driver.session(database=query_graph._database, fetch_size=fetch_size) as session:
+                for kind, query, formatter in (
+                    ("node", build_nodes_page_query(labels, since, ordered=False), _format_graph_node),
+                    ("edge", build_edges_page_query(labels, types, since, ordered=False), _format_graph_edge),
+                ):
+                    # 结果按 fetch_size 分批拉取，迭代时不在内存中累积
+                    for record in session.run(query, params):
+                        counts[kind] += 1
+                        yield dump({"kind": kind, **formatter(record.data())})
+            yield dump({"kind": "end", "nodes": counts["node"], "edges": counts["edge"]})
+        except Exception as e:
+            print(f"❌ 图谱流式导出失败：{str(e)}")
+            yield dump({"kind": "error", "message": f"图谱查询失败: {str(e)}"})
+        finally:
+            neo4j_pool.release_connection(query_graph)
+
+    return generate()
+
+
+# ===================== 图谱写入版本 =====================
+# 每次Cypher写入成功，图谱版本号加一（/api/graph-data 快照缓存与ETag据此失效）；
+# 开启 NEO4J_CONFIG["graph_versioning"]（默认关闭）后，同时给涉及的节点与新建关系打上版本号，
+# 供 get_graph_page 的 since 增量查询与变更推送使用；版本号首次使用时从图谱中已有的最大值恢复，
+# 并按Label/关系类型为 _version 建索引（之后写入出现的新Label/关系类型在打标时补建）
+GRAPH_VERSION = GraphVersion()
+GRAPH_CHANGES = GraphChangeFeed()  # 写入变更推送，main.py 订阅后经WebSocket转发给前端
+_graph_version_lock = Lock()
+_version_indexes = set()  # 已建 _version 索引的 ("node", Label) / ("edge", 关系类型)
+
+
+def graph_versioning_enabled() -> bool:
+    return NEO4J_CONFIG.get("graph_versioning", False)
+
+
+def ensure_version_indexes(labels=(), types=()):
+    """为尚未建索引的Label/关系类型创建 _version 索引（IF NOT EXISTS，重复执行无副作用）"""
+    pending = [("node", label) for label in labels] + [("edge", rel_type) for rel_type in types]
+    for kind, name in pending:
+        if (kind, name) in _version_indexes:
+            continue
+        query = build_node_version_index_query(name) if kind == "node" else build_edge_version_index_query(name)
+        try:
+            graph.query(query)
+            _version_indexes.add((kind, name))
+        except Exception as e:
+            # 建索引失败只影响增量查询速度，不影响写入
+            print(f"⚠️ _version 索引创建失败（{name}）：{str(e)[:100]}")
+
+
+def ensure_graph_version():
+    """首次使用时从Neo4j恢复当前版本号（仅此一次全图扫描；未开启打标时从0开始）"""
+    if GRAPH_VERSION.seeded:
+        return GRAPH_VERSION
+    with _graph_version_lock:
+        if not GRAPH_VERSION.seeded:
+            if not graph_versioning_enabled():
+                GRAPH_VERSION.seed(0)
+                return GRAPH_VERSION
+            ensure_version_indexes(
+                [row["label"] for row in graph.query("CALL db.labels() YIELD label RETURN label")],
+                [row["relationshipType"] for row in graph.query(
+                    "CALL db.relationshipTypes() YIELD relationshipType RETURN relationshipType")]
+            )
+            rows = graph.query(
+                f"MATCH (n) WHERE n.{VERSION_PROPERTY} IS NOT NULL RETURN max(n.{VERSION_PROPERTY}) AS version"
+            )
+            GRAPH_VERSION.seed(rows[0]["version"] if rows else 0)
+            print(f"✅ 图谱写入版本加载完成：v{GRAPH_VERSION.current}")
+    return GRAPH_VERSION
+
+
+def stamp_graph_version(execution_results: list) -> dict:
+    """
+    记录一次Cypher写入：有写语句执行成功时发布新的图谱版本号；
+    开启打标时先给本次写入涉及的节点（及其新建关系）打上该版本号，再推送变更
+    返回：{"seq", "version", "added_nodes", "changed_nodes", "added_edges"}（节点/关系为前端格式）；
+          无写入、未开启打标或打标失败时返回None
+    """
+    if not has_successful_writes(execution_results):
+        return None
+    written = collect_written_nodes(execution_results) if graph_versioning_enabled() else {}
+    try:
+        ensure_graph_version()
+    except Exception as e:
+        # 恢复失败时版本号从当前值继续递增，下次成功恢复时取两者较大值
+        print(f"⚠️ 图谱写入版本加载失败：{str(e)[:100]}")
+    with _graph_version_lock:
+        version = GRAPH_VERSION.current + 1
+        added_nodes, changed_nodes, added_edges = [], [], {}
+        try:
+            ensure_version_indexes(written)
+            for label, names in written.items():
+                for row in graph.query(build_stamp_query(label), params={"names": names, "version": version}) or []:
+                    # 打标前没有版本号：本次新建的节点（或版本化之前已存在的节点，前端按id覆盖即可）
+                    (added_nodes if row["previous"] is None else changed_nodes).append(_format_graph_node(row))
+                    for edge in row["edges"]:
+                        added_edges[edge["edge_id"]] = _format_graph_edge(edge)
+        except Exception as e:
+            # 打标失败不影响写入结果，仅增量查询/变更推送可能遗漏本次变更；版本号仍然前进，使快照缓存失效
+            print(f"⚠️ 图谱版本打标失败：{str(e)[:100]}")
+            written = {}
+        ensure_version_indexes(types={edge["type"] for edge in added_edges.values()})
+        GRAPH_VERSION.bump()
+        if not written:
+            return None
+        # 在锁内发布：变更序号与版本号顺序一致
+        return GRAPH_CHANGES.publish({
+            "version": version,
+            "added_nodes": added_nodes,
+            "changed_nodes": changed_nodes,
+            "added_edges": list(added_edges.values())
+        })
+
+
+# ===================== 实体度数索引 =====================
+# 开启 NEO4J_CONFIG["degree_index"] 后，选取关系最少的实体改为查询进程内最小堆（O(log n)），
+# 不再每次全图扫描；索引首次使用时全量加载，之后由Cypher执行结果增量维护
+degree_index = DegreeIndex()
+_degree_index_lock = Lock()
+
+
+def degree_index_enabled() -> bool:
+    return NEO4J_CONFIG.get("degree_index", False)
+
+
+def ensure_degree_index():
+    """首次使用时从Neo4j全量加载实体度数（仅此一次全图扫描）"""
+    if degree_index.seeded:
+        return degree_index
+    with _degree_index_lock:
+        if not degree_index.seeded:
+            cypher = """
+            MATCH (n)
+            WHERE n.name IS NOT NULL
+            OPTIONAL MATCH (n)-[r]-()
+            WITH n, count(r) AS relationCount
+            RETURN id(n) AS node_id, n.name AS entity_name, labels(n) AS entity_labels, relationCount
+            """
+            rows = [
+                {
+                    "node_id": row["node_id"],
+                    "name": row["entity_name"].strip(),
+                    "label": row["entity_labels"][0] if row["entity_labels"] else "",
+                    "degree": row["relationCount"]
+                }
+                for row in graph.query(cypher)
+                if isinstance(row.get("entity_name"), str) and row["entity_name"].strip()
+            ]
+            degree_index.seed(rows)
+            print(f"✅ 实体度数索引加载完成：{len(degree_index)} 个实体")
+    return degree_index
+
+
+def update_degree_index(execution_results: list):
+    """根据Cypher执行结果增量更新度数索引（仅处理可识别的节点/关系MERGE）"""
+    if not degree_index_enabled() or not degree_index.seeded:
+        return
+    for step in execution_results:
+        if step.get("status") != "success" or step.get("type") not in ("node", "relationship"):
+            continue
+        compiled = compile_statement(step.get("cypher", ""))
+        if compiled is None:
+            continue
+        if compiled["kind"] == "node":
+            degree_index.add_node(compiled["label"], compiled["name"])
+        elif step.get("relationships_created", 0) > 0:
+            # 只统计MERGE实际新建的关系（已存在的关系重复MERGE不计数）
+            degree_index.add_relationship(
+                (compiled["src_label"], compiled["src"]),
+                (compiled["dst_label"], compiled["dst"])
+            )
+
+
 def get_least_relationship_entity():
     """获取 Neo4j 中关系最少的实体（返回实体名称和Label）"""
+    if degree_index_enabled():
+        entities = ensure_degree_index().smallest(1)
+        if not entities:
+            print("❌ 未查询到有效实体：度数索引为空")
+            return {"name": "", "label": ""}
+        print(f"✅ 度数索引命中实体：{entities[0]['name']}，Label：{entities[0]['label']}")
+        return entities[0]
     try:
         # 查询实体名称和Label
         cypher = """
@@ -232,39 +526,229 @@ def get_least_relationship_entity():
 
 
 
-# 搜索结果缓存（节约API，保留搜索工具）
-SEARCH_CACHE = {}
-# 工具1：保留 search_tool（带缓存，正常调用API）
-def search_tool(query: str) -> str:
-    # return "搜索结果：一：用无线充电器测试 这是最简单直接的方法，把手机放在无线充电器上，如果显示充电，就表示具备无线充电功能，反之则不支持。 这样测试是因为目前市面上的无 ........."
-    # 缓存命中直接返回
-    if query in SEARCH_CACHE:
+def get_least_relationship_entities(limit: int, exclude_keys=None) -> list:
+    """
+    获取 Neo4j 中关系最少的前 limit 个实体（供并发工作者挑选）
+    exclude_keys：需排除的实体键列表（格式 "Label:实体名"，通常为已被租用的实体）
+    返回：[{"name": ..., "label": ...}, ...]，按关系数升序
+    """
+    if degree_index_enabled():
+        return ensure_degree_index().smallest(limit, exclude_keys=exclude_keys)
+    try:
+        cypher = """
+        MATCH (n)
+        WHERE n.name IS NOT NULL AND NOT (coalesce(labels(n)[0], '') + ':' + n.name) IN $exclude_keys
+        OPTIONAL MATCH (n)-[r]-()
+        WITH n, count(r) AS relationCount
+        ORDER BY relationCount ASC, id(n) ASC
+        LIMIT $limit
+        RETURN n.name AS entity_name, labels(n) AS entity_labels
+        """
+        result = graph.query(cypher, params={"limit": limit, "exclude_keys": list(exclude_keys or [])})
+
+        entities = []
+        for entity_info in result or []:
+            entity_name = (entity_info.get("entity_name") or "").strip()
+            entity_labels = entity_info.get("entity_labels") or []
+            if entity_name:
+                entities.append({"name": entity_name, "label": entity_labels[0] if entity_labels else ""})
+        print(f"✅ 查询到{len(entities)}个候选实体（排除已租用 {len(exclude_keys or [])} 个）")
+        return entities
+    except Exception as e:
+        print(f"❌ 候选实体查询失败：{str(e)}")
+        return []
+
+
+# ===================== 实体租约表 =====================
+class EntityLeaseTable:
+    """进程内实体租约表：保证并发工作者不会同时补全同一个实体"""
+    def __init__(self):
+        self.leases = {}  # 实体键 → 租用者标识
+        self.lock = Lock()
+
+    @staticmethod
+    def entity_key(entity: dict) -> str:
+        return f"{entity.get('label', '')}:{entity.get('name', '')}"
+
+    def acquire(self, entity: dict, owner: str) -> bool:
+        """尝试租用实体，已被其他工作者租用时返回False"""
+        key = self.entity_key(entity)
+        with self.lock:
+            if key in self.leases:
+                return False
+            self.leases[key] = owner
+            return True
+
+    def release(self, entity: dict):
+        """归还实体租约"""
+        with self.lock:
+            self.leases.pop(self.entity_key(entity), None)
+
+    def release_owner(self, owner: str):
+        """归还某个租用者持有的全部租约（工作流退出/取消时兜底清理）"""
+        with self.lock:
+            for key in [key for key, holder in self.leases.items() if holder == owner]:
+                del self.leases[key]
+
+    def leased_keys(self) -> list:
+        with self.lock:
+            return list(self.leases.keys())
+
+
+entity_leases = EntityLeaseTable()
+
+
+def lease_least_relationship_entity(owner: str, batch_size: int = 5):
+    """
+    为工作者租用一个关系最少且未被占用的实体
+    返回：实体字典 {"name", "label"}；无可用实体时返回 None
+    """
+    candidates = get_least_relationship_entities(batch_size, exclude_keys=entity_leases.leased_keys())
+    for entity in candidates:
+        # 查询与租用之间其他工作者可能已抢先租用，acquire失败则尝试下一个候选
+        if entity_leases.acquire(entity, owner):
+            print(f"🔒 {owner} 租用实体：{EntityLeaseTable.entity_key(entity)}")
+            return entity
+    return None
+
+
+# 搜索后端（SERPAPI_CONFIG["backend"]）：serpapi 在线搜索 / local 本地语料BM25离线搜索
+SEARCH_BACKEND_NAME = SERPAPI_CONFIG.get("backend", "serpapi")
+
+# 搜索结果缓存（节约API，保留搜索工具）：本地SQLite持久化，重启不丢失、多进程共享、带TTL与容量淘汰
+# 不同后端的结果分开缓存，切换后端后不会读到另一后端的结果
+SEARCH_CACHE = SearchCache(
+    SERPAPI_CONFIG.get("cache_path") or os.path.join(
+        get_project_root(), "cache",
+        "search_cache.sqlite3" if SEARCH_BACKEND_NAME == "serpapi" else f"search_cache_{SEARCH_BACKEND_NAME}.sqlite3"
+    ),
+    max_entries=SERPAPI_CONFIG.get("cache_max_entries", 10000),
+    ttl=SERPAPI_CONFIG.get("cache_ttl", 7 * 24 * 3600),
+)
+# 相似问题索引：同义改写的问题（归一化后相同或字符n-gram相似度达到阈值）复用已缓存的搜索结果
+QUESTION_MATCHER = QuestionMatcher(threshold=SERPAPI_CONFIG.get("fuzzy_cache_threshold", 0.7))
+_matcher_seed_lock = Lock()
+_matcher_seeded = False
+
+
+def _ensure_question_matcher():
+    """首次查询时用持久化缓存中已有的问题建立相似问题索引"""
+    global _matcher_seeded
+    if _matcher_seeded:
+        return
+    with _matcher_seed_lock:
+        if not _matcher_seeded:
+            for key in SEARCH_CACHE.keys(limit=SERPAPI_CONFIG.get("cache_max_entries", 10000)):
+                QUESTION_MATCHER.add(key)
+            _matcher_seeded = True
+            print(f"[搜索缓存] 相似问题索引加载完成：{len(QUESTION_MATCHER)} 条")
+
+
+def lookup_search_cache(query: str):
+    """查询搜索缓存：先精确匹配，再匹配相似问题；未命中返回None"""
+    cached = SEARCH_CACHE.get(query)
+    if cached is not None:
         print(f"✅ 命中搜索缓存（节约API）：{query}")
-        return SEARCH_CACHE[query]
+        return cached
+
+    _ensure_question_matcher()
+    matched, score = QUESTION_MATCHER.match(query)
+    if matched and matched != query:
+        cached = SEARCH_CACHE.get(matched)
+        if cached is None:
+            # 对应条目已过期或被淘汰
+            QUESTION_MATCHER.remove(matched)
+        else:
+            print(f"✅ 命中相似问题缓存（相似度 {score:.2f}，节约API）：{query} ≈ {matched}")
+            return cached
+    return None
+
+
+# 在途搜索合并：多个轮次/工作者同时搜索同一（归一化后相同的）问题时，只发起一次SerpAPI调用
+SEARCH_FLIGHTS = SingleFlight()
+
+
+def search_flight_key(query: str) -> str:
+    return normalize_question(query) or query
+
+
+# 搜索后端实例：SerpAPI为长连接客户端（超时、重试、熔断），local为磁盘倒排索引；同步与异步搜索共用
+SEARCH_BACKEND = create_search_backend(
+    SERPAPI_CONFIG,
+    default_index_path=os.path.join(get_project_root(), "cache", "local_search_index.sqlite3"),
+)
+
+
+# 搜索全局限流：每分钟请求数（0为不限），仅对实际发往搜索后端的请求生效（缓存命中、合并的请求不占额度）
+SEARCH_RATE_LIMITER = RateLimiter("搜索", requests_per_minute=SERPAPI_CONFIG.get("requests_per_minute", 0))
+
+
+def _format_search_result(query: str, results: dict) -> str:
+    """
+    取前 top_n 条自然结果的摘要，去重、按与问题的重合度排序，
+    在 token_budget 与 max_result_length 限制内打包为一段搜索结果
+    """
+    top_n = SERPAPI_CONFIG.get("top_n", 5)
+    organic_results = results.get("organic_results", [])[:top_n]
+    snippets = [(item.get("snippet", "") or item.get("title", "")) for item in organic_results]
+    packed = pack_snippets(
+        query,
+        snippets,
+        token_budget=SERPAPI_CONFIG.get("token_budget", 600),
+        max_chars=SERPAPI_CONFIG.get("max_result_length", 500),
+    )
+    if not packed:
+        return "搜索结果：未找到相关答案"
+    if len(packed) == 1:
+        return f"搜索结果：{packed[0]}"
+    return "搜索结果：\n" + "\n".join(f"[{i}] {snippet}" for i, snippet in enumerate(packed, 1))
+
+
+def _cached_before_fetch(query: str):
+    """在途表中没有该问题，但上一个执行方可能刚写入缓存；同时记录缓存命中/未命中"""
+    tracker = get_tracker()
+    cached = SEARCH_CACHE.get(query)
+    if cached is not None:
+        tracker.record_search_cache_hit()
+        return cached
+    tracker.record_search_cache_miss()
+    return None
+
 
-    # 缓存未命中，调用SerpAPI
+def _store_search_result(query: str, result: str):
+    SEARCH_CACHE.set(query, result)
+    QUESTION_MATCHER.add(query)
+    print(f"✅ 搜索API调用成功（已缓存）：{query}")
+
+
+def _fetch_search_result(query: str) -> str:
+    """缓存未命中时调用搜索后端并写入缓存（由在途合并的执行方调用）"""
+    cached = _cached_before_fetch(query)
+    if cached is not None:
+        return cached
+
+    # 缓存未命中，调用搜索后端
     try:
-        api_key = SERPAPI_CONFIG.get("api_key")
-        if not api_key:
-            raise ValueError("SERPAPI api_key 未配置")
-
-        client = Client(api_key=api_key)
-        results = client.search({
-            "q": query,
-            "engine": SERPAPI_CONFIG.get("engine", "baidu"),
-            "hl": "zh-CN",
-            "gl": "cn"
-        })
+        SEARCH_RATE_LIMITER.acquire()
+        result = _format_search_result(query, SEARCH_BACKEND.search(query))
+        _store_search_result(query, result)
+        return result
+    except Exception as e:
+        error_msg = f"[搜索工具失败] 原因：{str(e)}"
+        print(error_msg)
+        return error_msg
 
-        organic_results = results.get("organic_results", [])
-        if organic_results:
-            snippet = organic_results[0].get("snippet", "") or organic_results[0].get("title", "")
-            result = f"搜索结果：{snippet.strip()}"
-        else:
-            result = "搜索结果：未找到相关答案"
 
-        SEARCH_CACHE[query] = result
-        print(f"✅ 搜索API调用成功（已缓存）：{query}")
+async def _afetch_search_result(query: str) -> str:
+    """_fetch_search_result 的异步版本：HTTP请求走异步连接池，仅本地缓存读写放入线程"""
+    cached = await asyncio.to_thread(_cached_before_fetch, query)
+    if cached is not None:
+        return cached
+
+    try:
+        await SEARCH_RATE_LIMITER.aacquire()
+        result = _format_search_result(query, await SEARCH_BACKEND.asearch(query))
+        await asyncio.to_thread(_store_search_result, query, result)
         return result
     except Exception as e:
         error_msg = f"[搜索工具失败] 原因：{str(e)}"
@@ -272,124 +756,276 @@ def search_tool(query: str) -> str:
         return error_msg
 
 
-def execute_neo4j_query(cypher: str):
+# 工具1：保留 search_tool（带缓存，正常调用API）
+def search_tool(query: str) -> str:
+    # return "搜索结果：一：用无线充电器测试 这是最简单直接的方法，把手机放在无线充电器上，如果显示充电，就表示具备无线充电功能，反之则不支持。 这样测试是因为目前市面上的无 ........."
+    # 缓存命中直接返回
+    tracker = get_tracker()
+    cached = lookup_search_cache(query)
+    if cached is not None:
+        tracker.record_search_cache_hit()
+        return cached
+
+    result, shared = SEARCH_FLIGHTS.do(search_flight_key(query), lambda: _fetch_search_result(query))
+    if shared:
+        tracker.record_search_cache_hit()
+        print(f"✅ 合并在途搜索请求（节约API）：{query}")
+    return result
+
+
+async def asearch_tool(query: str) -> str:
+    """search_tool 的异步版本：与同步调用共用缓存和在途合并表"""
+    tracker = get_tracker()
+    cached = await asyncio.to_thread(lookup_search_cache, query)
+    if cached is not None:
+        tracker.record_search_cache_hit()
+        return cached
+
+    result, shared = await SEARCH_FLIGHTS.ado(search_flight_key(query), lambda: _afetch_search_result(query))
+    if shared:
+        tracker.record_search_cache_hit()
+        print(f"✅ 合并在途搜索请求（节约API）：{query}")
+    return result
+
+
+# 危险操作校验：禁止删除、清空等操作
+DANGEROUS_CYPHER_PATTERN = r"\bDROP\b|\bDELETE\b(?!\s+constraint)|\bREMOVE\b"
+
+
+def split_cypher_statements(cypher: str) -> list:
+    """
+    解析Cypher：按分号分割语句，纯注释行单独作为分组标记保留
+    返回：语句列表（注释以 // 开头）
+    """
+    statements = []
+    current_statement = []
+    
+    for line in cypher.split('\n'):
+        line = line.strip()
+        
+        # 保留纯注释行作为分组标记
+        if line.startswith('//'):
+            # 如果有累积的语句，先保存
+            if current_statement:
+                statements.append('\n'.join(current_statement))
+                current_statement = []
+            # 保存注释作为标记
+            statements.append(line)
+            continue
+        
+        # 跳过空行
+        if not line:
+            continue
+        
+        # 累积语句内容
+        current_statement.append(line)
+        
+        # 遇到分号，说明一条语句结束
+        if line.endswith(';'):
+            statements.append('\n'.join(current_statement))
+            current_statement = []
+    
+    # 处理最后可能没有分号的语句
+    if current_statement:
+        statements.append('\n'.join(current_statement))
+    return statements
+
+
+def classify_cypher_statement(stmt: str) -> str:
+    """判断语句类型（优先级：约束 > 关系 > 节点）"""
+    stmt_upper = stmt.upper()
+    if 'CREATE CONSTRAINT' in stmt_upper:
+        return "constraint"
+    elif 'MATCH' in stmt_upper and 'MERGE' in stmt_upper and ('-[' in stmt or '->' in stmt):
+        return "relationship"  # MATCH...MERGE关系模式
+    elif 'MERGE' in stmt_upper and ('-[' in stmt or '->' in stmt):
+        return "relationship"  # 直接MERGE关系
+    elif 'MERGE' in stmt_upper:
+        return "node"
+    elif 'MATCH' in stmt_upper:
+        return "match"
+    return "other"
+
+
+def run_statement(runner, stmt: str):
+    """在会话或事务中执行一条语句，返回 (记录列表, 新建关系数)"""
+    result = runner.run(stmt)
+    records = [record.data() for record in result]
+    return records, result.consume().counters.relationships_created
+
+
+def execute_cypher_statement(stmt: str, step: int) -> dict:
+    """执行单条Cypher语句，返回该步骤的结构化结果（供前端展示）"""
+    stmt_upper = stmt.upper()
+    stmt_type = classify_cypher_statement(stmt)
+    try:
+        # 执行语句（同时取回写入计数，供度数索引只统计实际新建的关系）
+        with graph._driver.session(database=graph._database) as session:
+            records, relationships_created = run_statement(session, stmt)
+        
+        return {
+            "step": step,
+            "cypher": stmt,
+            "status": "success",
+            "result": f"✅ 执行成功 (影响 {len(records)} 行)",
+            "type": stmt_type,
+            "affected_rows": len(records),
+            "relationships_created": relationships_created
+        }
+    except Exception as stmt_error:
+        error_msg = str(stmt_error)
+        
+        # 区分不同类型的错误
+        if "equivalent constraint already exists" in error_msg.lower() or \
+           ("already exists" in error_msg.lower() and "constraint" in stmt_upper and "CREATE CONSTRAINT" in stmt_upper):
+            # 约束已存在 - 视为成功（因为约束目标已达成）
+            return {
+                "step": step,
+                "cypher": stmt,
+                "status": "success",
+                "result": "⚠️ 约束已存在（跳过创建，继续执行）",
+                "type": "constraint"
+            }
+        elif "ConstraintValidationFailed" in error_msg:
+            # 约束验证失败（节点/关系冲突）
+            return {
+                "step": step,
+                "cypher": stmt,
+                "status": "error",
+                "error": f"❌ 约束验证失败：节点可能已存在但属性不匹配，或关系创建冲突。{error_msg[:150]}",
+                "type": stmt_type
+            }
+        else:
+            # 其他错误
+            return {
+                "step": step,
+                "cypher": stmt,
+                "status": "error",
+                "error": f"❌ 执行失败: {error_msg}",
+                "type": stmt_type
+            }
+
+
+def group_statements_by_phase(statements: list) -> list:
+    """
+    按执行阶段分组：相邻且类型相同的语句归为一组（约束 → 节点 → 关系）
+    返回：[(阶段类型, [语句, ...]), ...]，保持原有执行顺序
+    """
+    phases = []
+    for stmt in statements:
+        stmt_type = classify_cypher_statement(stmt)
+        if phases and phases[-1][0] == stmt_type:
+            phases[-1][1].append(stmt)
+        else:
+            phases.append((stmt_type, [stmt]))
+    return phases
+
+
+def execute_phase_in_transaction(statements: list, first_step: int) -> list:
+    """
+    在一个显式事务中执行同一阶段的全部语句（一次提交，减少网络往返）
+    任一语句失败时整个事务回滚并抛出异常，由调用方回退为逐条执行
+    """
+    results = []
+    with graph._driver.session(database=graph._database) as session:
+        with session.begin_transaction() as tx:
+            for offset, stmt in enumerate(statements):
+                records, relationships_created = run_statement(tx, stmt)
+                results.append({
+                    "step": first_step + offset,
+                    "cypher": stmt,
+                    "status": "success",
+                    "result": f"✅ 执行成功 (影响 {len(records)} 行)",
+                    "type": classify_cypher_statement(stmt),
+                    "affected_rows": len(records),
+                    "relationships_created": relationships_created
+                })
+            tx.commit()
+    return results
+
+
+def execute_compiled_statements(statements: list) -> list:
+    """
+    编译执行：将可识别的节点/关系MERGE合并为参数化UNWIND批量语句执行，其余语句逐条执行
+    批量语句失败时，该批次回退为逐条执行以获得每条语句的详细状态
+    返回：按步骤编号排序、与逐条执行同结构的结果列表
+    """
+    results = []
+    for item in compile_statements(list(enumerate(statements, 1))):
+        if item["query"] is None:
+            step, stmt = item["statements"][0]
+            results.append(execute_cypher_statement(stmt, step))
+            continue
+        try:
+            records = graph.query(item["query"], params=item["params"])
+            # 批量语句按行返回成功写入的步骤编号；关系两端节点未匹配到时该行不返回
+            affected = {}
+            created = count_created_relationships(item, records or [])
+            for record in records or []:
+                affected[record["idx"]] = affected.get(record["idx"], 0) + 1
+            for step, stmt in item["statements"]:
+                results.append({
+                    "step": step,
+                    "cypher": stmt,
+                    "status": "success",
+                    "result": f"✅ 批量执行成功 (影响 {affected.get(step, 0)} 行)",
+                    "type": classify_cypher_statement(stmt),
+                    "affected_rows": affected.get(step, 0),
+                    "relationships_created": created.get(step, 0)
+                })
+        except Exception as batch_error:
+            print(f"⚠️ UNWIND批量执行失败，回退为逐条执行：{str(batch_error)[:100]}")
+            for step, stmt in item["statements"]:
+                results.append(execute_cypher_statement(stmt, step))
+    return sorted(results, key=lambda r: r["step"])
+
+
+def execute_neo4j_query(cypher: str, transactional: bool = None, compiled: bool = None):
     """
     工具d：分步执行Cypher语句（供答智能体）
     支持三步格式：约束 → 节点 → 关系
+    transactional：为True时每个阶段在一个显式事务中批量执行，失败的阶段回退为逐条执行；
+                   默认读取 NEO4J_CONFIG["transactional_batches"]
+    compiled：为True时将节点/关系MERGE编译为参数化UNWIND批量语句执行（优先于transactional）；
+              默认读取 NEO4J_CONFIG["compile_unwind_batches"]
     返回：结构化的执行结果列表
     """
+    if transactional is None:
+        transactional = NEO4J_CONFIG.get("transactional_batches", False)
+    if compiled is None:
+        compiled = NEO4J_CONFIG.get("compile_unwind_batches", False)
     try:
         # 基础安全校验：禁止危险操作
-        dangerous_patterns = r"\bDROP\b|\bDELETE\b(?!\s+constraint)|\bREMOVE\b"
-        if re.search(dangerous_patterns, cypher, re.IGNORECASE):
+        if re.search(DANGEROUS_CYPHER_PATTERN, cypher, re.IGNORECASE):
             raise ValueError("禁止执行删除、清空等危险操作")
 
-        # 解析Cypher：按分号分割语句，过滤注释行
-        statements = []
-        current_statement = []
-        
-        for line in cypher.split('\n'):
-            line = line.strip()
-            
-            # 保留纯注释行作为分组标记
-            if line.startswith('//'):
-                # 如果有累积的语句，先保存
-                if current_statement:
-                    statements.append('\n'.join(current_statement))
-                    current_statement = []
-                # 保存注释作为标记
-                statements.append(line)
-                continue
-            
-            # 跳过空行
-            if not line:
-                continue
-            
-            # 累积语句内容
-            current_statement.append(line)
-            
-            # 遇到分号，说明一条语句结束
-            if line.endswith(';'):
-                statements.append('\n'.join(current_statement))
-                current_statement = []
-        
-        # 处理最后可能没有分号的语句
-        if current_statement:
-            statements.append('\n'.join(current_statement))
+        statements = split_cypher_statements(cypher)
+        # 跳过纯注释（不添加到结果中，因为前端不需要显示注释步骤）
+        executable = [stmt for stmt in statements if not stmt.startswith('//')]
         
         # 执行每条语句并记录结果
         execution_results = []
-        step_counter = 0  # 实际执行的步骤计数器
-        for i, stmt in enumerate(statements, 1):
-            # 跳过纯注释（不添加到结果中，因为前端不需要显示注释步骤）
-            if stmt.startswith('//'):
-                continue
-            
-            step_counter += 1  # 只对实际执行的语句计数
-            
-            try:
-                # 判断语句类型（优先级：约束 > 关系 > 节点）
-                stmt_upper = stmt.upper()
-                if 'CREATE CONSTRAINT' in stmt_upper:
-                    stmt_type = "constraint"
-                elif 'MATCH' in stmt_upper and 'MERGE' in stmt_upper and ('-[' in stmt or '->' in stmt):
-                    stmt_type = "relationship"  # MATCH...MERGE关系模式
-                elif 'MERGE' in stmt_upper and ('-[' in stmt or '->' in stmt):
-                    stmt_type = "relationship"  # 直接MERGE关系
-                elif 'MERGE' in stmt_upper:
-                    stmt_type = "node"
-                elif 'MATCH' in stmt_upper:
-                    stmt_type = "match"
-                else:
-                    stmt_type = "other"
-                
-                # 执行语句
-                result = graph.query(stmt)
-                
-                execution_results.append({
-                    "step": step_counter,
-                    "cypher": stmt,
-                    "status": "success",
-                    "result": f"✅ 执行成功 (影响 {len(result) if result else 0} 行)",
-                    "type": stmt_type,
-                    "affected_rows": len(result) if result else 0
-                })
-            except Exception as stmt_error:
-                error_msg = str(stmt_error)
-                
-                # 区分不同类型的错误
-                if "equivalent constraint already exists" in error_msg.lower() or \
-                   ("already exists" in error_msg.lower() and "constraint" in stmt_upper and "CREATE CONSTRAINT" in stmt_upper):
-                    # 约束已存在 - 视为成功（因为约束目标已达成）
-                    execution_results.append({
-                        "step": step_counter,
-                        "cypher": stmt,
-                        "status": "success",
-                        "result": "⚠️ 约束已存在（跳过创建，继续执行）",
-                        "type": "constraint"
-                    })
-                elif "ConstraintValidationFailed" in error_msg:
-                    # 约束验证失败（节点/关系冲突）
-                    execution_results.append({
-                        "step": step_counter,
-                        "cypher": stmt,
-                        "status": "error",
-                        "error": f"❌ 约束验证失败：节点可能已存在但属性不匹配，或关系创建冲突。{error_msg[:150]}",
-                        "type": stmt_type if 'stmt_type' in locals() else "unknown"
-                    })
-                else:
-                    # 其他错误
-                    execution_results.append({
-                        "step": step_counter,
-                        "cypher": stmt,
-                        "status": "error",
-                        "error": f"❌ 执行失败: {error_msg}",
-                        "type": stmt_type if 'stmt_type' in locals() else "unknown"
-                    })
+        if compiled:
+            execution_results = execute_compiled_statements(executable)
+        elif transactional:
+            for phase_type, phase_statements in group_statements_by_phase(executable):
+                first_step = len(execution_results) + 1
+                try:
+                    execution_results.extend(execute_phase_in_transaction(phase_statements, first_step))
+                except Exception as phase_error:
+                    # 事务已回滚：仅该阶段回退为逐条执行，以获得每条语句的详细状态
+                    print(f"⚠️ {phase_type}阶段事务执行失败，回退为逐条执行：{str(phase_error)[:100]}")
+                    for offset, stmt in enumerate(phase_statements):
+                        execution_results.append(execute_cypher_statement(stmt, first_step + offset))
+        else:
+            for step_counter, stmt in enumerate(executable, 1):
+                execution_results.append(execute_cypher_statement(stmt, step_counter))
         
+        update_degree_index(execution_results)
+        stamp_graph_version(execution_results)
         return {
             "status": "success",
-            "total_statements": len([s for s in statements if not s.startswith('//')]),
+            "total_statements": len(executable),
             "results": execution_results
         }
         
@@ -398,4 +1034,181 @@ def execute_neo4j_query(cypher: str):
             "status": "error",
             "message": f"❌ Cypher解析/执行失败: {str(e)}",
             "results": []
-        }
\ No newline at end of file
+        }
+
+
+class IncrementalCypherExecutor:
+    """
+    增量Cypher执行器：边接收LLM流式输出的Cypher代码块，边执行已完整（以分号结尾）的语句
+    解析规则与 split_cypher_statements 一致，步骤结果与 execute_neo4j_query 同结构
+    core_label：核心实体Label；在其出现在已接收的Cypher中之前，完整语句先缓存不执行
+               （与非流式模式「Cypher中缺少核心Label则整体不执行」保持一致）
+    节点/关系等数据语句随到随在同一个显式事务中执行，代码块结束（close）时才提交：
+    代码块中任一语句未通过安全校验时整个事务回滚，与非流式模式「整块拒绝」一致，不会留下写了一半的图谱；
+    约束语句（schema）不能与数据写入处于同一事务，到达即单独执行（幂等，不含用户数据）
+    事务中某条语句执行失败时回滚，其余语句改为缓存到代码块结束后逐条执行（同 transactional 模式的回退）
+    不使用 NEO4J_CONFIG 的 transactional / compile_unwind_batches 模式：语句随流式输出逐条到达，无法预先分阶段或编译为UNWIND批量语句
+    feed/close 均为阻塞调用（包含Neo4j写入），异步环境中应放入线程执行
+    """
+    def __init__(self, core_label: str = ""):
+        self.core_label = core_label
+        self.received = ""  # 已接收的全部Cypher文本
+        self.partial_line = ""
+        self.current_statement = []
+        self.pending = []  # 等待核心Label出现的已完整语句
+        self.results = []
+        self.total_statements = 0
+        self.steps = 0  # 已通过校验、开始执行的语句数（步骤编号）
+        self.error = ""
+        self.closed = False
+        self.session = None
+        self.tx = None
+        self.tx_statements = []  # 已在事务中执行、尚未提交的 (步骤, 语句)
+        self.deferred = None  # 事务失败后改为代码块结束时逐条执行的 (步骤, 语句)
+
+    def _label_ready(self) -> bool:
+        return (not self.core_label) or (self.core_label in self.received)
+
+    def _submit(self, stmt: str):
+        self.total_statements += 1
+        self.pending.append(stmt)
+        if self._label_ready():
+            self._drain()
+
+    def _drain(self):
+        while self.pending and not self.error:
+            stmt = self.pending.pop(0)
+            # 逐条做安全校验：一旦出现危险语句，回滚已执行未提交的语句，并停止执行后续所有语句
+            if re.search(DANGEROUS_CYPHER_PATTERN, stmt, re.IGNORECASE):
+                self.error = "❌ Cypher解析/执行失败: 禁止执行删除、清空等危险操作"
+                self.pending = []
+                self.deferred = None
+                self._end_transaction(commit=False, reason="代码块中包含危险操作，整体回滚")
+                return
+            self.steps += 1
+            self._execute(stmt, self.steps)
+
+    def _execute(self, stmt: str, step: int):
+        stmt_type = classify_cypher_statement(stmt)
+        if stmt_type == "constraint":
+            self.results.append(execute_cypher_statement(stmt, step))
+            return
+        if self.deferred is not None:
+            self.deferred.append((step, stmt))
+            return
+        try:
+            if self.tx is None:
+                self.session = graph._driver.session(database=graph._database)
+                self.tx = self.session.begin_transaction()
+            records, relationships_created = run_statement(self.tx, stmt)
+        except Exception as e:
+            print(f"⚠️ 增量执行事务失败，回滚后改为代码块结束时逐条执行：{str(e)[:100]}")
+            deferred = self.tx_statements + [(step, stmt)]
+            self._end_transaction(commit=False)
+            self.deferred = deferred
+            return
+        self.tx_statements.append((step, stmt))
+        self.results.append({
+            "step": step,
+            "cypher": stmt,
+            "status": "success",
+            "result": f"✅ 执行成功 (影响 {len(records)} 行)",
+            "type": stmt_type,
+            "affected_rows": len(records),
+            "relationships_created": relationships_created
+        })
+
+    def _end_transaction(self, commit: bool, reason: str = "") -> bool:
+        """
+        提交或回滚数据事务，返回是否已提交
+        回滚时移除事务中语句的结果；reason非空时改为记录这些语句「已回滚」
+        """
+        if self.tx is not None:
+            try:
+                if commit:
+                    self.tx.commit()
+                else:
+                    self.tx.rollback()
+            except Exception as e:
+                commit = False
+                reason = reason or f"事务提交失败：{str(e)[:150]}"
+            finally:
+                self.session.close()
+                self.tx = None
+                self.session = None
+        if not commit:
+            rolled_back = {step for step, _ in self.tx_statements}
+            self.results = [result for result in self.results if result["step"] not in rolled_back]
+            if reason:
+                for step, stmt in self.tx_statements:
+                    self.results.append({
+                        "step": step,
+                        "cypher": stmt,
+                        "status": "error",
+                        "error": f"❌ 已回滚：{reason}",
+                        "type": classify_cypher_statement(stmt)
+                    })
+                self.results.sort(key=lambda r: r["step"])
+        self.tx_statements = []
+        return commit
+
+    def _consume_line(self, line: str):
+        line = line.strip()
+        if line.startswith('//'):
+            if self.current_statement:
+                self._submit('\n'.join(self.current_statement))
+                self.current_statement = []
+            return
+        if not line:
+            return
+        self.current_statement.append(line)
+        if line.endswith(';'):
+            self._submit('\n'.join(self.current_statement))
+            self.current_statement = []
+
+    def feed(self, text: str):
+        """接收一段Cypher增量文本，执行其中已完整的语句"""
+        if self.closed or self.error:
+            return
+        self.received += text
+        self.partial_line += text
+        *lines, self.partial_line = self.partial_line.split('\n')
+        for line in lines:
+            self._consume_line(line)
+
+    def close(self, discard_partial: bool = False) -> dict:
+        """
+        代码块结束：执行剩余语句，返回与 execute_neo4j_query 相同结构的结果
+        discard_partial：流式输出中断（出错/取消）时为True，丢弃尚未以分号结束的截断语句，只保留已完整的语句
+        """
+        if not self.closed:
+            self.closed = True
+            if discard_partial:
+                self.partial_line = ""
+                self.current_statement = []
+            elif not self.error:
+                self._consume_line(self.partial_line)
+                self.partial_line = ""
+                if self.current_statement:
+                    self._submit('\n'.join(self.current_statement))
+                    self.current_statement = []
+            if not self._label_ready():
+                # 核心Label始终未出现：与非流式模式一致，不执行任何语句
+                self.pending = []
+            if not self.error and not self._end_transaction(commit=True):
+                self.error = "❌ Cypher事务提交失败，本代码块的数据语句未写入"
+            if not self.error:
+                # 事务失败后缓存的语句：代码块已完整通过校验，逐条执行以获得每条语句的详细状态
+                for step, stmt in self.deferred or []:
+                    self.results.append(execute_cypher_statement(stmt, step))
+                self.deferred = None
+                self.results.sort(key=lambda r: r["step"])
+            update_degree_index(self.results)
+            stamp_graph_version(self.results)
+        if self.error:
+            return {"status": "error", "message": self.error, "results": self.results}
+        return {
+            "status": "success",
+            "total_statements": self.total_statements,
+            "results": self.results
+        }